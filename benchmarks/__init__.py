@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for todotxt. Run from the repository root, e.g.
+
+    python -m benchmarks.bench_memory
+"""
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Event loop stalls during a large load: Tasks.load() called in a
+coroutine vs. AsyncTasks.load() (worker thread, and process pool).
+
+    python -m benchmarks.bench_async [count ...]
+
+Default counts: 100000 300000. A ticker coroutine sleeps 1ms in a loop
+while the file loads; a stall is the time a tick came late. "max" is the
+longest stall, "p99" the 99th percentile of the ticks and "load" the time
+the load took.
+"""
+from __future__ import print_function
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import todotxt
+from todotxt import AsyncTasks
+from benchmarks.common import todo_lines
+
+TICK = 0.001
+
+
+async def ticker(stalls, done):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        stalls.append(max(0.0, time.perf_counter() - start - TICK))
+
+
+async def measure(load):
+    stalls = []
+    done = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(stalls, done))
+    await asyncio.sleep(0.05)
+    del stalls[:]
+    start = time.perf_counter()
+    await load()
+    seconds = time.perf_counter() - start
+    done.set()
+    await tick
+    stalls.sort()
+    return (stalls[-1], stalls[int(len(stalls) * 0.99)], seconds) \
+        if stalls else (seconds, seconds, seconds)
+
+
+def blocking(path):
+    async def load():
+        todotxt.Tasks(path).load()
+    return load
+
+
+def threaded(path, processes=None):
+    async def load():
+        async with AsyncTasks(path, processes=processes) as tasks:
+            await tasks.load()
+    return load
+
+
+async def run(counts, directory):
+    print("{0:>9}  {1:<18}{2:>10}{3:>10}{4:>11}".format(
+        "tasks", "load", "max (ms)", "p99 (ms)", "load (ms)"))
+    for count in counts:
+        path = os.path.join(directory, "todo{0}.txt".format(count))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(todo_lines(count)) + "\n")
+        for label, load in (("Tasks.load", blocking(path)),
+                            ("AsyncTasks thread", threaded(path)),
+                            ("AsyncTasks procs=2", threaded(path, 2))):
+            stall, p99, seconds = await measure(load)
+            print("{0:>9}  {1:<18}{2:>10.1f}{3:>10.1f}{4:>11.1f}".format(
+                count, label, stall * 1e3, p99 * 1e3, seconds * 1e3))
+
+
+def main(counts=(100000, 300000)):
+    directory = tempfile.mkdtemp()
+    try:
+        asyncio.run(run(counts, directory))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or (100000, 300000))
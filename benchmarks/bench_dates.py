@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks of the date parse / serialize paths.
+
+    python -m benchmarks.bench_dates
+"""
+from __future__ import print_function
+import re
+import timeit
+from datetime import datetime, date, timedelta
+
+import todotxt
+
+NUMBER = 20000
+REPEAT = 5
+
+
+def reference_date_value(arg_date):
+    """date_value() before caching, for comparison."""
+    _weekdays = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5,
+                 "sun": 6, "monday": 0, "tuesday": 1, "wednesday": 2,
+                 "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+    _keywords = {"today": 0, "tomorrow": 1, "yesterday": -1}
+
+    retval = None
+    if isinstance(arg_date, date):
+        arg_date = arg_date.strftime("%Y-%m-%d")
+    else:
+        arg_date = arg_date.replace("/", "-")
+
+    match = re.search(todotxt.DATE_REGEX, arg_date)
+    if match is not None:
+        retval = datetime.strptime(match.group(0), "%Y-%m-%d")
+    elif arg_date in _weekdays:
+        today = datetime(*datetime.today().timetuple()[:3])
+        wdtdy = today.weekday()
+        wdtgt = _weekdays[arg_date]
+        retval = today + timedelta(days=(wdtgt - wdtdy
+                                         + (7 if wdtgt < wdtdy else 0)))
+    elif arg_date in _keywords:
+        retval = datetime(*datetime.today().timetuple()[:3]) \
+            + timedelta(days=_keywords[arg_date])
+    return retval
+
+
+def report(label, func, reference=None):
+    now = min(timeit.repeat(func, number=NUMBER, repeat=REPEAT))
+    line = "{0:<34}{1:>9.3f} us".format(label, now / NUMBER * 1e6)
+    if reference is not None:
+        old = min(timeit.repeat(reference, number=NUMBER, repeat=REPEAT))
+        line += "  (uncached {0:.3f} us, x{1:.1f})".format(
+            old / NUMBER * 1e6, old / now)
+    print(line)
+
+
+def main():
+    value = datetime(2016, 11, 14)
+    task = todotxt.Task("(A) 2016-11-14 call +work @phone "
+                        "t:2016-11-10 due:2016-11-20")
+
+    print("date_value")
+    for arg in ("2016-11-14", "2016/11/14", "today", "fri"):
+        report("  {0!r}".format(arg), lambda: todotxt.date_value(arg),
+               lambda: reference_date_value(arg))
+    report("  datetime", lambda: todotxt.date_value(value),
+           lambda: reference_date_value(value))
+
+    print("serialize")
+    report("  format_date(datetime)", lambda: todotxt.format_date(value),
+           lambda: reference_date_value(value).strftime("%Y-%m-%d"))
+    report("  Task.rebuild_raw_todo", task.rebuild_raw_todo)
+
+    print("parse")
+    report("  Task with t:/due: dates", lambda: todotxt.Task(task.raw_todo))
+    report("  Task with due:tomorrow",
+           lambda: todotxt.Task("2016-11-14 call due:tomorrow"))
+
+
+if __name__ == "__main__":
+    main()
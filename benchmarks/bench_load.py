@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Reading and decoding todo.txt files: per-line codecs reader vs. one
+bytes read (todotxt.encoding), in MB/s.
+
+    python -m benchmarks.bench_load [count ...]
+
+Default counts: 10000 100000. Every count is written as UTF-8 and as
+cp932 with "\\r\\n" newlines (a Windows Simpletask file); "detect" is the
+encoding detection of todotxt.encoding, which tries UTF-8 before cp932.
+"""
+from __future__ import print_function
+import codecs
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from todotxt import encoding
+from benchmarks.common import todo_lines
+
+
+def codecs_lines(path, name):
+    """The former reader: a codecs stream read line by line, stripped
+    twice."""
+    with codecs.open(path, "r", name) as f:
+        lines = [x.strip() for x in f]
+    return [x for x in (y.strip() for y in lines) if x]
+
+
+def bytes_lines(path, name):
+    data = encoding.read_file(path)[0]
+    try:
+        return encoding.split_lines(encoding.decode(data)[0])
+    finally:
+        encoding.release(data)
+
+
+def mmap_lines(path, name):
+    threshold = encoding.MMAP_THRESHOLD
+    encoding.MMAP_THRESHOLD = 0
+    try:
+        return bytes_lines(path, name)
+    finally:
+        encoding.MMAP_THRESHOLD = threshold
+
+
+READERS = (("codecs", codecs_lines), ("detect", bytes_lines),
+           ("mmap", mmap_lines))
+
+
+def best(func, *args):
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        retval = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), retval
+
+
+def main(counts=(10000, 100000)):
+    directory = tempfile.mkdtemp()
+    try:
+        print("{0:>9}{1:>8}{2:>8}".format("tasks", "file", "MB") + "".join(
+            "{0:>13}".format(x[0] + " MB/s") for x in READERS))
+        for count in counts:
+            lines = todo_lines(count)
+            for name, newline in (("utf-8", "\n"), ("cp932", "\r\n")):
+                path = os.path.join(directory, "todo-{0}.txt".format(name))
+                with open(path, "wb") as f:
+                    f.write(encoding.encode(lines, encoding.TextFormat(
+                        name, b"", newline, "strict")))
+                size = os.path.getsize(path) / 1e6
+                row = "{0:>9}{1:>8}{2:>8.1f}".format(count, name, size)
+                for _, reader in READERS:
+                    seconds, result = best(reader, path, name)
+                    assert result == lines
+                    row += "{0:>13.1f}".format(size / seconds)
+                print(row)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or (10000, 100000))
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Compares bytes per task of Task and the lazily-parsed CompactTask.
+
+    python -m benchmarks.bench_memory [count]
+"""
+from __future__ import print_function
+import gc
+import sys
+import tracemalloc
+
+import todotxt
+from benchmarks.common import todo_lines
+
+
+def measure(lines, lazy, touch):
+    gc.collect()
+    tracemalloc.start()
+    tasks = todotxt.Tasks()
+    tasks.tasks = todotxt.parse_many(lines, 0, lazy, tasks.date_pool)
+    if touch:
+        for task in tasks:
+            task.todo
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tasks
+    return size
+
+
+def main(count=100000):
+    lines = todo_lines(count)
+    text = sum(sys.getsizeof(x) for x in lines) / float(count)
+    print("tasks: {0}, source line object: {1:.0f} bytes/task"
+          .format(count, text))
+    for label, lazy, touch in (("Task", False, False),
+                               ("CompactTask (unparsed)", True, False),
+                               ("CompactTask (parsed)", True, True)):
+        size = measure(lines, lazy, touch)
+        print("{0:<24}{1:>8.0f} bytes/task".format(label, size / float(count)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Compares Tasks.query (indexed and full scan) with chained filter_by
+calls and hand-written loops.
+
+    python -m benchmarks.bench_query [count]
+"""
+from __future__ import print_function
+import sys
+import timeit
+
+import todotxt
+from benchmarks.common import todo_lines
+
+REPEAT = 5
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+def main(count=100000):
+    lines = todo_lines(count)
+    plain = todotxt.Tasks(tasks=todotxt.parse_many(lines))
+    indexed = todotxt.Tasks(tasks=list(plain.tasks), indexed=True)
+    today = todotxt.date_value("2016-06-30")
+
+    cases = [
+        ("+clientX @phone",
+         lambda: list(plain.filter_by("+clientX").filter_by("@phone")),
+         lambda: [x for x in plain if "+clientX" in x.projects
+                  and "@phone" in x.contexts]),
+        ("pri:A +work -finished due<=2016-06-30",
+         lambda: list(plain.filter_by("(A)").filter_by("+work")),
+         lambda: [x for x in plain if x.priority == "A"
+                  and "+work" in x.projects and not x.finished
+                  and x.due_date is not None and x.due_date <= today]),
+        ('"review" @office',
+         lambda: list(plain.filter_by("review").filter_by("@office")),
+         None),
+    ]
+
+    print("tasks: {0}".format(count))
+    for query, chained, loop in cases:
+        print("\n" + indexed.explain(query))
+        print("  query (indexed) {0:9.2f} ms".format(
+            best(lambda: indexed.query(query)) * 1000))
+        print("  query (scan)    {0:9.2f} ms".format(
+            best(lambda: plain.query(query)) * 1000))
+        print("  chained filter_by {0:7.2f} ms".format(best(chained) * 1000))
+        if loop is not None:
+            print("  python loop     {0:9.2f} ms".format(best(loop) * 1000))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tasks.save() of an untouched collection (cached lines) vs. one whose
+tasks all changed, and a plain copy of the file.
+
+    python -m benchmarks.bench_save [count ...]
+
+Default counts: 10000 100000.
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import todotxt
+from benchmarks.common import todo_lines
+
+
+def best(func, prepare=None, repeat=5):
+    times = []
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def touch_all(tasks):
+    for task in tasks:
+        task.priority = "B" if task.priority == "A" else "A"
+
+
+def main(counts=(10000, 100000)):
+    directory = tempfile.mkdtemp()
+    try:
+        print("{0:>9}{1:>11}{2:>13}{3:>13}{4:>13}".format(
+            "tasks", "copy (ms)", "untouched", "lazy", "all changed"))
+        for count in counts:
+            path = os.path.join(directory, "todo{0}.txt".format(count))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(todo_lines(count)) + "\n")
+            copy = best(lambda: shutil.copyfile(path, path + ".copy"))
+
+            tasks = todotxt.Tasks(path)
+            tasks.load()
+            untouched = best(tasks.save)
+            changed = best(tasks.save, lambda: touch_all(tasks.tasks))
+
+            lazy_tasks = todotxt.Tasks(path)
+            lazy_tasks.load(lazy=True)
+            lazy = best(lazy_tasks.save)
+            print("{0:>9}{1:>11.1f}{2:>13.1f}{3:>13.1f}{4:>13.1f}".format(
+                count, copy * 1e3, untouched * 1e3, lazy * 1e3,
+                changed * 1e3))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or (10000, 100000))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Full-text search (todotxt.fulltext) vs. the substring scan of
+filter_by() over archived tasks.
+
+    python -m benchmarks.bench_search [count ...]
+
+Default counts: 100000 1000000. The scan is Task.matches() over every
+task (case-sensitive substring); the index search returns the 10 best
+matches.
+"""
+from __future__ import print_function
+import sys
+import time
+
+from todotxt import parse_many
+from todotxt.fulltext import FullTextIndex
+from benchmarks.common import todo_lines
+
+# (label, substring for the scan, full-text query)
+QUERIES = (("unique id", "#{0} ", "{0}"),
+           ("two words", "invoice", "invoice draft"),
+           ("phrase", "write report", "\"write report\""),
+           ("CJK word", "テスト", "テスト"))
+
+
+def best(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        retval = func()
+        times.append(time.perf_counter() - start)
+    return min(times), retval
+
+
+def main(counts=(100000, 1000000)):
+    print("{0:>9}  {1:<10}{2:>10}{3:>12}{4:>10}".format(
+        "tasks", "query", "scan (ms)", "index (ms)", "matches"))
+    for count in counts:
+        tasks = parse_many(todo_lines(count))
+        start = time.perf_counter()
+        index = FullTextIndex()
+        index.replace_archived(tasks)
+        print("{0:>9}  {1:<10}{2:>10}{3:>12.1f}   ({4} terms)".format(
+            count, "build", "", (time.perf_counter() - start) * 1e3,
+            len(index.postings)))
+        for label, text, query in QUERIES:
+            text = text.format(count // 2)
+            query = query.format(count // 2)
+            scan, found = best(
+                lambda: [x for x in tasks if x.matches(text)], 1)
+            seconds, _ = best(lambda: index.search(query, 10))
+            print("{0:>9}  {1:<10}{2:>10.1f}{3:>12.3f}{4:>10}".format(
+                count, label, scan * 1e3, seconds * 1e3, len(found)))
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or (100000, 1000000))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Startup time of Tasks.load(): cold parse vs. warm snapshot.
+
+    python -m benchmarks.bench_snapshot [count ...]
+
+Default counts: 10000 100000 1000000.
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import todotxt
+from benchmarks.common import todo_lines
+
+
+def load_time(path, snapshot):
+    start = time.perf_counter()
+    tasks = todotxt.Tasks(path, snapshot=snapshot)
+    tasks.load()
+    return time.perf_counter() - start, len(tasks)
+
+
+def main(counts=(10000, 100000, 1000000)):
+    directory = tempfile.mkdtemp()
+    try:
+        print("{0:>9}{1:>12}{2:>14}{3:>12}{4:>9}".format(
+            "tasks", "parse (s)", "snapshot (s)", "write (s)", "speedup"))
+        for count in counts:
+            path = os.path.join(directory, "todo{0}.txt".format(count))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(todo_lines(count)) + "\n")
+
+            cold, _ = load_time(path, False)
+            # a load without a current snapshot parses and writes one
+            first, _ = load_time(path, True)
+            warm, loaded = load_time(path, True)
+            assert loaded == count
+            print("{0:>9}{1:>12.3f}{2:>14.3f}{3:>12.3f}{4:>8.1f}x".format(
+                count, cold, warm, max(first - cold, 0.0), cold / warm))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or (10000, 100000, 1000000))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Scaling of Workspace.load() with the number of worker processes.
+
+    python -m benchmarks.bench_workspace [files] [tasks per file]
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import todotxt
+from benchmarks.common import todo_lines
+
+WORKERS = (1, 2, 4, 8)
+
+
+def main(files=32, count=20000):
+    root = tempfile.mkdtemp()
+    try:
+        for i in range(files):
+            directory = os.path.join(root, "team{0:02d}".format(i))
+            os.makedirs(directory)
+            with open(os.path.join(directory, "todo.txt"), "w",
+                      encoding="utf-8") as f:
+                f.write("\n".join(todo_lines(count, seed=i)) + "\n")
+
+        print("{0} files x {1} tasks, {2} CPUs".format(
+            files, count, os.cpu_count()))
+        base = None
+        for workers in WORKERS:
+            workspace = todotxt.Workspace.discover(root)
+            start = time.perf_counter()
+            workspace.load(workers=workers)
+            elapsed = time.perf_counter() - start
+            assert len(workspace) == files * count
+            base = elapsed if base is None else base
+            print("workers {0}: {1:8.3f} s  x{2:.2f}".format(
+                workers, elapsed, base / elapsed))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
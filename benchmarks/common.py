@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""Shared helpers of the benchmark scripts."""
+
+from benchmarks.generate import TodoGenerator
+
+
+def todo_lines(count, seed=0, finished_ratio=0.3):
+    """Returns count deterministic todo.txt lines (benchmarks.generate,
+    ISO dates only, so that they do not depend on the current day)."""
+    generator = TodoGenerator(seed, finished_ratio, relative_ratio=0.0)
+    return list(generator.lines(count))
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Deterministic synthetic todo.txt / done.txt files.
+
+    python -m benchmarks.generate DIRECTORY COUNT [--seed N] [--done N]
+
+The same seed gives the same lines on every run and platform (only
+random.Random is used). The lines cover priorities, English and CJK
+words, created / finished dates, t: / due: tags with ISO dates and
+relative keywords, rec: tags (strict and business day) and skewed
+project / context usage: tag k is picked with a weight of 1 / k ** skew,
+so a few tags are on most tasks and many are rare.
+"""
+from __future__ import print_function
+import argparse
+import itertools
+import os
+import random
+from datetime import date, timedelta
+
+WORDS = ["call", "write", "review", "report", "fix", "buy", "meeting",
+         "plan", "invoice", "draft", "update", "check", "send", "prepare"]
+CJK_WORDS = ["テスト", "タスク", "展開", "会議", "資料",
+             "確認", "請求書", "買い物", "报告", "检查"]
+PROJECT_NAMES = ["work", "home", "家計簿", "clientX", "q3", "garden",
+                 "ててて", "release", "tstprj", "prj"]
+CONTEXT_NAMES = ["office", "home", "phone", "errand", "pc", "会社"]
+RELATIVE_DATES = ["today", "tomorrow", "yesterday", "mon", "fri",
+                  "sunday"]
+
+BASE_DAY = date(2016, 1, 1)
+SPAN_DAYS = 3 * 365
+CHUNK_LINES = 10000     # lines per write when generating files
+
+
+def tag_names(prefix, names, count):
+    """Returns count tag names: the given names first, then numbered."""
+    retval = [prefix + x for x in names[:count]]
+    retval.extend("{0}tag{1}".format(prefix, x)
+                  for x in range(len(retval), count))
+    return retval
+
+
+class TodoGenerator(object):
+    """Generator of todo.txt lines, see the module documentation."""
+
+    def __init__(self, seed=0, finished_ratio=0.3, cjk_ratio=0.2,
+                 relative_ratio=0.05, projects=60, contexts=15, skew=1.2):
+        """
+            Args:
+                seed(=0): random seed.
+                finished_ratio(=0.3): share of finished tasks in lines().
+                cjk_ratio(=0.2): share of tasks with CJK words.
+                relative_ratio(=0.05): share of t:/due: tags with a
+                    relative keyword instead of an ISO date.
+                projects(=60), contexts(=15): number of distinct tags.
+                skew(=1.2): exponent of the tag weights.
+        """
+        self.seed = seed
+        self.finished_ratio = finished_ratio
+        self.cjk_ratio = cjk_ratio
+        self.relative_ratio = relative_ratio
+        self.projects = tag_names("+", PROJECT_NAMES, projects)
+        self.contexts = tag_names("@", CONTEXT_NAMES, contexts)
+        self._project_weights = list(itertools.accumulate(
+            1.0 / (x + 1) ** skew for x in range(projects)))
+        self._context_weights = list(itertools.accumulate(
+            1.0 / (x + 1) ** skew for x in range(contexts)))
+        self._days = [(BASE_DAY + timedelta(days=x)).isoformat()
+                      for x in range(SPAN_DAYS + 60)]
+
+    def _tags(self, rnd, names, weights, count):
+        picked = rnd.choices(names, cum_weights=weights, k=count)
+        return sorted(set(picked), key=picked.index)
+
+    def _due(self, rnd, day):
+        if rnd.random() < self.relative_ratio:
+            return rnd.choice(RELATIVE_DATES)
+        return self._days[day + rnd.randint(0, 45)]
+
+    def line(self, rnd, number, finished=None):
+        """Returns one line.
+
+            Args:
+                rnd: random.Random, the state advances.
+                number: the line number, written as a "#number" word.
+                finished(=None): force a finished / open task, default
+                    finished_ratio.
+        """
+        if finished is None:
+            finished = rnd.random() < self.finished_ratio
+        created = rnd.randrange(SPAN_DAYS)
+        parts = []
+        if finished:
+            parts.append("x " + self._days[created + rnd.randint(0, 14)])
+        if rnd.random() < 0.6:
+            parts.append("(" + rnd.choice("ABCDE") + ")")
+        if rnd.random() < 0.8:
+            parts.append(self._days[created])
+        words = CJK_WORDS if rnd.random() < self.cjk_ratio else WORDS
+        parts.extend(rnd.choice(words) for _ in range(rnd.randint(2, 6)))
+        parts.append("#{0}".format(number))
+        parts.extend(self._tags(rnd, self.projects, self._project_weights,
+                                rnd.choice((0, 1, 1, 1, 2, 3))))
+        parts.extend(self._tags(rnd, self.contexts, self._context_weights,
+                                rnd.choice((0, 1, 1, 2))))
+        if rnd.random() < 0.15:
+            parts.append("t:" + self._due(rnd, created))
+        if rnd.random() < 0.5:
+            parts.append("due:" + self._due(rnd, created))
+        if rnd.random() < 0.1:
+            parts.append("rec:{0}{1}{2}".format(
+                "+" if rnd.random() < 0.3 else "", rnd.randint(1, 4),
+                rnd.choice("dwmyb")))
+        return " ".join(parts)
+
+    def lines(self, count, seed_offset=0, finished=None):
+        """Yields count lines (todo.txt content)."""
+        rnd = random.Random(self.seed * 1000003 + seed_offset)
+        for number in range(count):
+            yield self.line(rnd, number, finished)
+
+    def done_lines(self, count):
+        """Yields count finished lines (done.txt content)."""
+        return self.lines(count, seed_offset=1, finished=True)
+
+    def write(self, path, lines):
+        """Writes lines to path (UTF-8, "\\n"), in chunks."""
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            while True:
+                chunk = list(itertools.islice(lines, CHUNK_LINES))
+                if not chunk:
+                    break
+                f.write("\n".join(chunk) + "\n")
+
+
+def generate(directory, count, done_count=None, seed=0, **kwargs):
+    """Writes directory/todo.txt (count lines) and directory/done.txt
+    (done_count lines, default count).
+
+        Args:
+            kwargs: TodoGenerator options.
+
+        Returns: (todo.txt path, done.txt path)
+    """
+    generator = TodoGenerator(seed, **kwargs)
+    todo = os.path.join(directory, "todo.txt")
+    done = os.path.join(directory, "done.txt")
+    generator.write(todo, generator.lines(count))
+    generator.write(done, generator.done_lines(
+        count if done_count is None else done_count))
+    return todo, done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.generate",
+        description="Writes synthetic todo.txt and done.txt files.")
+    parser.add_argument("directory")
+    parser.add_argument("count", type=int, help="lines of todo.txt")
+    parser.add_argument("--done", type=int, default=None,
+                        help="lines of done.txt (default: count)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        os.makedirs(args.directory)
+    for path in generate(args.directory, args.count, args.done, args.seed):
+        print("{0}: {1} bytes".format(path, os.path.getsize(path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite of the main Tasks operations, with JSON results.
+
+    python -m benchmarks.suite run [--sizes 1000 100000] [--cases load,save]
+                                   [--repeat 3] [--seed 0] [--no-memory]
+                                   [--output results.json]
+    python -m benchmarks.suite compare base.json new.json [--threshold 0.1]
+
+run generates todo.txt / done.txt files of each size (benchmarks.generate,
+so the data is the same on every run) and times every case. A result
+holds the best and median time of --repeat runs, the throughput (units
+per second of the best time, units are tasks or calls) and the peak
+memory allocated by the case (tracemalloc, one extra run).
+
+compare matches the results of two runs by case and size, prints the
+time and memory ratios and flags a regression when a ratio is above
+1 + threshold (and, for time, the slowdown is above NOISE_SECONDS).
+The exit status is 1 if anything regressed.
+"""
+from __future__ import print_function
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import todotxt
+from benchmarks.generate import generate
+
+SIZES = (1000, 10000, 100000)
+REPEAT = 3
+THRESHOLD = 0.10
+NOISE_SECONDS = 0.001   # slowdowns below this are timer noise
+
+
+class Context(object):
+    """Generated files of one size and their parsed tasks."""
+
+    def __init__(self, directory, size, seed):
+        self.size = size
+        self.todo, self.done = generate(directory, size, seed=seed)
+        self.output = os.path.join(directory, "saved.txt")
+        self.tasks = todotxt.Tasks(self.todo, self.done)
+        self.tasks.load()
+
+    def copy(self):
+        """Returns a new Tasks object of the parsed tasks (fresh caches)."""
+        return todotxt.Tasks(self.todo, self.done, list(self.tasks.tasks))
+
+
+# Each case prepares a run from a Context outside the timing and returns
+# (the function to time, units). prepare is called again for every run, so
+# a case may change what it prepared.
+
+def case_load(context):
+    tasks = todotxt.Tasks(context.todo)
+    return tasks.load, context.size
+
+
+def case_parse(context):
+    tasks = context.tasks.tasks
+
+    def run():
+        for task in tasks:
+            task.parse()
+    return run, len(tasks)
+
+
+def case_save(context):
+    tasks = context.copy()
+    return (lambda: tasks.save(context.output)), len(tasks)
+
+
+def case_filter_by(context):
+    tasks = context.tasks
+    # filter_by() filters lazily, list() runs it
+    return (lambda: list(tasks.filter_by("+work"))), len(tasks)
+
+
+def case_order_by(context):
+    tasks = context.copy()      # no cached ordering
+    return (lambda: tasks.order_by("due_date", "-priority", "tid")), \
+        len(tasks)
+
+
+def case_archive(context):
+    tasks = context.copy()
+    return tasks.archive, len(tasks)
+
+
+def case_create_recursive_tasks(context):
+    tasks = context.copy()
+    return tasks.create_recursive_tasks, len(tasks)
+
+
+def case_get_projects(context):
+    tasks = context.tasks
+    return tasks.get_projects, len(tasks)
+
+
+def case_bizdate_add(context):
+    starts = [x.created_date or x.due_date or datetime(2016, 1, 1)
+              for x in context.tasks]
+    counts = [1 + x % 20 for x in range(len(starts))]
+    todotxt.get_calendar()      # build the default calendar once
+
+    def run():
+        bizdate_add = todotxt.bizdate_add
+        for start, count in zip(starts, counts):
+            bizdate_add(start, count)
+    return run, len(starts)
+
+
+CASES = [
+    ("load", case_load),
+    ("parse", case_parse),
+    ("save", case_save),
+    ("filter_by", case_filter_by),
+    ("order_by", case_order_by),
+    ("archive", case_archive),
+    ("create_recursive_tasks", case_create_recursive_tasks),
+    ("get_projects", case_get_projects),
+    ("bizdate_add", case_bizdate_add),
+]
+
+
+def measure(prepare, context, repeat, memory):
+    """Runs a case repeat times (plus once traced if memory).
+
+        Returns: dict of the result fields.
+    """
+    times = []
+    units = 0
+    for _ in range(repeat):
+        func, units = prepare(context)
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    best = min(times)
+    retval = {"seconds": best, "median": statistics.median(times),
+              "units": units,
+              "throughput": units / best if best > 0 else None,
+              "peak_bytes": None}
+    if memory:
+        func, _ = prepare(context)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            retval["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return retval
+
+
+def run(sizes=SIZES, cases=None, repeat=REPEAT, seed=0, memory=True,
+        out=sys.stdout):
+    """Runs the suite.
+
+        Args:
+            sizes: task counts to generate.
+            cases(=None): names of the cases to run, default all.
+
+        Returns: the results document (dict, see save_results()).
+    """
+    selected = [x for x in CASES if cases is None or x[0] in cases]
+    unknown = set(cases or ()) - set(x[0] for x in CASES)
+    if unknown:
+        raise ValueError("unknown cases: {0}".format(sorted(unknown)))
+
+    results = []
+    for size in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            context = Context(directory, size, seed)
+            for name, prepare in selected:
+                result = measure(prepare, context, repeat, memory)
+                result.update({"case": name, "size": size})
+                results.append(result)
+                print(format_result(result), file=out)
+            del context
+        finally:
+            shutil.rmtree(directory)
+
+    return {"meta": {"python": platform.python_version(),
+                     "implementation": platform.python_implementation(),
+                     "platform": platform.platform(),
+                     "cpus": os.cpu_count(),
+                     "date": datetime.now().isoformat(timespec="seconds"),
+                     "seed": seed, "repeat": repeat, "sizes": list(sizes)},
+            "results": results}
+
+
+def format_result(result):
+    peak = result["peak_bytes"]
+    return "{0:<24}{1:>10}{2:>12.4f} s{3:>14} /s{4:>12}".format(
+        result["case"], result["size"], result["seconds"],
+        "{0:,.0f}".format(result["throughput"])
+        if result["throughput"] else "-",
+        "{0:,.1f} MB".format(peak / 1e6) if peak is not None else "-")
+
+
+def save_results(document, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(base, new, threshold=THRESHOLD):
+    """Compares two results documents.
+
+        Returns: list of (case, size, time ratio, memory ratio or None,
+            regressed), for the (case, size) pairs in both documents.
+    """
+    old = dict(((x["case"], x["size"]), x) for x in base["results"])
+    retval = []
+    for result in new["results"]:
+        before = old.get((result["case"], result["size"]))
+        if before is None:
+            continue
+        time_ratio = result["seconds"] / before["seconds"] \
+            if before["seconds"] > 0 else 1.0
+        memory_ratio = None
+        if result["peak_bytes"] is not None and before["peak_bytes"]:
+            memory_ratio = float(result["peak_bytes"]) / before["peak_bytes"]
+        slower = result["seconds"] - before["seconds"] > NOISE_SECONDS
+        regressed = time_ratio > 1 + threshold and slower or (
+            memory_ratio is not None and memory_ratio > 1 + threshold)
+        retval.append((result["case"], result["size"], time_ratio,
+                       memory_ratio, regressed))
+    return retval
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    command = commands.add_parser("run", help="run the benchmarks")
+    command.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    command.add_argument("--cases", default=None,
+                         help="comma separated, default: all of {0}".format(
+                             ",".join(x[0] for x in CASES)))
+    command.add_argument("--repeat", type=int, default=REPEAT)
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--no-memory", action="store_true",
+                         help="skip the tracemalloc run (faster)")
+    command.add_argument("--output", "-o", default=None,
+                         help="write the results as JSON")
+
+    command = commands.add_parser("compare",
+                                  help="compare two JSON result files")
+    command.add_argument("base")
+    command.add_argument("new")
+    command.add_argument("--threshold", type=float, default=THRESHOLD,
+                         help="allowed slowdown / growth (default 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        document = run(args.sizes,
+                       args.cases.split(",") if args.cases else None,
+                       args.repeat, args.seed, not args.no_memory)
+        if args.output:
+            save_results(document, args.output)
+        return 0
+
+    rows = compare(load_results(args.base), load_results(args.new),
+                   args.threshold)
+    for case, size, time_ratio, memory_ratio, regressed in rows:
+        print("{0:<24}{1:>10}  time x{2:<6.2f} memory {3:<8}{4}".format(
+            case, size, time_ratio,
+            "x{0:.2f}".format(memory_ratio) if memory_ratio is not None
+            else "-", "REGRESSION" if regressed else ""))
+    regressions = sum(1 for x in rows if x[4])
+    print("{0} of {1} results regressed (threshold {2:.0%})".format(
+        regressions, len(rows), args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,10 +30,9 @@ print("\n-- Completed Recursive Task has no new Task create recursive" + \
       " and archive.")
 tasks.load()
 cnt = 0
-for i in [x for x in tasks if x.recursive and x.finished]:
-    if len([y for y in tasks if not y.finished and y.todo == i.todo]) == 0:
-        print("[Rec]:{0}".format(i.raw_todo))
-        cnt += 1
+for i in tasks.pending_recurrences():
+    print("[Rec]:{0}".format(i.raw_todo))
+    cnt += 1
 
 modify_flag = False
 if cnt > 0:
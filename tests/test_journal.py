@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Journaled Tasks (todotxt.journal) against files in a temporary
+directory: replay, fingerprint mismatches, crash recovery and a Tasks
+object reading a journal that a journaled one is writing."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import todotxt
+from todotxt import journal
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "todo.txt")
+        self.archive_path = os.path.join(self.directory, "done.txt")
+        self.journal_path = self.path + journal.JOURNAL_SUFFIX
+        self.write(self.path, "a\nb\nc\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def load(self, journaled=True):
+        tasks = todotxt.Tasks(self.path, self.archive_path,
+                              journal=journaled)
+        tasks.load()
+        return tasks
+
+    def raw(self, tasks):
+        return [x.raw_todo for x in tasks]
+
+    def edit(self):
+        """Adds, changes and deletes a task of a journaled Tasks object,
+        returns it."""
+        tasks = self.load()
+        tasks.add("d")
+        tasks[0] = todotxt.Task("A")
+        del tasks[1]
+        tasks.save()
+        return tasks
+
+    def test_replay(self):
+        self.edit()
+        self.assertEqual(self.read(self.path), "a\nb\nc\n")
+        self.assertEqual(self.raw(self.load()), ["A", "c", "d"])
+
+    def test_compact(self):
+        tasks = self.edit()
+        tasks.compact()
+        self.assertFalse(os.path.exists(self.journal_path))
+        self.assertEqual(self.read(self.path), "A\nc\nd\n")
+        self.assertEqual(self.raw(self.load()), ["A", "c", "d"])
+
+    def test_compact_leftover(self):
+        tasks = self.edit()
+        tasks.journal.close()   # the journaled Tasks object is gone
+        self.assertEqual(self.raw(self.load(False)), ["A", "c", "d"])
+        self.assertFalse(os.path.exists(self.journal_path))
+        self.assertEqual(self.read(self.path), "A\nc\nd\n")
+
+    def test_fingerprint_mismatch(self):
+        self.edit()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("e\n")
+        with self.assertRaises(journal.JournalConflict) as raised:
+            self.load()
+        conflict = self.journal_path + journal.CONFLICT_SUFFIX
+        self.assertEqual(raised.exception.path, conflict)
+        self.assertFalse(os.path.exists(self.journal_path))
+        self.assertIn('"raw": "d"', self.read(conflict))
+        self.assertEqual(self.raw(self.load()), ["a", "b", "c", "e"])
+
+    def test_finished_compaction(self):
+        tasks = self.edit()
+        # crash after todo.txt was written, before the journal was removed
+        with mock.patch.object(journal.Journal, "remove"):
+            tasks.compact()
+        self.assertTrue(os.path.exists(self.journal_path))
+        self.assertEqual(self.raw(self.load()), ["A", "c", "d"])
+        self.assertFalse(os.path.exists(self.journal_path))
+
+    def test_interrupted_compaction(self):
+        self.write(self.archive_path, "x a\n")
+        tasks = self.load()
+        tasks.complete(0)
+        tasks.archive()
+        tasks.save()
+        # crash after done.txt was appended to, before todo.txt was written
+        with mock.patch.object(journal, "atomic_write",
+                               side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                tasks.compact()
+        tasks.journal.close()
+        self.assertEqual(self.read(self.path), "a\nb\nc\n")
+
+        tasks = self.load()
+        self.assertEqual(self.read(self.archive_path), "x a\n")
+        self.assertEqual(self.raw(tasks), ["b", "c"])
+        tasks.compact()
+        archived = self.read(self.archive_path).splitlines()
+        self.assertEqual(len(archived), 2)
+        self.assertEqual(archived[0], "x a")
+        self.assertTrue(archived[1].endswith(" a"))
+
+    def test_truncated_tail(self):
+        self.edit()
+        with open(self.journal_path, "ab") as f:
+            f.write(b'{"op": "add", "ra')
+        self.assertEqual(self.raw(self.load()), ["A", "c", "d"])
+
+    def test_concurrent_reader(self):
+        writer = self.edit()
+        reader = self.load(False)
+        self.assertEqual(self.raw(reader), ["A", "c", "d"])
+        # the writer has the journal open: the reader leaves it alone
+        self.assertTrue(os.path.exists(self.journal_path))
+        self.assertEqual(self.read(self.path), "a\nb\nc\n")
+
+        writer.add("e")
+        writer.save()
+        self.assertEqual(self.raw(self.load()), ["A", "c", "d", "e"])
+
+
+if __name__ == "__main__":
+    unittest.main()
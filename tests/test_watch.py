@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Tasks.watch() against files in a temporary directory, with inotify
+(when available) and with stat polling."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+import todotxt
+from todotxt.watch import _libc
+
+DEBOUNCE = 0.05
+INTERVAL = 0.02
+TIMEOUT = 5.0
+
+
+class WatchTest(unittest.TestCase):
+
+    inotify = False
+
+    def setUp(self):
+        if self.inotify and _libc() is None:
+            self.skipTest("inotify is not available")
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "todo.txt")
+        self.write(self.path, "a\nb\n")
+        self.tasks = todotxt.Tasks(self.path)
+        self.tasks.load()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def run_watch(self, *changes):
+        """Applies each change (a coroutine function) to the directory and
+        returns the Deltas the watch yields after them."""
+        async def run():
+            stream = self.tasks.watch(DEBOUNCE, INTERVAL, self.inotify)
+            deltas = []
+            try:
+                for change in changes:
+                    pending = asyncio.ensure_future(stream.__anext__())
+                    await asyncio.sleep(DEBOUNCE)   # the watcher is set up
+                    await change()
+                    deltas.append(await asyncio.wait_for(pending, TIMEOUT))
+            finally:
+                await stream.aclose()
+            return deltas
+        return asyncio.run(run())
+
+    def raw(self, tasks):
+        return [x.raw_todo for x in tasks]
+
+    def test_edit(self):
+        async def append():
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("c\n")
+        delta, = self.run_watch(append)
+        self.assertEqual(self.raw(delta.added), ["c"])
+        self.assertEqual(self.raw(self.tasks), ["a", "b", "c"])
+
+    def test_atomic_replace(self):
+        async def replace():
+            temp = os.path.join(self.directory, ".todo.txt.tmp")
+            self.write(temp, "a\nB\n")
+            os.replace(temp, self.path)
+        delta, = self.run_watch(replace)
+        self.assertEqual([(x.raw_todo, y.raw_todo) for x, y in delta.changed],
+                         [("b", "B")])
+        self.assertEqual(self.raw(self.tasks), ["a", "B"])
+
+    def test_delete_and_recreate(self):
+        async def delete_and_recreate():
+            os.remove(self.path)
+            # refreshed while the file is missing, the watch keeps going
+            await asyncio.sleep(DEBOUNCE * 4)
+            self.write(self.path, "a\nb\nd\n")
+
+        async def append():
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("e\n")
+        first, second = self.run_watch(delete_and_recreate, append)
+        self.assertEqual(self.raw(first.added), ["d"])
+        self.assertEqual(self.raw(second.added), ["e"])
+        self.assertEqual(self.raw(self.tasks), ["a", "b", "d", "e"])
+
+
+class InotifyWatchTest(WatchTest):
+
+    inotify = True
+
+
+if __name__ == "__main__":
+    unittest.main()
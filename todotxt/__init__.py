@@ -1,10 +1,27 @@
 # -*- coding: utf-8 -*-
 """The main endpoint for todotxt."""
 
+from collections import namedtuple
 from datetime import datetime, date, timedelta
 from operator import attrgetter
+import asyncio
+import hashlib
+import heapq
 import re
-import codecs
+import os
+import sys
+import time
+import threading
+
+from todotxt.journal import Journal, JournalConflict, JOURNAL_SUFFIX, \
+    apply_record, read_bytes
+from todotxt.index import TaskIndex
+from todotxt.fulltext import FullTextIndex
+from todotxt.bizcal import BusinessCalendar, register_calendar, \
+    get_named_calendar
+from todotxt.stats import Stats, active as _active_stats
+from todotxt.encoding import read_file, release, decode, encode, \
+    split_lines, append_data
 
 DATE_REGEX = "([\\d]{4})-([\\d]{2})-([\\d]{2})"
 CONTEXT_REGEX = "\\s(@\\S+)"    # Unicode Contexts hit
@@ -21,6 +38,77 @@ RECURSIVE_SIG = "rec:"
 
 HOLIDAY_TBL = []    # type: List[str]  ##list of "YYYY-MM-DD" formated string
 
+# seconds after a load in which an unchanged size and mtime do not prove
+# an unchanged file (coarse mtime resolution), refresh() compares hashes
+RACY_SECONDS = 2.0
+
+
+class Delta(namedtuple("Delta", ["added", "removed", "changed"])):
+    """The "loaded" payload: lists of added and removed Task, and of
+    (old Task, new Task) pairs for changed lines. stats is the Stats of the
+    load of an instrumented collection, else None."""
+
+    stats = None
+
+
+DATE_PATTERN = re.compile(DATE_REGEX)
+ISO_DATE_PATTERN = re.compile("^" + DATE_REGEX + "$")
+# a due:/t: value that is not an ISO date (it expands when parsed); the
+# leading ":" makes the search skip quickly to candidates
+EXPANDED_DATE_PATTERN = re.compile(
+    ":(?:(?<=(?<![^ ])due:)|(?<=(?<![^ ])t:))"
+    "(?!\\d{4}-\\d{2}-\\d{2}(?: |$))")
+CONTEXT_PATTERN = re.compile(CONTEXT_REGEX)
+PROJECT_PATTERN = re.compile(PROJECT_REGEX)
+# whitespace other than " ", the only character raw_todo is split on.
+ODD_SPACE_PATTERN = re.compile("[^\\S ]")
+
+
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5,
+            "sun": 6, "monday": 0, "tuesday": 1, "wednesday": 2,
+            "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
+DAY_KEYWORDS = {"today": 0, "tomorrow": 1, "yesterday": -1}
+
+DATE_CACHE_LIMIT = 1 << 16  # date_value() cache entries before it is reset
+_date_cache = {}            # type: Dict[str, datetime]
+_relative_cache = {}        # type: Dict[str, datetime]  ## keyword results
+_today = [None, 0.0]        # [today (datetime), timestamp of next midnight]
+
+
+def _today_value():
+    """Returns today (datetime at midnight). The value is cached until the
+    next local midnight, when the keyword cache is reset as well."""
+    if time.time() >= _today[1]:
+        today = datetime(*datetime.today().timetuple()[:3])
+        _today[0] = today
+        _today[1] = time.mktime((today + timedelta(days=1)).timetuple())
+        _relative_cache.clear()
+    return _today[0]
+
+
+def _iso_date(text):
+    """Returns the shared datetime of a "YYYY-MM-DD" string."""
+    retval = _date_cache.get(text)
+    if retval is None:
+        if len(_date_cache) >= DATE_CACHE_LIMIT:
+            _date_cache.clear()
+        retval = _date_cache[text] = \
+            datetime(int(text[:4]), int(text[5:7]), int(text[8:10]))
+    return retval
+
+
+def format_date(value):
+    """Formats a date field value as "YYYY-MM-DD".
+
+      Args: value / datetime.datetime or datetime.date, or a str accepted by
+        date_value()
+
+      Returns: str
+    """
+    if not isinstance(value, date):
+        value = date_value(value)
+    return "%04d-%02d-%02d" % (value.year, value.month, value.day)
+
 
 def date_value(arg_date):
     """
@@ -31,45 +119,91 @@ def date_value(arg_date):
       - monday, tuesday, wednesday, thursday, friday, saturday, sunday
       - today, tommorow, yesterday
 
+      ISO dates resolve to shared datetime objects, keywords are resolved
+      against a "today" that is cached until midnight.
+
       Args: arg_date / str or datetime.datetime or datetime.date
 
       Returns: datetime.datetime
     """
-    _weekdays = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5,
-                 "sun": 6, "monday": 0, "tuesday": 1, "wednesday": 2,
-                 "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6}
-
-    _keywords = {"today": 0, "tomorrow": 1, "yesterday": -1}
-
-    retval = None
     if isinstance(arg_date, date):  # datetime or date
-        arg_date = arg_date.strftime("%Y-%m-%d")
-    else:
-        arg_date = arg_date.replace("/", "-")
+        if type(arg_date) is datetime and not (
+                arg_date.hour or arg_date.minute or arg_date.second
+                or arg_date.microsecond or arg_date.tzinfo):
+            return arg_date
+        return datetime(arg_date.year, arg_date.month, arg_date.day)
+
+    retval = _date_cache.get(arg_date)
+    if retval is not None:
+        return retval
 
-    match = re.search(DATE_REGEX, arg_date)     # ISO-Format Date
+    arg_date = arg_date.replace("/", "-")
+    if len(arg_date) == 10 and arg_date[4] == "-" and arg_date[7] == "-" \
+            and arg_date[:4].isdigit() and arg_date[5:7].isdigit() \
+            and arg_date[8:].isdigit():
+        return _iso_date(arg_date)      # fixed-width fast path
+
+    match = DATE_PATTERN.search(arg_date)     # ISO-Format Date
     if match is not None:
-        retval = datetime.strptime(match.group(0), "%Y-%m-%d")
+        return _iso_date(match.group(0))
 
-    elif arg_date in _weekdays:
-        today = datetime(*datetime.today().timetuple()[:3])
+    today = _today_value()
+    retval = _relative_cache.get(arg_date)
+    if retval is not None:
+        return retval
+
+    if arg_date in WEEKDAYS:
         wdtdy = today.weekday()
-        wdtgt = _weekdays[arg_date]
+        wdtgt = WEEKDAYS[arg_date]
         retval = today + timedelta(days=(wdtgt - wdtdy
                                          + (7 if wdtgt < wdtdy else 0)))
 
-    elif arg_date in _keywords:
-        retval = datetime(*datetime.today().timetuple()[:3]) \
-                 + timedelta(days=_keywords[arg_date])
+    elif arg_date in DAY_KEYWORDS:
+        retval = today + timedelta(days=DAY_KEYWORDS[arg_date])
 
+    if retval is not None:
+        _relative_cache[arg_date] = retval
     return retval
 
 
-def bizdate_add(start=None, addcnt=1):
+_default_calendar = [None, None]    # [HOLIDAY_TBL snapshot, calendar]
+
+
+def get_calendar(calendar=None):
+    """Returns a BusinessCalendar.
+
+        Args:
+            calendar(=None): a BusinessCalendar, the name of a calendar
+                registered with register_calendar(), or None for the
+                calendar of HOLIDAY_TBL (rebuilt when HOLIDAY_TBL changes;
+                entries that are no "YYYY-MM-DD" date are ignored).
+
+        Returns: BusinessCalendar
+    """
+    if isinstance(calendar, BusinessCalendar):
+        return calendar
+    if calendar is not None:
+        return get_named_calendar(calendar)
+
+    holidays = tuple(HOLIDAY_TBL)
+    if _default_calendar[0] != holidays:
+        valid = []
+        for i in holidays:
+            try:
+                valid.append(datetime.strptime(i, "%Y-%m-%d"))
+            except (TypeError, ValueError):
+                pass
+        _default_calendar[:] = [holidays, BusinessCalendar(valid)]
+    return _default_calendar[1]
+
+
+def bizdate_add(start=None, addcnt=1, calendar=None):
     """add date in business date.
         Args:
             start(=datetime, default:today()): base date.
             addcnt(>=0, default:1): number of add days.
+            calendar(=None): BusinessCalendar or registered calendar name,
+                default: the calendar of HOLIDAY_TBL (see get_calendar).
 
         Returns:
             added datetime (skip sat, sun and holiday)
@@ -80,35 +214,222 @@ def bizdate_add(start=None, addcnt=1):
     if start is None:
         start = datetime(*datetime.today().timetuple()[:3])
 
-    retv = start
-    for i in range(addcnt):
-        retv += timedelta(days=1)
-        while retv.weekday() >= 5 \
-            or (retv.strftime("%Y-%m-%d") in HOLIDAY_TBL):
-            # sat~sun, holiday
-            retv += timedelta(days=1)
-    return retv
+    if addcnt <= 0:
+        return start
+    return get_calendar(calendar).add(start, addcnt)
 
 
-class Task(object):
-    """A class that represents a task."""
+def tokenize(text):
+    """Sorts every token of a todo.txt line into its field in one scan.
 
-    def __init__(self, raw_todo="[dummy task]", tid=-1):
+    The result is the same as the historical multi-pass parser: the
+    first "t:", "due:" and "rec:" tags win and every occurrence of them is
+    dropped, "@"/"+" tokens are dropped from the text, and a context or
+    project is only recognised when preceded by whitespace.
 
-        self.tid = tid
-        self.raw_todo = raw_todo
-        self.priority = NO_PRIORITY_CHARACTER
-        self.todo = ""
-        self.projects = []
-        self.contexts = []
-        self.finished = False
-        self.created_date = None
-        self.finished_date = None
-        self.threshold_date = None
-        self.due_date = None
-        self.recursive = None
+        Args: text / str
 
-        self.parse()
+        Returns: tuple (finished, finished_date, priority, created_date,
+            threshold, due, recursive, contexts, projects, todo)
+            threshold / due are the raw tag values (str) or None when the
+            tag is absent.
+    """
+    splits = text.split(" ")
+    count = len(splits)
+    pos = 0
+
+    finished = False
+    finished_date = None
+    if text[:2] == "x ":
+        finished = True
+        pos = 1
+        match = DATE_PATTERN.search(splits[1])
+        if match is not None:
+            finished_date = _iso_date(match.group(0))
+            pos = 2
+
+    priority = NO_PRIORITY_CHARACTER
+    head = splits[pos] if pos < count else ""
+    if len(head) == 3 and head[0] == "(" and head[2] == ")" \
+            and "A" <= head[1] <= "Z":
+        priority = head[1]
+        pos += 1
+
+    created_date = None
+    if pos < count:
+        match = DATE_PATTERN.search(splits[pos])
+        if match is not None:
+            created_date = _iso_date(match.group(0))
+            pos += 1
+
+    # Tokens are split on " " only; tabs or full-width spaces inside a
+    # token can still delimit contexts/projects, so those lines take the
+    # regex path for tags.
+    odd_space = ODD_SPACE_PATTERN.search(text) is not None
+
+    threshold = None
+    due = None
+    recursive = None
+    contexts = []
+    projects = []
+    words = []
+    in_contexts = 0     # tokens seen by the context scan
+    in_projects = 0     # tokens seen by the project scan
+    for token in splits[pos:]:
+        if token[:2] == THRESHOLDDATE_SIG:
+            if threshold is None:
+                threshold = token[2:]
+            continue
+        if token[:4] == DUEDATE_SIG:
+            if due is None:
+                due = token[4:]
+            continue
+        if token[:4] == RECURSIVE_SIG:
+            if recursive is None:
+                recursive = token.lstrip(RECURSIVE_SIG)
+            continue
+
+        lead = token[:1]
+        if odd_space:
+            contexts.extend(CONTEXT_PATTERN.findall(
+                " " + token if in_contexts else token))
+        elif lead == "@" and in_contexts and len(token) > 1:
+            contexts.append(token)
+        in_contexts += 1
+        if lead == "@":
+            continue
+
+        if odd_space:
+            projects.extend(PROJECT_PATTERN.findall(
+                " " + token if in_projects else token))
+        elif lead == "+" and in_projects and len(token) > 1:
+            projects.append(token)
+        in_projects += 1
+        if lead == "+":
+            continue
+
+        words.append(token)
+
+    return (finished, finished_date, priority, created_date, threshold, due,
+            recursive, contexts, projects, " ".join(words).strip())
+
+
+def _file_key(path):
+    """Returns (size, mtime) of a file, (0, 0) if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except (IOError, OSError):
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+def parse_many(lines, start=0, lazy=False, date_pool=None, stripped=False):
+    """Parses todo.txt lines into Task objects in one batch.
+    Lines are stripped and empty lines are skipped, tids are numbered
+    consecutively from start.
+
+        Args:
+            lines: iterable of str
+            start(=0): tid of the first task.
+            lazy(=False): build CompactTask objects parsed on first access.
+            date_pool(=None): dict shared by CompactTask dates (lazy only).
+            stripped(=False): the lines are stripped and non-empty already
+                (encoding.split_lines()).
+
+        Returns: list of Task
+    """
+    if not stripped:
+        lines = [x for x in map(str.strip, lines) if x]
+    if lazy:
+        return [CompactTask(x, tid, date_pool)
+                for tid, x in enumerate(lines, start)]
+    return [Task(x, tid) for tid, x in enumerate(lines, start)]
+
+
+def _resolve_dates(stats, threshold, due):
+    """date_value() of a threshold and a due text (None if unset), recorded
+    in stats: the nested "dates" phase, date cache hits / misses and the
+    values that resolve to no date.
+
+        Returns: [threshold date, due date]
+    """
+    started = time.perf_counter()
+    retval = []
+    for text in (threshold, due):
+        if text is None:
+            retval.append(None)
+            continue
+        stats.count("date_cache_hits" if text in _date_cache
+                    or text in _relative_cache else "date_cache_misses")
+        value = date_value(text)
+        if value is None:
+            stats.count("parse_failures")
+        retval.append(value)
+    stats.add_time("dates", time.perf_counter() - started, nested=True)
+    return retval
+
+
+def _kept(text, value):
+    """Determines whether a due:/t: value stays in the line as written:
+    it is absent or an ISO date (keywords and offsets are expanded)."""
+    return text is None or (
+        value is not None and ISO_DATE_PATTERN.match(text) is not None)
+
+
+def match_lines(old, new):
+    """Matches the lines of two versions of a file. The common head and
+    tail are compared in place, the lines in between are matched through a
+    hash table of the old lines, so it is O(len(old) + len(new)).
+
+        Args:
+            old: list<str>
+            new: list<str>
+
+        Returns: list with, for each line of new, the position of an equal
+            line of old (each used once) or None.
+    """
+    shortest = min(len(old), len(new))
+    head = 0
+    while head < shortest and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < shortest - head and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+
+    positions = {}      # line -> positions in old, last first
+    for i in range(len(old) - tail - 1, head - 1, -1):
+        positions.setdefault(old[i], []).append(i)
+
+    matches = list(range(head))
+    for line in new[head:len(new) - tail]:
+        free = positions.get(line)
+        matches.append(free.pop() if free else None)
+    matches.extend(range(len(old) - tail, len(old)))
+    return matches
+
+
+# the fields raw_todo is built from
+LINE_FIELDS = ("finished", "finished_date", "priority", "created_date",
+               "threshold_date", "due_date", "recursive", "contexts",
+               "projects", "todo")
+# raw_todo and its fields, as a Task last built or parsed them
+_line_state = attrgetter("raw_todo", *LINE_FIELDS)
+_slot_set = object.__setattr__
+
+
+def _snapshot(task):
+    """_line_state() of a task with copies of its contexts and projects,
+    so a list changed in place differs from the snapshot."""
+    state = _line_state(task)
+    return state[:8] + (list(state[8]), list(state[9]), state[10])
+
+
+class BaseTask(object):
+    """What Task and CompactTask share: a task line (raw_todo), its tid and
+    the fields parsed from it. Slotted, so that CompactTask has no
+    instance dict; test isinstance(x, BaseTask) to accept both."""
+
+    __slots__ = ()
 
     def __str__(self):
         return "{0}: {1}".format(self.tid, self.raw_todo)
@@ -122,93 +443,6 @@ class Task(object):
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def parse(self):
-        """Parse the text of self.raw_todo and update internal state."""
-
-        rebuild_flg = False
-        text = self.raw_todo
-        splits = text.split(" ")
-        if text[0] == "x" and text[1] == " ":
-            self.finished = True
-            splits = splits[1:]
-
-            match = re.search(DATE_REGEX, splits[0])
-            if match is not None:
-                self.finished_date = \
-                    datetime.strptime(match.group(0), "%Y-%m-%d")
-                splits = splits[1:]
-        else:
-            self.finished = False
-            self.finished_date = None
-
-        head = splits[0]
-
-        if (len(head) == 3) and \
-                (head[0] == "(") and \
-                (head[2] == ")") and \
-                (ord(head[1]) >= 65 and ord(head[1]) <= 90):
-
-            self.priority = head[1]
-            splits = splits[1:]
-        else:
-            self.priority = NO_PRIORITY_CHARACTER
-
-        match = re.search(DATE_REGEX, splits[0])
-        if match is not None:
-            self.created_date = datetime.strptime(match.group(0), "%Y-%m-%d")
-            splits = splits[1:]
-
-        # threshold date getting
-        match = [x for x in splits if x.startswith(THRESHOLDDATE_SIG)]
-        if len(match) != 0:
-            self.threshold_date = \
-                date_value(match[0][len(THRESHOLDDATE_SIG):])
-            # strip "t:" node from splits
-            for i in match:
-                splits.remove(i)
-            rebuild_flg = True
-
-        # due-date getting
-        match = [x for x in splits if x.startswith(DUEDATE_SIG)]
-        if len(match) != 0:
-            self.due_date = \
-                date_value(match[0][len(DUEDATE_SIG):])
-            # strip "due:" node from splits
-            for i in match:
-                splits.remove(i)
-            rebuild_flg = True
-
-        # rec: extension getting
-        match = [x for x in splits if x.startswith(RECURSIVE_SIG)]
-        if len(match) != 0:
-            self.recursive = match[0].lstrip(RECURSIVE_SIG)
-            # strip "rec:" node from splits
-            for i in match:
-                splits.remove(i)
-
-        # match = [x for x in splits if x[0] == "@"]
-        match = re.findall(CONTEXT_REGEX, " ".join(splits))
-        if len(match) != 0:
-            self.contexts = match
-
-        for i in [x for x in splits if x.startswith("@")]:
-            splits.remove(i)
-
-        # match = [x for x in splits if x[0] == "+"]
-        match = re.findall(PROJECT_REGEX, " ".join(splits))
-        if len(match) != 0:
-            self.projects = match
-
-        for i in [x for x in splits if x.startswith("+")]:
-            splits.remove(i)
-
-        self.todo = " ".join(splits).strip()
-
-        if rebuild_flg:
-            # There is a possibility that date expansion occurred
-            # during the date_value() call.
-            self.rebuild_raw_todo()
-
     def matches(self, text):
         """Determines whether the tasks matches the text.
 
@@ -221,46 +455,217 @@ class Task(object):
 
         return text in self.raw_todo
 
+
+class Task(BaseTask):
+    """A class that represents a task.
+
+    raw_todo is kept as the serialized line: rebuild_raw_todo() only
+    builds it again when raw_todo or a field (projects and contexts
+    changed in place included) differs from when the task was parsed or
+    last rebuilt.
+    """
+
+    _state = None       # _snapshot() when raw_todo was parsed / built
+
+    def __init__(self, raw_todo="[dummy task]", tid=-1):
+
+        self.tid = tid
+        self.raw_todo = raw_todo
+
+        # parse() sets priority, todo, projects, contexts, finished,
+        # created_date, finished_date, threshold_date, due_date, recursive
+        self.parse()
+
+    def parse(self):
+        """Parse the text of self.raw_todo and update internal state."""
+
+        (self.finished, self.finished_date, self.priority, self.created_date,
+         threshold, due, self.recursive, self.contexts, self.projects,
+         self.todo) = tokenize(self.raw_todo)
+
+        if threshold is None and due is None:
+            self.threshold_date = self.due_date = None
+        else:
+            stats = _active_stats.stats
+            if stats is not None:
+                self.threshold_date, self.due_date = _resolve_dates(
+                    stats, threshold, due)
+            else:
+                self.threshold_date = date_value(threshold) \
+                    if threshold is not None else None
+                self.due_date = date_value(due) if due is not None else None
+            # There is a possibility that date expansion occurred
+            # during the date_value() call.
+            if not (_kept(threshold, self.threshold_date)
+                    and _kept(due, self.due_date)):
+                self._state = None
+                self.rebuild_raw_todo()
+                return
+        self._state = _snapshot(self)
+
     def rebuild_raw_todo(self):
-        """Rebuilds self.raw_todo from data associated with the Task object.
+        """Rebuilds self.raw_todo from data associated with the Task object,
+        unless nothing changed since it was parsed or last rebuilt.
 
         Returns:
             The rebuilt self.raw_todo.
         """
 
-        finished = "x " if self.finished else ""
-        created_date = self.created_date.strftime("%Y-%m-%d ") if \
-            self.created_date is not None else ""
+        if _line_state(self) == self._state:
+            return self.raw_todo
+        self.raw_todo = _format_line(self)
+        self._state = _snapshot(self)
+        return self.raw_todo
+
+
+def _format_line(task):
+    """Returns the todo.txt line of the fields of a task."""
+
+    finished = "x " if task.finished else ""
+    created_date = format_date(task.created_date) + " " if \
+        task.created_date is not None else ""
+
+    finished_date = format_date(task.finished_date) + " " if \
+        task.finished and task.finished_date is not None else ""
+
+    priority = "(" + task.priority + ") " if \
+        task.priority != NO_PRIORITY_CHARACTER else ""
 
-        finished_date = self.finished_date.strftime("%Y-%m-%d ") if \
-            self.finished and self.finished_date is not None else ""
+    threshold = THRESHOLDDATE_SIG + format_date(task.threshold_date) \
+        if task.threshold_date is not None else ""
 
-        priority = "(" + self.priority + ") " if \
-            self.priority != NO_PRIORITY_CHARACTER else ""
+    due = DUEDATE_SIG + format_date(task.due_date) \
+        if task.due_date is not None else ""
 
-        threshold = THRESHOLDDATE_SIG \
-            + date_value(self.threshold_date).strftime("%Y-%m-%d") if \
-                self.threshold_date is not None else ""
+    recursive = RECURSIVE_SIG + task.recursive if \
+        task.recursive is not None else ""
 
-        due = DUEDATE_SIG \
-            + date_value(self.due_date).strftime("%Y-%m-%d") if \
-                self.due_date is not None else ""
+    return u"{0}{1}{2}{3}{4}{5}{6}{7}{8}{9}" \
+        .format(finished,
+                finished_date if task.finished else "",
+                priority,
+                created_date,
+                task.todo,
+                (" " + " ".join(task.projects)) if task.projects else "",
+                (" " + " ".join(task.contexts)) if task.contexts else "",
+                (" " + threshold) if threshold else "",
+                (" " + due) if due else "",
+                (" " + recursive) if recursive else "").strip()
 
-        recursive = RECURSIVE_SIG + self.recursive if \
-            self.recursive is not None else ""
 
-        self.raw_todo = u"{0}{1}{2}{3}{4}{5}{6}{7}{8}{9}" \
-            .format(finished,
-                    finished_date if self.finished else "",
-                    priority,
-                    created_date,
-                    self.todo,
-                    (" " + " ".join(self.projects)) if self.projects else "",
-                    (" " + " ".join(self.contexts)) if self.contexts else "",
-                    (" " + threshold) if threshold else "",
-                    (" " + due) if due else "",
-                    (" " + recursive) if recursive else "").strip()
+_PARSED = object()  # CompactTask._pool marker of a parsed task
+_NO_TAGS = ()
+
+
+class CompactTask(BaseTask):
+    """A memory-compact Task for large collections (no instance dict: the
+    fields are slots).
+
+    Parsing is deferred until a field other than raw_todo / tid is first
+    read or written. Projects and contexts are tuples of interned strings,
+    and dates are shared through the date pool of the owning collection.
+    Until it is parsed, raw_todo is the line as loaded (due:/t: keywords
+    are not expanded yet). Instead of Task._state, a flag set by every
+    field assignment tells rebuild_raw_todo() that the line changed.
+    """
+
+    __slots__ = ("tid", "raw_todo", "_pool", "_dirty", "priority", "todo",
+                 "projects", "contexts", "finished", "created_date",
+                 "finished_date", "threshold_date", "due_date", "recursive")
+
+    _FIELDS = frozenset(__slots__[4:])
+    _LINE_NAMES = frozenset(LINE_FIELDS + ("raw_todo",))
+
+    def __init__(self, raw_todo="[dummy task]", tid=-1, date_pool=None):
+        _slot_set(self, "tid", tid)
+        _slot_set(self, "raw_todo", raw_todo)
+        _slot_set(self, "_pool", date_pool)
+
+    def __getattr__(self, name):
+        # only reached for slots that are not set yet
+        if name in CompactTask._FIELDS and self._pool is not _PARSED:
+            self.parse()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in CompactTask._FIELDS and self._pool is not _PARSED:
+            self.parse()
+        if name in CompactTask._LINE_NAMES:
+            _slot_set(self, "_dirty", True)
+        _slot_set(self, name, value)
+
+    def __getstate__(self):
+        if self._pool is not _PARSED:
+            return (self.tid, self.raw_todo)
+        self.rebuild_raw_todo()
+        return (self.tid, self.raw_todo) \
+            + tuple(getattr(self, x) for x in self.__slots__[4:])
+
+    def __setstate__(self, state):
+        names = ("tid", "raw_todo") + self.__slots__[4:]
+        for name, value in zip(names, state):
+            _slot_set(self, name, value)
+        _slot_set(self, "_pool", _PARSED if len(state) > 2 else None)
+        if len(state) > 2:
+            _slot_set(self, "_dirty", False)
+
+    def parse(self):
+        """Parse the text of self.raw_todo and update internal state."""
+
+        pool = self._pool
+        _slot_set(self, "_pool", _PARSED)
+        if pool is _PARSED or pool is None:
+            pool = {}
+
+        (finished, finished_date, priority, created_date, threshold, due,
+         recursive, contexts, projects, todo) = tokenize(self.raw_todo)
+
+        threshold_date = date_value(threshold) \
+            if threshold is not None else None
+        due_date = date_value(due) if due is not None else None
+
+        intern = sys.intern
+        for name, value in (("finished_date", finished_date),
+                            ("created_date", created_date),
+                            ("threshold_date", threshold_date),
+                            ("due_date", due_date)):
+            if value is not None:
+                value = pool.setdefault(value, value)
+            _slot_set(self, name, value)
+
+        _slot_set(self, "finished", finished)
+        _slot_set(self, "priority", priority)
+        _slot_set(self, "todo", todo)
+        _slot_set(self, "recursive",
+                  intern(recursive) if recursive is not None else None)
+        _slot_set(self, "projects",
+                  tuple(intern(x) for x in projects) if projects
+                  else _NO_TAGS)
+        _slot_set(self, "contexts",
+                  tuple(intern(x) for x in contexts) if contexts
+                  else _NO_TAGS)
+
+        # There is a possibility that date expansion occurred
+        # during the date_value() call.
+        _slot_set(self, "_dirty", not (_kept(threshold, threshold_date)
+                                       and _kept(due, due_date)))
+        if self._dirty:
+            self.rebuild_raw_todo()
 
+    def rebuild_raw_todo(self):
+        """Rebuilds self.raw_todo, see Task.rebuild_raw_todo(). A task that
+        is not parsed yet keeps the line as loaded, unless a due:/t: value
+        is not an ISO date."""
+
+        if self._pool is not _PARSED:
+            if EXPANDED_DATE_PATTERN.search(self.raw_todo) is None:
+                return self.raw_todo
+            self.parse()
+        if not self._dirty:
+            return self.raw_todo
+        _slot_set(self, "raw_todo", _format_line(self))
+        _slot_set(self, "_dirty", False)
         return self.raw_todo
 
 
@@ -273,15 +678,70 @@ class Tasks(object):
     archive_path = None     # type: str
     tasks = []              # type: List[Task]
     archives = []           # type: List[Task]
+    date_pool = {}          # type: Dict[datetime, datetime]
+    journal = None          # type: Journal
+    index = None            # type: TaskIndex
+    _fulltext = None        # type: FullTextIndex
 
-    # the dict that holds event handlers
-    handlers = {}           # type: Dict[str, function]
+    # the dict that holds event handlers (one per instance)
+    handlers = {}           # type: Dict[str, List[function]]
 
-    def __init__(self, path=None, archive_path=None, tasks=None):
+    def __init__(self, path=None, archive_path=None, tasks=None,
+                 journal=False, indexed=False, snapshot=False,
+                 instrument=False, fulltext=False):
         self.path = path
         self.archive_path = archive_path
         self.tasks = tasks if tasks is not None else []
         self.archives = []
+        self.date_pool = {}
+
+        # journal mode: save() appends mutations to "<path>.journal"
+        self.journal = Journal(path + JOURNAL_SUFFIX) \
+            if journal and path else None
+        self._journal_lines = None      # type: List[str]
+        self._journal_archives = None   # type: List[str]
+
+        # indexed: self.index is kept up to date by the Tasks methods
+        self.index = TaskIndex(self.tasks) if indexed else None
+        # full-text index of search() (todotxt.fulltext), built here with
+        # fulltext, else by the first search(), then kept up to date by the
+        # Tasks methods like self.index
+        self._fulltext = FullTextIndex(self.tasks) if fulltext else None
+        # (size, mtime) of the done file when search() indexed it
+        self._archive_indexed = None
+
+        # what the last load() read from self.path, for refresh()
+        self._source = None
+
+        # snapshot: load() and save() keep "<path>.snapshot" of the parsed
+        # tasks, load() uses it instead of parsing when it is current
+        self.snapshot = snapshot
+
+        # encoding, BOM and newline of self.path (todotxt.encoding), set by
+        # load(); save() writes the file back in it
+        self.text_format = None
+
+        # instrument: load(), refresh() and save() record phase timings and
+        # counters (todotxt.stats), a str is a Prometheus text file written
+        # after each of them
+        self.instrumentation = Stats() if instrument else None
+        self.metrics_path = instrument \
+            if isinstance(instrument, str) else None
+
+        self.handlers = {}
+        self._pending_events = set()    # running coroutine handlers
+        # the event loop of an AsyncTasks running this object in a worker
+        # thread, coroutine handlers are scheduled on it
+        self._loop = None
+
+        # order_by / top views: parsed criteria -> (state, tasks, limit),
+        # dropped by every mutation through the Tasks methods
+        self._version = 0
+        self._views = {}
+
+        # batch() transactions that undo() / redo() revert / apply again
+        self.undo_log = []      # type: List[Transaction]
+        self.redo_log = []      # type: List[Transaction]
 
     def __str__(self):
         return str(self.tasks)
@@ -299,29 +759,225 @@ class Tasks(object):
         return self.tasks[key]
 
     def __setitem__(self, key, value):
+        old = self.tasks[key]
         if isinstance(value, str):
             self.tasks[key] = Task(value)
-        elif isinstance(value, Task):
+        elif isinstance(value, BaseTask):
             self.tasks[key] = value
+        else:
+            return
+        self._touch()
+
+        if self.index is not None:
+            if isinstance(key, slice):
+                self.index.build(self.tasks)
+            else:
+                self.index.remove(old)
+                self.index.add(self.tasks[key])
+        if self._fulltext is not None:
+            if isinstance(key, slice):
+                self._fulltext.build(self.tasks)
+            else:
+                self._fulltext.remove(old)
+                self._fulltext.add(self.tasks[key])
+
+        if self.journal is not None:
+            if isinstance(key, slice):
+                self._log({"op": "reset",
+                           "raw": [x.raw_todo for x in self.tasks]})
+            else:
+                self._log({"op": "set", "at": key % len(self.tasks),
+                           "raw": self.tasks[key].raw_todo})
 
     def __delitem__(self, key):
+        if self.journal is not None and not isinstance(key, slice):
+            key %= len(self.tasks)
+        old = self.tasks[key]
         del self.tasks[key]
+        self._touch()
+
+        if self.index is not None:
+            for task in (old if isinstance(key, slice) else [old]):
+                self.index.remove(task)
+        if self._fulltext is not None:
+            for task in (old if isinstance(key, slice) else [old]):
+                self._fulltext.remove(task)
+
+        if self.journal is not None:
+            if isinstance(key, slice):
+                self._log({"op": "reset",
+                           "raw": [x.raw_todo for x in self.tasks]})
+            else:
+                self._log({"op": "del", "at": key})
+
+    def _log(self, *records):
+        """Appends mutation records to the journal (journal mode only).
+
+        Args:
+            records -- journal records, see todotxt.journal"""
+
+        if self._journal_lines is None:
+            self._journal_attach(read_bytes(self.path))
+        self.journal.extend(records)
+        for record in records:
+            apply_record(record, self._journal_lines, self._journal_archives)
+
+    def _journal_attach(self, data):
+        """Replays the journal over todo.txt content and keeps the result
+        as the state the journal records are relative to.
+
+        Args:
+            data -- the content of self.path (bytes)
+
+        Returns:
+            (todo lines, done lines) after the replay."""
+
+        lines = split_lines(decode(data)[0])
+        archives = self.journal.replay(data, lines, self.archive_path)
+        self._journal_lines = list(lines)
+        self._journal_archives = list(archives)
+        return lines, archives
+
+    def _compact_leftover(self, data, text_format):
+        """Writes a journal found next to self.path by a Tasks object that
+        is not journaled into todo.txt (and its pending archives into
+        done.txt) and removes it, so save() keeps writing todo.txt. A
+        journal a journaled Tasks object has open is only read.
+        self._journal_lines / _journal_archives hold the replayed lines,
+        the archives not written to a done file.
 
-    def _trigger_event(self, event):
+        Args:
+            data -- the content of self.path (bytes)
+            text_format -- the TextFormat of self.path"""
+
+        self.journal = Journal(self.path + JOURNAL_SUFFIX)
+        try:
+            if not self.journal.lock_file():
+                lines = split_lines(decode(data)[0])
+                archives = self.journal.replay(data, lines, read_only=True)
+                self._journal_lines = lines
+                self._journal_archives = archives
+                return
+            lines, archives = self._journal_attach(data)
+            archive_path = self.archive_path \
+                if isinstance(self.archive_path, str) else None
+            with self.journal.lock:
+                self.journal.compact(self.path, lines,
+                                     archives if archive_path else (),
+                                     archive_path, text_format)
+            if archive_path:
+                self._journal_archives = []
+        finally:
+            self.journal.close()
+            self.journal = None
+
+    def _journal_sync(self):
+        """Records changes made to tasks without going through the Tasks
+        methods (field edits, sort, direct list access)."""
+
+        if self._journal_lines is None:
+            self._journal_attach(read_bytes(self.path))
+        lines = [x.rebuild_raw_todo() for x in self.tasks]
+        old = self._journal_lines
+        if len(lines) != len(old):
+            self._log({"op": "reset", "raw": lines})
+        else:
+            changes = [{"op": "set", "at": i, "raw": x}
+                       for i, x in enumerate(lines) if x != old[i]]
+            if changes:
+                self._log(*changes)
+
+    def _touch(self):
+        """Records a mutation of the collection (drops the sorted views)."""
+
+        self._version += 1
+        self._views.clear()
+
+    def _begin(self):
+        """Returns the Stats of a new instrumented operation, or None."""
+
+        return Stats() if self.instrumentation is not None else None
+
+    def _finish(self, stats):
+        """Adds the Stats of an operation to self.instrumentation and
+        writes the metrics file."""
+
+        self.instrumentation.merge(stats)
+        if self.metrics_path:
+            self.instrumentation.write_prometheus(
+                self.metrics_path, labels={"file": self.path or ""})
+
+    def stats(self):
+        """Returns the timings and counters collected since the collection
+        was created with instrument=True (see todotxt.stats).
+
+        Returns:
+            {"timings": {phase: {"count", "seconds", "max"}},
+             "counters": {name: value}}, None if not instrumented"""
+
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.as_dict()
+
+    def _trigger_event(self, event, payload=None):
         """Triggers an event by calling handler functions assigned for it.
 
         Args:
-            event -- the event to trigger"""
+            event -- the event to trigger
+            payload -- passed to the handlers added with payload=True"""
 
         if event in self.handlers:
             for handler in self.handlers[event]:
-                handler(self)
+                if isinstance(handler, _PayloadHandler):
+                    result = handler(self, payload)
+                else:
+                    result = handler(self)
+                if asyncio.iscoroutine(result):
+                    self._schedule(result)
+
+    def _schedule(self, coroutine):
+        """Runs a coroutine returned by an async handler: as a task of the
+        running event loop (of the AsyncTasks whose worker thread this is),
+        or to completion when there is none."""
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None and self._loop.is_running():
+                self._loop.call_soon_threadsafe(self._schedule, coroutine)
+            else:
+                asyncio.run(coroutine)
+            return
+        task = loop.create_task(coroutine)
+        self._pending_events.add(task)
+        task.add_done_callback(self._pending_events.discard)
+
+    def flush_events(self):
+        """Returns an awaitable that waits for the async handlers still
+        running (call it in the running event loop)."""
+
+        return asyncio.gather(*self._pending_events)
+
+    def _parse(self, lines, start, lazy):
+        """Parses stripped, non-empty lines for load() and refresh().
+
+        Args:
+            lines -- list of str
+            start -- tid of the first task
+            lazy -- build CompactTask objects
+
+        Returns:
+            list of Task"""
+
+        return parse_many(lines, start, lazy, self.date_pool, True)
 
-    def load(self, filename=None):
+    def load(self, filename=None, lazy=False):
         """Loads tasks from given file, parses them into internal
         representation and stores them in this manager's object.
             Args:
                 filename : load-filename, default : self.path
+                lazy(=False) : load CompactTask objects, parsed on first
+                    access and sharing dates through self.date_pool.
 
             Returns:
                 load success - True / load cancel - False
@@ -333,14 +989,95 @@ class Tasks(object):
         filename = self.path if filename is None else filename
 
         if filename:    # self.path set.
-            with codecs.open(filename, "r", "utf-8") as f:
-                i = len(self.tasks)
-                for line in f:
-                    if len(line.strip(" \t\n")) > 0:    # skip empty line
-                        self.tasks.append(Task(line.strip(), i))
-                        i += 1
-
-            self._trigger_event("loaded")
+            stats = self._begin()
+            mark = stats.start() if stats is not None else 0
+            data, stat = read_file(filename)
+            try:
+                if stats is not None:
+                    mark = stats.lap("read", mark)
+                    stats.count("bytes_read", len(data))
+                text, text_format = decode(data)
+                lines = split_lines(text)
+                if stats is not None:
+                    mark = stats.lap("decode", mark)
+                archives = []
+                source = filename == self.path and not self.tasks
+                if filename == self.path:
+                    self.text_format = text_format
+
+                if filename == self.path and (
+                        self.journal is not None
+                        or os.path.exists(filename + JOURNAL_SUFFIX)):
+                    # replay a journal left by a journaled Tasks object
+                    if self.journal is None:
+                        self._compact_leftover(data, text_format)
+                        lines, archives = self._journal_lines, \
+                            self._journal_archives
+                        self._journal_lines = None
+                        self._journal_archives = None
+                    else:
+                        prior = [x.raw_todo for x in self.tasks]
+                        lines, archives = self._journal_attach(data)
+                        if prior:
+                            self._log({"op": "reset",
+                                       "raw": prior + lines})
+                    source = False
+                    if stats is not None:
+                        mark = stats.lap("journal", mark)
+                digest = hashlib.sha1(data).digest() if source else None
+            finally:
+                release(data)
+
+            start = len(self.tasks)
+            parsed = None
+            if source:
+                if self.snapshot and not lazy:
+                    parsed = read_snapshot(
+                        filename + SNAPSHOT_SUFFIX,
+                        snapshot_key(stat, digest),
+                        _today_value().toordinal())
+                    if stats is not None:
+                        mark = stats.lap("snapshot", mark)
+                        stats.count("snapshot_hits", parsed is not None)
+            if stats is not None:
+                stats.count("lines", len(lines))
+            if parsed is None:
+                if stats is None:
+                    parsed = self._parse(lines, start, lazy)
+                else:
+                    with stats.collecting():
+                        parsed = self._parse(lines, start, lazy)
+                    mark = stats.lap("parse", mark)
+                if source and self.snapshot and not lazy:
+                    today = _today_value().toordinal() \
+                        if has_relative_dates(text) else 0
+                    write_snapshot(filename + SNAPSHOT_SUFFIX,
+                                   snapshot_key(stat, digest, today), parsed)
+                    if stats is not None:
+                        mark = stats.lap("snapshot", mark)
+            self.tasks.extend(parsed)
+            self._touch()
+            self.archives.extend(parse_many(archives, stripped=True))
+            if self.index is not None:
+                self.index.build(self.tasks)
+            if self._fulltext is not None:
+                self._fulltext.build(self.tasks)
+            if stats is not None and (self.index is not None
+                                      or self._fulltext is not None):
+                mark = stats.lap("index", mark)
+
+            self._source = None
+            if source:
+                self._source = ((stat.st_size, stat.st_mtime_ns), digest,
+                                time.time(), list(self.tasks), lines,
+                                [x.raw_todo for x in self.tasks])
+
+            delta = Delta(self.tasks[start:], [], [])
+            if stats is not None:
+                stats.count("tasks", len(parsed))
+                self._finish(stats)
+                delta.stats = stats
+            self._trigger_event("loaded", delta)
             retval = True
         return retval
 
@@ -351,7 +1088,8 @@ class Tasks(object):
 
         Args:
             filename -- An optional name of the file to save the tasklist into.
-            archive_file -- An optional name of the file to save the archived.
+            archive_file -- An optional name of the file to save the archived,
+                or an ArchiveStore (also accepted as self.archive_path).
 
         Returns:
             save success - True / save cancel - False
@@ -362,21 +1100,71 @@ class Tasks(object):
 
         filename = self.path if filename is None else filename
 
-        if filename:    # self.path set.
-            with codecs.open(filename, "w", "utf-8") as f:
-                for task in self.tasks:
-                    f.write("{0}\n".format(task.rebuild_raw_todo()))
+        if filename and self.journal is not None and filename == self.path:
+            self._journal_sync()
+            if self.journal.size() >= self.journal.threshold:
+                self.compact(archive_file, self.journal.background)
+
+            self._trigger_event("saved")
+            retval = True
+
+        elif filename:    # self.path set.
+            stats = self._begin()
+            mark = stats.start() if stats is not None else 0
+            lines = [x.rebuild_raw_todo() for x in self.tasks]
+            if stats is not None:
+                mark = stats.lap("serialize", mark)
+            data = encode(lines, self.text_format)
+            with open(filename, "wb") as f:
+                f.write(data)
+
+            if filename == self.path:
+                # the file now holds the tasks, refresh() has nothing to do
+                stat = os.stat(filename)
+                digest = hashlib.sha1(data).digest()
+                self._source = ((stat.st_size, stat.st_mtime_ns), digest,
+                                time.time(), list(self.tasks), lines,
+                                list(lines))
+                if self.snapshot:
+                    # rebuilt lines only hold ISO dates
+                    started = time.perf_counter()
+                    write_snapshot(filename + SNAPSHOT_SUFFIX,
+                                   snapshot_key(stat, digest), self.tasks)
+                    if stats is not None:
+                        stats.add_time("snapshot",
+                                       time.perf_counter() - started, True)
+
+            if stats is not None:
+                mark = stats.lap("write", mark)
+                stats.count("tasks_written", len(lines))
+                stats.count("bytes_written", len(data))
 
             archive_file = self.archive_path \
                 if archive_file is None else archive_file
 
-            if archive_file is not None and len(self.archives) > 0:
-                with codecs.open(archive_file, "a", "utf-8") as f:
-                    for arch in self.archives:
-                        f.write("{0}\n".format(arch.rebuild_raw_todo()))
+            archived = len(self.archives)
+            if isinstance(archive_file, ArchiveStore):
+                archive_file.append(self.archives)
                 self.archives = []
 
-            self._trigger_event("saved")
+            elif archive_file is not None and len(self.archives) > 0:
+                # the full-text index holds the archived tasks already
+                indexed = archive_file == self.archive_path and \
+                    self._archive_indexed == _file_key(archive_file)
+                data = append_data(archive_file, [
+                    x.rebuild_raw_todo() for x in self.archives])
+                with open(archive_file, "ab") as f:
+                    f.write(data)
+                if indexed:
+                    self._archive_indexed = _file_key(archive_file)
+                self.archives = []
+
+            if stats is not None:
+                if archive_file is not None:
+                    stats.lap("archive", mark)
+                    stats.count("archived", archived)
+                self._finish(stats)
+            self._trigger_event("saved", stats)
             retval = True
         return retval
 
@@ -395,10 +1183,75 @@ class Tasks(object):
         return Tasks(self.path, self.archive_path,
                      filter(lambda x: x.matches(text), self.tasks))
 
-    def order_by(self, criteria):
+    def query(self, text):
+        """Selects tasks with a structured query, e.g.
+        'pri:A..C +work @office due<=today -finished "free text"'. See
+        todotxt.query for the syntax. Returns a new Tasks object.
+
+        Args:
+            text -- the query
+
+        Returns:
+            A new :class:`Tasks` object that contains tasks that match the
+            query.
+        """
+
+        return Tasks(self.path, self.archive_path, Query(text).run(self))
+
+    def explain(self, text):
+        """Describes how query(text) would be evaluated."""
+
+        return Query(text).explain(self)
+
+    def search(self, text, limit=None, archived=True):
+        """Full-text search of the task texts, best match first (see
+        todotxt.fulltext). Unlike filter_by(), it matches whole words,
+        ignores case and splits CJK text into bigrams. The full-text index
+        is built by the first call unless the object was created with
+        fulltext=True; the done file is indexed by the first call with
+        archived and again when it changed.
+
+        Args:
+            text -- words and "quoted phrases" that must all match
+            limit -- the number of tasks to return, default: all
+            archived -- search the archived tasks (pending archives and
+                        the done file) too
+
+        Returns:
+            A new :class:`Tasks` object that contains the matching tasks.
+        """
+
+        if self._fulltext is None:
+            self._fulltext = FullTextIndex(self.tasks)
+        if archived:
+            self._index_archive()
+        return Tasks(self.path, self.archive_path,
+                     self._fulltext.search(text, limit, archived))
+
+    def _index_archive(self):
+        """Puts the tasks of the done file and the pending archives into
+        the full-text index, unless the done file is the one indexed."""
+
+        path = self.archive_path \
+            if isinstance(self.archive_path, str) else None
+        key = _file_key(path) if path is not None else ()
+        if key == self._archive_indexed:
+            return
+        done = []
+        if path is not None and key[0]:
+            data = read_file(path)[0]
+            try:
+                done = parse_many(split_lines(decode(data)[0]), 0, True,
+                                  self.date_pool, True)
+            finally:
+                release(data)
+        self._fulltext.replace_archived(done + self.archives)
+        self._archive_indexed = key
+
+    def order_by(self, *criteria):
         """Sorts the tasks by given criteria and returns a new Tasks object
-        with the new ordering. The criteria argument can have the following
-        values:
+        with the new ordering. Each criteria can have the following values,
+        with a "-" prefix for descending order:
             - tid
             - priority
             - finished
@@ -406,22 +1259,88 @@ class Tasks(object):
             - finished_date
             - due_date
             - threshold_date
+
+        Later criteria break ties of earlier ones, unset dates and no
+        priority sort last, e.g. order_by("due_date", "-priority", "tid").
+        The ordering is cached until the collection is changed through
+        its methods (call reindex() after editing task fields directly).
         """
 
-        reversed_ = False
-        if criteria[0] == "-":
-            reversed_ = True
+        view = self._sorted(criteria)
+        if view is None:
+            return self
+        return Tasks(self.path, self.archive_path, list(view))
+
+    def top(self, k, *criteria):
+        """Returns the first k tasks of order_by(*criteria) as a list,
+        selected with a heap unless a cached ordering covers them.
 
-        criterias = ["tid", "priority", "finished", "created_date",
-                     "finished_date", "due_date", "threshold_date"]
+        Args:
+            k -- the number of tasks
+            criteria -- see order_by
 
-        if criteria in criterias:
-            return Tasks(self.path,
-                         self.archive_path,
-                         sorted(self.tasks, key=attrgetter(criteria),
-                                reverse=reversed_))
+        Returns:
+            list of :class:`Task`"""
+
+        view = self._sorted(criteria, k)
+        if view is None:
+            raise ValueError("unknown order criteria: {0}".format(criteria))
+        return list(view)
+
+    def _sorted(self, criteria, limit=None):
+        """Returns the tasks sorted by criteria (the first limit tasks if
+        limit is given) from the view cache, None for unknown criteria."""
+
+        parsed = parse_criteria(criteria)
+        if not parsed:
+            return None
+        state = (self._version, id(self.tasks), len(self.tasks))
+        cached = self._views.get(parsed)
+        if cached is not None and cached[0] == state and (
+                cached[2] is None or limit is not None and limit <= cached[2]):
+            return cached[1] if limit is None else cached[1][:limit]
+
+        key = sort_key(parsed)
+        if limit is None or limit >= len(self.tasks):
+            view = sorted(self.tasks, key=key)
+            self._views[parsed] = (state, view, None)
         else:
-            return self
+            view = heapq.nsmallest(limit, self.tasks, key=key)
+            self._views[parsed] = (state, view, limit)
+        return view if limit is None else view[:limit]
+
+    def batch(self, save=False):
+        """Starts a batch of changes, applied at once when the with block
+        ends (see todotxt.batch):
+
+            with tasks.batch() as b:
+                b.complete([3, 8])
+                b.set_priority("+release -finished", "B")
+                b.add_tag("@phone", "+q3")
+
+        Args:
+            save -- save the collection once the changes are applied
+
+        Returns:
+            A :class:`Batch` object."""
+
+        return Batch(self, save)
+
+    def undo(self):
+        """Reverts the last batch.
+
+        Returns:
+            The reverted Transaction, None if there is none."""
+
+        return undo_batch(self)
+
+    def redo(self):
+        """Applies the last reverted batch again.
+
+        Returns:
+            The Transaction, None if there is none."""
+
+        return redo_batch(self)
 
     def add(self, text):
         """Adds a new task given the text.
@@ -433,15 +1352,98 @@ class Tasks(object):
             A new :class:`Tasks` object that contains the newly created task"""
 
         self.tasks.append(Task(text, len(self.tasks)))
+        self._touch()
+        if self.index is not None:
+            self.index.add(self.tasks[-1])
+        if self._fulltext is not None:
+            self._fulltext.add(self.tasks[-1])
+        if self.journal is not None:
+            self._log({"op": "add", "raw": self.tasks[-1].raw_todo})
         return self
 
-    def add_handler(self, event, handler):
+    def complete(self, key, finished_date=None):
+        """Marks a task as finished.
+
+        Args:
+            key -- the position of the task in this collection
+            finished_date -- the finish date, default: today
+
+        Returns:
+            The finished :class:`Task`."""
+
+        task = self.tasks[key]
+        task.finished = True
+        task.finished_date = finished_date if finished_date is not None \
+            else date_value("today")
+        task.rebuild_raw_todo()
+        self._touch()
+        if self.index is not None:
+            self.index.update(task)
+        if self._fulltext is not None:
+            self._fulltext.update(task)
+        if self.journal is not None:
+            self._log({"op": "set", "at": key % len(self.tasks),
+                       "raw": task.raw_todo})
+        return task
+
+    def compact(self, archive_file=None, background=False):
+        """Writes the journaled state back into todo.txt through a
+        temporary file and an atomic rename, appends the archived tasks to
+        done.txt in the same commit and removes the journal.
+
+        Args:
+            archive_file -- An optional name of the file to save the archived.
+            background -- write in a background thread, journal writes
+                wait for it to finish.
+
+        Returns:
+            The background thread or None."""
+
+        journal = self.journal
+        self._journal_sync()
+        archive_file = self.archive_path \
+            if archive_file is None else archive_file
+
+        journal.lock.acquire()
+        lines = list(self._journal_lines)
+        archives = []
+        if archive_file is not None:
+            archives = [x.rebuild_raw_todo() for x in self.archives]
+            self.archives = []
+            self._journal_archives[:] = []
+
+        def run():
+            try:
+                if isinstance(archive_file, ArchiveStore):
+                    # archived before todo.txt is rewritten: a crash in
+                    # between repeats archive lines instead of losing them
+                    archive_file.append(archives)
+                    journal.compact(self.path, lines,
+                                    text_format=self.text_format)
+                else:
+                    journal.compact(self.path, lines, archives, archive_file,
+                                    self.text_format)
+            finally:
+                journal.lock.release()
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="todotxt-compact")
+        thread.start()
+        return thread
+
+    def add_handler(self, event, handler, payload=False):
         """Attach a handler function to an event.
 
         Args:
             event -- name of the event to attach the handler to
-            handler -- the function that shall handle the event"""
+            handler -- the function that shall handle the event
+            payload -- call the handler as handler(tasks, payload), e.g.
+                the Delta of a "loaded" event"""
 
+        if payload:
+            handler = _PayloadHandler(handler)
         if event in self.handlers:
             self.handlers[event].append(handler)
         else:
@@ -453,113 +1455,167 @@ class Tasks(object):
         Args:
             value(='[dummy task]'): text/Task/Tasks/list<text/Task/Tasks>)
         """
-        if isinstance(value, Task):
+        start = len(self.tasks)
+        if isinstance(value, BaseTask):
             self.tasks.append(value)
 
         elif isinstance(value, str):
-            self.add(value)
+            self.tasks.append(Task(value, len(self.tasks)))
 
         elif isinstance(value, Tasks):
             self.tasks.extend(value.tasks)
 
         elif isinstance(value, list):
-            for i in value:
-                if isinstance(i, Task):
-                    self.tasks.append(i)
+            texts = []     # consecutive strings are parsed in one batch
+            for i in value + [None]:
+                if isinstance(i, str):
+                    texts.append(i)
+                    continue
 
-                elif isinstance(i, str):
-                    self.add(i)
+                if texts:
+                    self.tasks.extend(parse_many(texts, len(self.tasks)))
+                    texts = []
+
+                if isinstance(i, BaseTask):
+                    self.tasks.append(i)
 
                 elif isinstance(i, Tasks):
                     self.tasks.extend(i.tasks)
 
+        self._touch()
+        if self.index is not None:
+            for task in self.tasks[start:]:
+                self.index.add(task)
+        if self._fulltext is not None:
+            for task in self.tasks[start:]:
+                self._fulltext.add(task)
+        if self.journal is not None and len(self.tasks) > start:
+            self._log(*[{"op": "add", "raw": x.raw_todo}
+                        for x in self.tasks[start:]])
+
     def archive(self):
         """archive finished tasks.
 
             Returns: archive tasks list.
         """
+        if self.journal is not None:
+            self._journal_sync()
+            at = [i for i, x in enumerate(self.tasks) if x.finished]
+            if at:
+                self._log({"op": "archive", "at": at})
+
         finished = [x for x in self.tasks if x.finished]
         self.archives = self.archives + finished
         self.tasks = [x for x in self.tasks if not x.finished]
+        self._touch()
+        if self.index is not None:
+            for task in finished:
+                self.index.remove(task)
+        if self._fulltext is not None:
+            # kept in the full-text index, flagged as archived
+            for task in finished:
+                self._fulltext.archive(task)
         return finished
 
-    def create_recursive_tasks(self):
+    def pending_recurrences(self):
+        """Finished recursive tasks that have no open successor, i.e. no
+        unfinished task with the same todo text. Single pass over tasks.
+
+            Returns: list of Task.
+        """
+        open_todos = set(x.todo for x in self.tasks if not x.finished)
+        return [x for x in self.tasks if x.finished
+                and x.recursive is not None and x.todo not in open_todos]
+
+    def create_recursive_tasks(self, calendar=None, only_pending=False):
         """Create recursive tasks from finished tasks.
             rec syntax: \"rec:\"+*[0-9]+[dwmyb]
             \"b\" : business date (skip sat, sun and holiday)
 
+            calendar(=None): BusinessCalendar or registered calendar name
+                for \"b\", default: the calendar of HOLIDAY_TBL.
+            only_pending(=False): only for pending_recurrences(), one task
+                per todo text (from the latest due date).
+
             HOLIDAY_TBL<list> - \"YYYY-MM-DD\" formated str list, deal holiday.
                 default []
 
             Returns: create tasks list.
         """
-        _end_of_month = {1: 31, 2: 28, 3: 31, 4: 30, 5: 31, 6: 30,
-                         7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31}
+        calendar = get_calendar(calendar)
+        if only_pending:
+            latest = {}     # todo -> the pending task with the latest due
+            pending = self.pending_recurrences()
+            for i in pending:
+                other = latest.get(i.todo)
+                if other is None or other.due_date is None or (
+                        i.due_date is not None
+                        and i.due_date >= other.due_date):
+                    latest[i.todo] = i
+            sources = [x for x in pending if latest[x.todo] is x]
+        else:
+            sources = [x for x in self.tasks if
+                       x.finished and x.recursive is not None]
+
         createlist = []
-        for i in [x for x in self.tasks if
-                  x.finished and x.recursive is not None]:
+        for i in sources:
             new_task = Task(i.raw_todo)
             new_task.finished = False
             new_task.finished_date = None
             new_task.threshold_date = None
 
             if i.due_date is not None:
-                match = re.search(REC_SYNTAX_REGEX, i.recursive)
-                rec_base = match.group(1)
-                rec_span = int(match.group(2))
-                rec_unit = match.group(3)
-
-                if rec_base == "+":
+                rule = compile_rule(i.recursive)
+                if rule is None:
+                    base_date = i.due_date
+                elif rule.strict:
                     base_date = i.due_date
                 else:
                     base_date = i.finished_date if \
                                     i.finished_date is not None else \
-                                    datetime(*datetime.today().timetuple()[:3])
-
-                if rec_unit == "d":
-                    new_due = base_date + timedelta(days=rec_span)
-
-                elif rec_unit == "w":
-                    new_due = base_date + timedelta(days=(rec_span * 7))
-
-                elif rec_unit == "m":
-                    rec_year = base_date.year \
-                             + ((base_date.month + rec_span) // 12)
-                    rec_month = (base_date.month + rec_span) % 12
-
-                    if base_date.day > _end_of_month[rec_month]:
-                        rec_day = _end_of_month[rec_month]
-                        new_due = datetime(rec_year, rec_month, rec_day)
-                        new_due += timedelta(days=(base_date.day - rec_day))
-                    else:
-                        new_due = datetime(rec_year, rec_month, base_date.day)
-
-                elif rec_unit == "y":
-                    if base_date.month == 2:
-                        new_due = datetime(base_date.year + rec_span,
-                                           base_date.month,
-                                           1)
-                        new_due += timedelta(days=(base_date.day - 1))
-                    else:
-                        new_due = datetime(base_date.year + rec_span,
-                                           base_date.month,
-                                           base_date.day)
+                                    date_value("today")
 
-                elif rec_unit == "b":
-                    new_due = bizdate_add(base_date, rec_span)
-
-                else:
-                    new_due = base_date
-
-                new_task.due_date = new_due
+                new_task.due_date = rule.next(base_date, calendar) \
+                    if rule is not None else base_date
 
             new_task.rebuild_raw_todo()
             self.tasks.append(new_task)
             createlist.append(new_task)
+            if self.index is not None:
+                self.index.add(new_task)
+            if self._fulltext is not None:
+                self._fulltext.add(new_task)
+
+        if createlist:
+            self._touch()
+        if self.journal is not None and createlist:
+            self._log(*[{"op": "add", "raw": x.raw_todo} for x in createlist])
         return createlist
 
+    def project_recurrences(self, until=None, since=None, calendar=None):
+        """Projects every occurrence of the open recurring tasks (rec: tag
+        and due date) from the current due date on, as if each instance
+        was finished on its due date.
+
+        Args:
+            until -- last day (date/datetime/date_value() str),
+                default: 90 days after since
+            since -- first day, default: today
+            calendar -- BusinessCalendar or calendar name for "b" rules
+
+        Returns:
+            A read-only :class:`RecurrenceProjection` of (task, date)."""
+
+        since = date_value(since if since is not None else "today")
+        until = date_value(until) if until is not None \
+            else since + timedelta(days=90)
+        return project_recurrences(self.tasks, until, since,
+                                   get_calendar(calendar))
+
     def get_projects(self):
         """Get projects in tasks collection."""
+        if self.index is not None:
+            return self.index.get_projects()
         s = set()
         for i in self.tasks:
             for j in i.projects:
@@ -568,12 +1624,33 @@ class Tasks(object):
 
     def get_contexts(self):
         """Get contexts in tasks collection."""
+        if self.index is not None:
+            return self.index.get_contexts()
         s = set()
         for i in self.tasks:
             for j in i.contexts:
                 s.add(j)
         return sorted(list(s))
 
+    def reindex(self, task=None):
+        """Updates the index after fields of a task were changed directly.
+
+        Args:
+            task -- the changed task, default: rebuild the whole index"""
+
+        self._touch()
+        if self.index is None:
+            self.index = TaskIndex(self.tasks)
+        elif task is None:
+            self.index.build(self.tasks)
+        else:
+            self.index.update(task)
+        if self._fulltext is not None:
+            if task is None:
+                self._fulltext.build(self.tasks)
+            else:
+                self._fulltext.update(task)
+
     def sort(self):
         """Tasks order sort by tid."""
         self.tasks = sorted(self.tasks, key=attrgetter("tid"))
@@ -585,9 +1662,224 @@ class Tasks(object):
         self.sort()
         for i in self.tasks:
             i.tid = next(gen_tid)
+        self._touch()
+
+    def to_columns(self):
+        """Returns the tasks as NumPy column arrays (TaskColumns), for
+        vectorized reports, see todotxt.columns. Needs NumPy."""
+        return TaskColumns(self.tasks)
+
+    def watch(self, debounce=0.2, interval=1.0, inotify=None, lazy=False):
+        """Watches self.path and refreshes the tasks when it changes,
+        see todotxt.watch. Use in a coroutine:
 
-    def reload(self):
-        """Crear TasksList/ArchiveList and Loads tasks from given file."""
-        self.tasks = []
+            async for delta in tasks.watch():
+                ...
+
+        Args:
+            debounce -- seconds without a write before a refresh
+            interval -- seconds between two polls without inotify
+            inotify -- True: require inotify, False: poll, None: inotify
+                when available
+            lazy -- parse new lines into CompactTask objects
+
+        Returns:
+            An async iterator of the Delta of each refresh."""
+
+        return watch_tasks(self, debounce, interval, inotify, lazy)
+
+    def reload(self, lazy=False):
+        """Crear TasksList/ArchiveList and Loads tasks from given file.
+        Only the lines that changed since the last load are parsed again,
+        see refresh().
+
+        Returns:
+            load success - True / load cancel (no self.path) - False"""
+        if not self.path:
+            self.tasks = []
+            self.archives = []
+            return self.load(lazy=lazy)
+        self.refresh(lazy)
+        return True
+
+    def _untouched(self):
+        """True when the tasks are as the last load of self.path left them
+        (same objects and raw_todo, no pending archives)."""
+
+        if self._source is None or self.archives:
+            return False
+        tasks, raws = self._source[3], self._source[5]
+        if len(tasks) != len(self.tasks):
+            return False
+        for task, loaded, raw in zip(self.tasks, tasks, raws):
+            if task is not loaded or task.raw_todo != raw:
+                return False
+        return True
+
+    def refresh(self, lazy=False):
+        """Reloads self.path, reusing the Task objects (and tids) of the
+        lines that did not change. Lines are matched by hash (match_lines),
+        only added and changed lines are parsed, and "loaded" is triggered
+        with a Delta payload. Pending archives are dropped, as reload()
+        always did. A journaled collection is loaded again in full.
+
+        Args:
+            lazy -- parse new lines into CompactTask objects
+
+        Returns:
+            The Delta, or None if nothing changed (no events triggered)."""
+
+        if self.journal is not None or not self.path or \
+                os.path.exists(self.path + JOURNAL_SUFFIX):
+            removed = self.tasks
+            self.tasks = []
+            self.archives = []
+            self._source = None
+            self.load(lazy=lazy)
+            return Delta(list(self.tasks), removed, [])
+
+        # A size and mtime equal to the loaded ones are trusted unless the
+        # file was loaded within RACY_SECONDS of its mtime, then (and when
+        # only the mtime changed) the content hash is compared.
+        untouched = self._untouched()
+        if untouched:
+            size_mtime, digest, loaded_at = self._source[:3]
+            stat = os.stat(self.path)
+            if (stat.st_size, stat.st_mtime_ns) == size_mtime and \
+                    loaded_at - stat.st_mtime_ns / 1e9 > RACY_SECONDS:
+                return None
+
+        # the line each current task was loaded from, if it is unmodified
+        loaded = {}
+        if self._source is not None:
+            for task, line, raw in zip(*self._source[3:]):
+                loaded[id(task)] = (task, line, raw)
+        old = []
+        for task in self.tasks:
+            entry = loaded.get(id(task))
+            old.append(entry[1] if entry is not None and entry[0] is task
+                       and task.raw_todo == entry[2] else task.raw_todo)
+
+        stats = self._begin()
+        mark = stats.start() if stats is not None else 0
+        data, stat = read_file(self.path)
+        try:
+            if stats is not None:
+                mark = stats.lap("read", mark)
+                stats.count("bytes_read", len(data))
+            new_digest = hashlib.sha1(data).digest()
+            unchanged = untouched and new_digest == digest
+            if not unchanged:
+                text, text_format = decode(data)
+        finally:
+            release(data)
+        if unchanged:
+            self._source = ((stat.st_size, stat.st_mtime_ns), digest,
+                            time.time()) + self._source[3:]
+            if stats is not None:
+                self._finish(stats)
+            return None
+
+        self._trigger_event("load")
+        self.text_format = text_format
+        new = split_lines(text)
+        if stats is not None:
+            mark = stats.lap("decode", mark)
+            stats.count("lines", len(new))
+        matches = match_lines(old, new)
+        if stats is not None:
+            mark = stats.lap("match", mark)
+
+        # a new line that follows the line of an old task whose own next
+        # line is gone replaces that line ("changed"), others are "added"
+        used = set(x for x in matches if x is not None)
+        lines = [x for x, y in zip(new, matches) if y is None]
+        if stats is None:
+            fresh = self._parse(lines, 0, lazy)
+        else:
+            with stats.collecting():
+                fresh = self._parse(lines, 0, lazy)
+            mark = stats.lap("parse", mark)
+            stats.count("tasks", len(fresh))
+        fresh = iter(fresh)
+        next_tid = max([x.tid for x in self.tasks] + [-1]) + 1
+
+        tasks = []
+        added = []
+        changed = []
+        previous = -1
+        for position in matches:
+            if position is not None:
+                tasks.append(self.tasks[position])
+                previous = position
+                continue
+            task = next(fresh)
+            if previous + 1 < len(old) and previous + 1 not in used:
+                previous += 1
+                used.add(previous)
+                task.tid = self.tasks[previous].tid
+                changed.append((self.tasks[previous], task))
+            else:
+                task.tid = next_tid
+                next_tid += 1
+                added.append(task)
+            tasks.append(task)
+        removed = [self.tasks[i] for i in range(len(old)) if i not in used]
+
+        if self.index is not None:
+            for task in removed + [x[0] for x in changed]:
+                self.index.remove(task)
+            for task in added + [x[1] for x in changed]:
+                self.index.add(task)
+        if self._fulltext is not None:
+            for task in removed + [x[0] for x in changed]:
+                self._fulltext.remove(task)
+            for task in added + [x[1] for x in changed]:
+                self._fulltext.add(task)
+        if stats is not None and (self.index is not None
+                                  or self._fulltext is not None):
+            mark = stats.lap("index", mark)
+
+        self.tasks = tasks
         self.archives = []
-        return self.load()
+        self._touch()
+        self._source = ((stat.st_size, stat.st_mtime_ns),
+                        new_digest, time.time(),
+                        list(tasks), new, [x.raw_todo for x in tasks])
+
+        delta = Delta(added, removed, changed)
+        if stats is not None:
+            self._finish(stats)
+            delta.stats = stats
+        self._trigger_event("loaded", delta)
+        return delta
+
+
+class _PayloadHandler(object):
+    """A handler added with add_handler(..., payload=True)."""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def __call__(self, tasks, payload):
+        return self.handler(tasks, payload)
+
+
+from todotxt.stream import iter_lines, iter_tasks, TaskStream  # noqa: E402
+from todotxt.query import Query  # noqa: E402
+from todotxt.watch import watch as watch_tasks  # noqa: E402
+from todotxt.archive import ArchiveStore  # noqa: E402
+from todotxt.snapshot import (  # noqa: E402
+    SNAPSHOT_SUFFIX, read_snapshot, write_snapshot, snapshot_key,
+    has_relative_dates)
+from todotxt.columns import TaskColumns, to_columns  # noqa: E402
+from todotxt.workspace import Workspace  # noqa: E402
+from todotxt.ordering import (  # noqa: E402
+    ORDER_CRITERIAS, parse_criteria, sort_key)
+from todotxt.server import TaskServer, TaskClient, ServerError  # noqa: E402
+from todotxt.batch import (  # noqa: E402
+    Batch, Transaction, undo as undo_batch, redo as redo_batch)
+from todotxt.recurrence import (  # noqa: E402
+    RecurrenceRule, RecurrenceProjection, Occurrence, compile_rule,
+    project as project_recurrences)
+from todotxt.aio import AsyncTasks  # noqa: E402
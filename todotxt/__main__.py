@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Command line entry point.
+
+    python -m todotxt maintain todo.txt [done.txt] --recur --archive --save
+
+    python -m todotxt archive DIR --import done.txt --compact
+    python -m todotxt archive DIR --query "+work done>=2017-04-01"
+    python -m todotxt archive DIR --export done.txt
+
+    python -m todotxt serve todo.txt [done.txt] --socket /tmp/todo.sock
+
+"maintain" creates the successors of finished recursive tasks, moves
+finished tasks to done.txt and writes both files, with one load and one
+write and without prompting, so it can run from cron. Without --save (or
+with --dry-run) it only prints what it would do.
+
+"archive" manages a segmented archive directory (todotxt.archive):
+--import appends a done.txt, --compact sorts the segments, --query prints
+matching tasks and --export writes the archive back to one file.
+
+"serve" keeps todo.txt parsed in memory and serves it on a Unix domain
+socket until SIGINT / SIGTERM (todotxt.server, client: todotxt.TaskClient).
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+import todotxt
+
+
+def default_archive(todo_path):
+    """Returns the done.txt next to todo_path."""
+    return os.path.join(os.path.dirname(todo_path), "done.txt")
+
+
+def maintain(args, out=sys.stdout):
+    """Runs the maintain command.
+
+        Returns: exit status
+    """
+    archive_path = args.done if args.done is not None \
+        else default_archive(args.todo)
+    tasks = todotxt.Tasks(args.todo, archive_path)
+    tasks.load()
+    write = args.save and not args.dry_run
+    prefix = "" if write else "[dry-run] "
+
+    created = []
+    if args.recur:
+        for task in tasks.pending_recurrences():
+            print("{0}[Rec]:{1}".format(prefix, task.raw_todo), file=out)
+        created = tasks.create_recursive_tasks(only_pending=True)
+        for task in created:
+            print("{0}[New]:{1}".format(prefix, task.raw_todo), file=out)
+
+    archived = []
+    if args.archive:
+        archived = tasks.archive()
+        for task in archived:
+            print("{0}[Done]:{1}".format(prefix, task.raw_todo), file=out)
+
+    if write and (created or archived):
+        tasks.save()
+
+    print("{0}{1} recursive task(s) created, {2} task(s) archived, {3}."
+          .format(prefix, len(created), len(archived),
+                  "saved" if write and (created or archived)
+                  else "nothing written"), file=out)
+    return 0
+
+
+def archive(args, out=sys.stdout):
+    """Runs the archive command.
+
+        Returns: exit status
+    """
+    store = todotxt.ArchiveStore(args.directory)
+    if args.import_file is not None:
+        print("{0} task(s) imported.".format(
+            store.import_file(args.import_file)), file=out)
+    if args.compact:
+        print("{0} segment(s) rewritten.".format(store.compact()), file=out)
+    if args.query is not None:
+        for task in store.query(args.query):
+            print(task.raw_todo, file=out)
+    if args.export is not None:
+        print("{0} task(s) exported.".format(store.export(args.export)),
+              file=out)
+    return 0
+
+
+def serve(args, out=sys.stdout):
+    """Runs the serve command.
+
+        Returns: exit status
+    """
+    archive_path = args.done if args.done is not None \
+        else default_archive(args.todo)
+    print("serving {0} on {1}".format(args.todo, args.socket), file=out)
+    out.flush()
+    todotxt.server.serve(args.todo, archive_path, args.socket,
+                         batch_delay=args.batch_delay,
+                         compact_delay=args.compact_delay)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m todotxt")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    sub = commands.add_parser(
+        "maintain", help="create recursive tasks and archive finished tasks")
+    sub.add_argument("todo", help="todo.txt file")
+    sub.add_argument("done", nargs="?", default=None,
+                     help="done.txt file, default: done.txt next to todo")
+    sub.add_argument("--recur", action="store_true",
+                     help="create the successors of finished rec: tasks")
+    sub.add_argument("--archive", action="store_true",
+                     help="move finished tasks to done.txt")
+    sub.add_argument("--save", action="store_true",
+                     help="write the files, otherwise only report")
+    sub.add_argument("--dry-run", action="store_true",
+                     help="only report, even with --save")
+    sub.set_defaults(run=maintain)
+
+    sub = commands.add_parser(
+        "archive", help="manage a segmented archive directory")
+    sub.add_argument("directory", help="archive directory")
+    sub.add_argument("--import", dest="import_file", metavar="DONE",
+                     help="append the tasks of a done.txt")
+    sub.add_argument("--compact", action="store_true",
+                     help="sort the segments by finished date")
+    sub.add_argument("--query", metavar="QUERY",
+                     help="print the archived tasks matching a query")
+    sub.add_argument("--export", metavar="DONE",
+                     help="write the whole archive into one file")
+    sub.set_defaults(run=archive)
+
+    sub = commands.add_parser(
+        "serve", help="serve todo.txt on a Unix domain socket")
+    sub.add_argument("todo", help="todo.txt file")
+    sub.add_argument("done", nargs="?", default=None,
+                     help="done.txt file, default: done.txt next to todo")
+    sub.add_argument("--socket", required=True, help="socket path")
+    sub.add_argument("--batch-delay", type=float,
+                     default=todotxt.server.BATCH_DELAY,
+                     help="seconds a write waits to be committed with others")
+    sub.add_argument("--compact-delay", type=float,
+                     default=todotxt.server.COMPACT_DELAY,
+                     help="seconds after the last write todo.txt is written")
+    sub.set_defaults(run=serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""asyncio front end of Tasks, for services whose event loop must stay
+responsive while todo files are read and written.
+
+    tasks = AsyncTasks("todo.txt", "done.txt", processes=4)
+    await tasks.load()
+    await tasks.add("(A) call Bob +work due:tomorrow")
+    await tasks.save()
+    async for task in tasks.stream("+work due<=today -finished"):
+        ...
+    await tasks.close()
+
+The blocking Tasks methods run in a worker thread (the executor, default:
+the loop's), the loop only waits for the GIL, at most a switch interval
+(sys.getswitchinterval(), 5ms) at a time. With processes=N, files of more
+than 2 * chunk_size lines are parsed in a pool of N processes, chunk_size
+lines per job; a worker sends back the parsed fields of its chunk
+(todotxt.snapshot.pack_tasks), which the thread unpacks in about a quarter
+of the parse time.
+
+The operations that read the files or change the tasks hold the lock of
+the todo file: one asyncio.Lock per path and event loop, shared by the
+AsyncTasks objects of that file. save() waits save_delay seconds before it
+writes, the saves requested meanwhile are done by the same write; a save
+requested while a write runs waits for the next one.
+
+Change the tasks through the AsyncTasks methods, or inside "async with
+tasks.lock:", a write reads them from its thread. Event handlers run in
+the worker thread, coroutine handlers are scheduled on the loop.
+"""
+
+import asyncio
+import gc
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from todotxt import Tasks, parse_many
+from todotxt.query import Query
+from todotxt.snapshot import pack_tasks, unpack_tasks
+from todotxt.stream import iter_lines
+
+CHUNK_LINES = 20000     # lines parsed per process pool job / stream step
+SAVE_DELAY = 0.05       # seconds a save waits for more saves to join it
+
+_locks = weakref.WeakKeyDictionary()    # loop -> {path: asyncio.Lock}
+
+
+def file_lock(path):
+    """Returns the asyncio.Lock of a todo file in the running event loop."""
+    locks = _locks.setdefault(asyncio.get_running_loop(), {})
+    key = os.path.abspath(path) if path else None
+    lock = locks.get(key)
+    if lock is None:
+        lock = locks[key] = asyncio.Lock()
+    return lock
+
+
+def parse_chunk(lines):
+    """Process pool worker: parses stripped, non-empty lines.
+
+        Returns: the packed tasks (pack_tasks), one per line.
+    """
+    return pack_tasks(parse_many(lines, stripped=True))
+
+
+def read_chunk(lines, start, size, predicate=None):
+    """Parses the next size lines of an iterator of lines.
+
+        Args:
+            lines: iterator of stripped, non-empty lines (iter_lines).
+            start: tid of the first task.
+            size: the number of lines to read.
+            predicate(=None): keeps the tasks it returns True for.
+
+        Returns: (list of Task, the number of lines read)
+    """
+    chunk = list(islice(lines, size))
+    tasks = parse_many(chunk, start, stripped=True)
+    if predicate is not None:
+        tasks = [x for x in tasks if predicate(x)]
+    return tasks, len(chunk)
+
+
+class _PooledTasks(Tasks):
+    """Tasks that parse large files in a process pool."""
+
+    processes = None        # type: int  ## pool size, None: no pool
+    chunk_size = CHUNK_LINES
+    pool = None             # type: ProcessPoolExecutor
+
+    def _parse(self, lines, start, lazy):
+        # the parsed tasks live on, collections would only rescan them
+        # (holding the GIL the event loop waits for)
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._parse_lines(lines, start, lazy)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def _parse_lines(self, lines, start, lazy):
+        size = self.chunk_size
+        if self.processes is None or lazy or len(lines) < 2 * size:
+            return Tasks._parse(self, lines, start, lazy)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.processes)
+        chunks = [lines[x:x + size] for x in range(0, len(lines), size)]
+        retval = []
+        for chunk, data in zip(chunks, self.pool.map(parse_chunk, chunks)):
+            retval.extend(unpack_tasks(data, len(chunk)))
+        for tid, task in enumerate(retval, start):
+            task.tid = tid
+        return retval
+
+
+class AsyncTasks(object):
+    """Tasks with coroutine methods, see the module documentation."""
+
+    def __init__(self, path=None, archive_path=None, executor=None,
+                 processes=None, chunk_size=CHUNK_LINES,
+                 save_delay=SAVE_DELAY, **options):
+        """
+            Args:
+                path, archive_path: as in Tasks.
+                executor(=None): concurrent.futures executor the blocking
+                    calls run in, default: the loop's.
+                processes(=None): parse large files in a pool of this many
+                    processes, None: in the worker thread.
+                chunk_size(=CHUNK_LINES): lines per pool job and per
+                    stream() step.
+                save_delay(=SAVE_DELAY): seconds a save waits for more
+                    saves to join it.
+                options: the other keyword arguments of Tasks (indexed,
+                    journal, ...).
+        """
+        self.tasks = _PooledTasks(path, archive_path, **options)
+        self.tasks.processes = processes
+        self.tasks.chunk_size = chunk_size
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.save_delay = save_delay
+        self._saving = None     # the save the next save() requests join
+
+    def __repr__(self):
+        return "<AsyncTasks '{0}' {1} tasks>".format(self.tasks.path,
+                                                     len(self.tasks))
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __getitem__(self, key):
+        return self.tasks[key]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def lock(self):
+        """The asyncio.Lock of the todo file (see file_lock)."""
+        return file_lock(self.tasks.path)
+
+    async def _run(self, func, *args):
+        """Runs func(*args) in the executor. When the caller is cancelled,
+        waits for the call to end first (the lock is held until then)."""
+        loop = asyncio.get_running_loop()
+        self.tasks._loop = loop
+        future = loop.run_in_executor(self.executor, func, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait([future])
+            raise
+
+    async def _locked(self, func, *args):
+        async with self.lock:
+            return await self._run(func, *args)
+
+    async def load(self, filename=None, lazy=False):
+        """Tasks.load() in the executor."""
+        return await self._locked(self.tasks.load, filename, lazy)
+
+    async def reload(self, lazy=False):
+        """Tasks.reload() in the executor."""
+        return await self._locked(self.tasks.reload, lazy)
+
+    async def refresh(self, lazy=False):
+        """Tasks.refresh() in the executor, returns its Delta."""
+        return await self._locked(self.tasks.refresh, lazy)
+
+    async def save(self):
+        """Writes the tasks (and the pending archives) to their files.
+        Saves requested within save_delay seconds share one write.
+
+            Returns: the result of Tasks.save()
+        """
+        if self._saving is None:
+            self._saving = asyncio.ensure_future(self._save_soon())
+        return await asyncio.shield(self._saving)
+
+    async def _save_soon(self):
+        await asyncio.sleep(self.save_delay)
+        async with self.lock:
+            # the tasks are read from here on, later saves write again
+            self._saving = None
+            return await self._run(self.tasks.save)
+
+    async def add(self, text):
+        """Tasks.add(), returns self."""
+        await self._locked(self.tasks.add, text)
+        return self
+
+    async def complete(self, key, finished_date=None):
+        """Tasks.complete(), returns the completed Task."""
+        return await self._locked(self.tasks.complete, key, finished_date)
+
+    async def archive(self):
+        """Tasks.archive() in the executor."""
+        return await self._locked(self.tasks.archive)
+
+    async def query(self, text):
+        """Tasks.query() in the executor, returns list of Task."""
+        return await self._locked(self.tasks.query, text)
+
+    async def search(self, text, limit=None, archived=True):
+        """Tasks.search() in the executor, returns list of Task."""
+        return await self._locked(self.tasks.search, text, limit,
+                                  archived)
+
+    async def stream(self, query=None, archived=False):
+        """Yields the tasks of the todo file (or the done file) that match
+        a query, reading and parsing chunk_size lines at a time in the
+        executor. The file is read, not the loaded tasks.
+
+            async for task in tasks.stream("+work -finished"):
+                ...
+
+            Args:
+                query(=None): todotxt.query syntax, None: every task.
+                archived(=False): stream the done file.
+        """
+        path = self.tasks.archive_path if archived else self.tasks.path
+        predicate = Query.fuse(Query(query).terms) if query else None
+        # the encoding is detected by the first read, in the executor
+        lines = iter_lines(path)
+        start = 0
+        try:
+            while True:
+                found, count = await self._run(
+                    read_chunk, lines, start, self.chunk_size, predicate)
+                for task in found:
+                    yield task
+                if count < self.chunk_size:
+                    break
+                start += count
+        finally:
+            lines.close()
+
+    async def close(self):
+        """Waits for a pending save and shuts the process pool down."""
+        if self._saving is not None:
+            await asyncio.shield(self._saving)
+        pool = self.tasks.pool
+        if pool is not None:
+            self.tasks.pool = None
+            await self._run(pool.shutdown)
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""Segmented archive of finished tasks.
+
+An ArchiveStore keeps done tasks in one file per month of their finished
+date ("done-2017-04.txt", tasks without a finished date go to
+"done-undated.txt"). Next to each segment, a sidecar ("done-2017-04.idx",
+JSON) holds the byte offset and finished day of every line, the first and
+last finished day and the projects and contexts of the segment:
+
+    store = ArchiveStore("archive")
+    tasks = Tasks("todo.txt", store)    # save() appends archived tasks
+    store.query("+clientX done>=2017-04-01 done<=2017-06-30")
+
+A query (todotxt.query syntax) only opens the segments whose date range
+and tag sets can match, and in a compacted segment (lines sorted by
+finished date) it seeks straight to the lines of the date range. A
+sidecar is read when a segment is first needed: the month in its name
+rules a segment out of a date range before that. compact() sorts the
+segments, export() writes a single done.txt again.
+
+Segments are UTF-8 with "\n" newlines; import_file() reads a done.txt in
+its own encoding (todotxt.encoding) and export() writes in the format of
+the file it replaces, or of the last imported file.
+"""
+
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from todotxt import tokenize, parse_many, format_date
+from todotxt.encoding import read_file, release, decode, encode, \
+    split_lines, detect_file
+from todotxt.journal import atomic_write, append_durable
+from todotxt.query import Query, Tag, DateCompare
+
+SEGMENT_PREFIX = "done-"
+SEGMENT_SUFFIX = ".txt"
+INDEX_SUFFIX = ".idx"
+UNDATED = "undated"
+
+SEGMENT_PATTERN = re.compile("^done-(\\d{4}-\\d{2}|undated)\\.txt$")
+
+
+def segment_name(finished_date):
+    """Returns the segment of a finished date ("YYYY-MM" or "undated")."""
+    if finished_date is None:
+        return UNDATED
+    return format_date(finished_date)[:7]
+
+
+class Segment(object):
+    """One segment file and its sidecar index."""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory,
+                                 SEGMENT_PREFIX + name + SEGMENT_SUFFIX)
+        self.index_path = os.path.join(directory,
+                                       SEGMENT_PREFIX + name + INDEX_SUFFIX)
+        self._reset()
+        self.loaded = False     # the sidecar was read (or written)
+
+    def _reset(self):
+        self.size = 0
+        self.offsets = []       # byte offset of each line
+        self.days = []          # finished day ordinal of each line (or 0)
+        self.first = None       # first / last finished day ordinal
+        self.last = None
+        self.sorted = True      # lines are in finished date order
+        self.projects = set()
+        self.contexts = set()
+
+    def __repr__(self):
+        return "<Segment {0} ({1} tasks)>".format(self.name, len(self))
+
+    def __len__(self):
+        self.load()
+        return len(self.offsets)
+
+    def load(self):
+        """Reads the sidecar unless it was read already."""
+        if not self.loaded:
+            self.load_index()
+
+    def month_days(self):
+        """Returns the (first, last) day ordinals of the month of the
+        segment, None for the undated segment."""
+        if self.name == UNDATED:
+            return None
+        first = date(int(self.name[:4]), int(self.name[5:7]), 1)
+        following = (first + timedelta(days=31)).replace(day=1)
+        return first.toordinal(), following.toordinal() - 1
+
+    def load_index(self):
+        """Reads the sidecar, rebuilds it when it is missing, corrupt or
+        does not cover the segment file (interrupted append)."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data["size"] != size:
+                raise ValueError("stale index")
+        except (IOError, OSError, ValueError, KeyError):
+            self.rebuild()
+            return
+
+        self.size = data["size"]
+        self.offsets = data["offsets"]
+        self.days = data["days"]
+        self.first = data["first"]
+        self.last = data["last"]
+        self.sorted = data["sorted"]
+        self.projects = set(data["projects"])
+        self.contexts = set(data["contexts"])
+        self.loaded = True
+
+    def save_index(self):
+        self.loaded = True
+        data = {"size": self.size, "offsets": self.offsets,
+                "days": self.days, "first": self.first, "last": self.last,
+                "sorted": self.sorted, "projects": sorted(self.projects),
+                "contexts": sorted(self.contexts)}
+        atomic_write(self.index_path, json.dumps(data).encode("utf-8"))
+
+    def _index_lines(self, lines, offset):
+        """Adds raw lines (str) starting at byte offset to the index.
+
+            Returns: the byte offset after the lines.
+        """
+        for line in lines:
+            fields = tokenize(line)
+            day = fields[1].toordinal() if fields[1] is not None else 0
+            if self.days and day < self.days[-1]:
+                self.sorted = False
+            self.offsets.append(offset)
+            self.days.append(day)
+            if fields[1] is not None:
+                self.first = day if self.first is None \
+                    else min(self.first, day)
+                self.last = day if self.last is None else max(self.last, day)
+            self.projects.update(fields[8])
+            self.contexts.update(fields[7])
+            offset += len(line.encode("utf-8")) + 1
+        return offset
+
+    def rebuild(self):
+        """Rebuilds the index from the segment file."""
+        self._reset()
+        if os.path.exists(self.path):
+            self._index_lines(self.read_lines(), 0)
+            self.size = os.path.getsize(self.path)
+        self.save_index()
+
+    def read_lines(self):
+        """Returns the raw lines of the segment."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            lines = f.read().decode("utf-8").split("\n")
+        return lines[:-1] if not lines[-1] else lines
+
+    def append(self, lines):
+        """Appends raw lines to the segment and updates the sidecar."""
+        self.load()
+        data = u"".join(x + u"\n" for x in lines).encode("utf-8")
+        self.size = append_durable(self.path, data)
+        self.size = self._index_lines(lines, self.size)
+        self.save_index()
+
+    def rewrite(self, lines):
+        """Replaces the content of the segment with raw lines."""
+        if not lines:
+            for path in (self.path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._reset()
+            self.loaded = True
+            return
+        atomic_write(self.path,
+                     u"".join(x + u"\n" for x in lines).encode("utf-8"))
+        self._reset()
+        self.size = self._index_lines(lines, 0)
+        self.save_index()
+
+    def may_match(self, since, until, tags):
+        """False when no line can be finished in [since, until] (day
+        ordinals or None) or carry all tags. The sidecar is only read when
+        the month of the segment is in the date range."""
+        if since is not None or until is not None:
+            days = self.month_days()
+            if days is None or (since is not None and days[1] < since) \
+                    or (until is not None and days[0] > until):
+                return False
+        self.load()
+        if since is not None or until is not None:
+            if self.first is None:
+                return False
+            if since is not None and self.last < since:
+                return False
+            if until is not None and self.first > until:
+                return False
+        for tag in tags:
+            if tag not in (self.projects if tag[0] == "+" else self.contexts):
+                return False
+        return True
+
+    def read_range(self, since, until):
+        """Returns the raw lines finished in [since, until], seeking to
+        them in a sorted segment, all lines otherwise."""
+        self.load()
+        lo, hi = 0, len(self.offsets)
+        if self.sorted:
+            if since is not None:
+                lo = bisect_left(self.days, since)
+            if until is not None:
+                hi = bisect_right(self.days, until)
+        if lo >= hi:
+            return []
+        end = self.offsets[hi] if hi < len(self.offsets) else self.size
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[lo])
+            data = f.read(end - self.offsets[lo])
+        return data.decode("utf-8").split("\n")[:-1]
+
+
+class ArchiveStore(object):
+    """A directory of archive segments, see the module documentation."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments = {}      # type: Dict[str, Segment]
+        # TextFormat of the last imported done.txt, for export()
+        self.text_format = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name in sorted(os.listdir(directory)):
+            match = SEGMENT_PATTERN.match(name)
+            if match is not None:
+                segment = Segment(directory, match.group(1))
+                self.segments[segment.name] = segment
+
+    def __repr__(self):
+        return "<ArchiveStore '{0}' ({1} segments)>".format(
+            self.directory, len(self.segments))
+
+    def __len__(self):
+        return sum(len(x) for x in self.segments.values())
+
+    def _ordered(self):
+        """Segments in chronological order, "undated" first."""
+        return [self.segments[x] for x in sorted(
+            self.segments, key=lambda x: "" if x == UNDATED else x)]
+
+    def _segment(self, name):
+        segment = self.segments.get(name)
+        if segment is None:
+            segment = self.segments[name] = Segment(self.directory, name)
+        return segment
+
+    def append(self, tasks):
+        """Archives tasks (Task objects or raw lines).
+
+            Returns: the number of archived tasks.
+        """
+        groups = {}
+        for task in tasks:
+            line = task if isinstance(task, str) else task.rebuild_raw_todo()
+            line = line.strip()
+            if line:
+                groups.setdefault(segment_name(tokenize(line)[1]),
+                                  []).append(line)
+        for name in sorted(groups):
+            self._segment(name).append(groups[name])
+        return sum(len(x) for x in groups.values())
+
+    def import_file(self, path):
+        """Archives the lines of a done.txt file, in the encoding it is
+        detected in.
+
+            Returns: the number of archived tasks.
+        """
+        data = read_file(path)[0]
+        try:
+            text, self.text_format = decode(data)
+        finally:
+            release(data)
+        return self.append(split_lines(text))
+
+    def query(self, text=""):
+        """Returns the archived tasks that match a query (todotxt.query
+        syntax), in segment order. "done" date terms and project/context
+        terms select the segments that are read.
+
+            Args: text / str
+
+            Returns: list of Task
+        """
+        query = Query(text)
+        since = until = None
+        tags = []
+        for term in query.terms:
+            if isinstance(term, Tag):
+                tags.append(term.tag)
+            elif isinstance(term, DateCompare) \
+                    and term.field == "finished_date":
+                if term.since is not None:
+                    since = term.since if since is None \
+                        else max(since, term.since)
+                if term.until is not None:
+                    until = term.until if until is None \
+                        else min(until, term.until)
+
+        predicate = Query.fuse(query.terms)
+        retval = []
+        for segment in self._ordered():
+            if segment.may_match(since, until, tags):
+                # a tag is a substring of its line, cheaper than parsing
+                lines = [x for x in segment.read_range(since, until)
+                         if all(y in x for y in tags)]
+                retval.extend(filter(predicate, parse_many(lines)))
+        return retval
+
+    def compact(self):
+        """Moves misplaced lines to their segment and sorts every segment
+        by finished date (stable), so date queries can seek.
+
+            Returns: the number of rewritten segments.
+        """
+        groups = {}
+        for segment in self._ordered():
+            for line in segment.read_lines():
+                groups.setdefault(segment_name(tokenize(line)[1]),
+                                  []).append(line)
+
+        rewritten = 0
+        for name in sorted(set(groups) | set(self.segments)):
+            segment = self._segment(name)
+            lines = groups.get(name, [])
+            lines.sort(key=segment_day)
+            if lines != segment.read_lines():
+                segment.rewrite(lines)
+                rewritten += 1
+            if not lines:
+                del self.segments[name]
+        return rewritten
+
+    def export(self, path, text_format=None):
+        """Writes every archived task into a single done.txt (atomic),
+        in segment order.
+
+            Args:
+                path: the done.txt file.
+                text_format(=None): todotxt.encoding.TextFormat, default:
+                    the format of path if it exists, else of the last
+                    imported file (UTF-8 if none).
+
+            Returns: the number of exported tasks.
+        """
+        if text_format is None:
+            text_format = detect_file(path) if os.path.exists(path) \
+                else self.text_format
+        lines = []
+        for segment in self._ordered():
+            lines.extend(segment.read_lines())
+        atomic_write(path, encode(lines, text_format))
+        return len(lines)
+
+    def date_range(self):
+        """Returns (first, last) finished date of the store, or None."""
+        for segment in self.segments.values():
+            segment.load()
+        days = [(x.first, x.last) for x in self.segments.values()
+                if x.first is not None]
+        if not days:
+            return None
+        return (date.fromordinal(min(x[0] for x in days)),
+                date.fromordinal(max(x[1] for x in days)))
+
+
+def segment_day(line):
+    """The finished day ordinal of a raw line, 0 if it has none."""
+    finished_date = tokenize(line)[1]
+    return finished_date.toordinal() if finished_date is not None else 0
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""Batch mutations of a Tasks object, with undo / redo.
+
+    with tasks.batch(save=True) as b:
+        b.complete([3, 8, 13])                  # tids
+        b.set_priority("+release -finished", "B")   # a query
+        b.add_tag(tasks.query("@phone"), "+q3")
+        b.add(["call Bob", "write report +q3"])
+    tasks.undo()        # reverts the whole batch
+    tasks.redo()
+
+Targets are tids (int), Task objects, a query (str, todotxt.query syntax)
+or a list / Tasks of these. They are selected when the method is called,
+among the tasks before the batch. Nothing changes until the block ends
+without an exception; then the changes are applied in one pass:
+- the raw_todo of every changed task is rebuilt once,
+- removed tasks are dropped in one filter of the list and added lines are
+  parsed in one batch,
+- the index, the sorted views and the journal (one write) are updated
+  once, and with save=True the collection is saved once.
+
+Each batch leaves a Transaction in tasks.undo_log: the changed tasks with
+their old and new raw_todo, the removed tasks with their positions and the
+added tasks. undo() restores the old lines (the tasks are parsed from
+them again), redo() applies the batch again. The log keeps the last
+UNDO_LIMIT batches, a new batch clears what can be redone.
+"""
+
+from collections import namedtuple
+
+from todotxt import BaseTask, Tasks, NO_PRIORITY_CHARACTER, \
+    date_value, parse_many
+from todotxt.query import Query
+
+UNDO_LIMIT = 100
+
+# changed: list of (Task, old raw_todo, new raw_todo)
+# removed: list of (position, Task), ascending positions
+# added: list of Task
+Transaction = namedtuple("Transaction", ["changed", "removed", "added"])
+
+
+class Batch(object):
+    """The changes of a tasks.batch() block, see the module
+    documentation."""
+
+    def __init__(self, tasks, save=False):
+        self.tasks = tasks
+        self.save = save
+        self.transaction = None     # the committed Transaction
+        self._edits = []            # (list of Task, function of a task)
+        self._removed = {}          # id(task) -> task
+        self._added = []            # texts
+        self._tids = None           # tid -> list of Task
+
+    def __repr__(self):
+        return "<Batch {0} edits, {1} removals, {2} additions>".format(
+            len(self._edits), len(self._removed), len(self._added))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def select(self, targets):
+        """Returns the tasks of targets (see the module documentation)."""
+        if isinstance(targets, (int, str, BaseTask)):
+            targets = [targets]
+        retval = []
+        for target in targets:
+            if isinstance(target, BaseTask):
+                retval.append(target)
+            elif isinstance(target, str):
+                retval.extend(Query(target).run(self.tasks))
+            elif isinstance(target, Tasks):
+                retval.extend(target.tasks)
+            elif isinstance(target, int):
+                if self._tids is None:
+                    self._tids = {}
+                    for task in self.tasks.tasks:
+                        self._tids.setdefault(task.tid, []).append(task)
+                if target not in self._tids:
+                    raise KeyError("no task with tid {0}".format(target))
+                retval.extend(self._tids[target])
+            else:
+                retval.extend(self.select(target))
+        return retval
+
+    def _edit(self, targets, function):
+        selected = self.select(targets)
+        self._edits.append((selected, function))
+        return len(selected)
+
+    def add(self, texts):
+        """Adds a task (str) or tasks (list of str)."""
+        self._added.extend([texts] if isinstance(texts, str) else texts)
+
+    def remove(self, targets):
+        """Removes the target tasks.
+
+            Returns: the number of selected tasks.
+        """
+        selected = self.select(targets)
+        for task in selected:
+            self._removed[id(task)] = task
+        return len(selected)
+
+    def complete(self, targets, finished_date=None):
+        """Marks the target tasks as finished (default date: today)."""
+        finished_date = date_value("today" if finished_date is None
+                                   else finished_date)
+
+        def complete(task):
+            task.finished = True
+            task.finished_date = finished_date
+        return self._edit(targets, complete)
+
+    def reopen(self, targets):
+        """Marks the target tasks as not finished."""
+        def reopen(task):
+            task.finished = False
+            task.finished_date = None
+        return self._edit(targets, reopen)
+
+    def set_priority(self, targets, priority):
+        """Sets the priority ("A".."Z", None for no priority)."""
+        if priority is None:
+            priority = NO_PRIORITY_CHARACTER
+        if len(priority) != 1 or not (
+                "A" <= priority <= "Z" or priority == NO_PRIORITY_CHARACTER):
+            raise ValueError("invalid priority: {0!r}".format(priority))
+
+        def set_priority(task):
+            task.priority = priority
+        return self._edit(targets, set_priority)
+
+    def set_due(self, targets, value):
+        """Sets the due date (date_value() argument, None removes it)."""
+        due = date_value(value) if value is not None else None
+        if value is not None and due is None:
+            raise ValueError("invalid date: {0!r}".format(value))
+
+        def set_due(task):
+            task.due_date = due
+        return self._edit(targets, set_due)
+
+    def add_tag(self, targets, tag):
+        """Adds a project ("+tag") or context ("@tag") to the targets."""
+        field = _tag_field(tag)
+
+        def add_tag(task):
+            tags = getattr(task, field)
+            if tag not in tags:
+                setattr(task, field, list(tags) + [tag])
+        return self._edit(targets, add_tag)
+
+    def remove_tag(self, targets, tag):
+        """Removes a project ("+tag") or context ("@tag") from the
+        targets."""
+        field = _tag_field(tag)
+
+        def remove_tag(task):
+            tags = getattr(task, field)
+            if tag in tags:
+                setattr(task, field, [x for x in tags if x != tag])
+        return self._edit(targets, remove_tag)
+
+    def commit(self):
+        """Applies the changes (done by the with block).
+
+            Returns: the Transaction, None if there was nothing to do.
+        """
+        if self.transaction is not None:
+            raise RuntimeError("the batch is already committed")
+        tasks = self.tasks
+
+        old = {}        # id(task) -> (task, old raw_todo)
+        for selected, function in self._edits:
+            for task in selected:
+                if id(task) not in old:
+                    old[id(task)] = (task, task.raw_todo)
+                function(task)
+        changed = []
+        for task, raw in old.values():
+            if task.rebuild_raw_todo() != raw:
+                changed.append((task, raw, task.raw_todo))
+
+        removed = []
+        if self._removed:
+            kept = []
+            for position, task in enumerate(tasks.tasks):
+                if id(task) in self._removed:
+                    removed.append((position, task))
+                else:
+                    kept.append(task)
+            tasks.tasks = kept
+        added = parse_many(self._added, len(tasks.tasks))
+        tasks.tasks.extend(added)
+
+        self._edits, self._removed, self._added = [], {}, []
+        self.transaction = Transaction(changed, removed, added)
+        if not (changed or removed or added):
+            return None
+
+        apply_derived(tasks, [x[0] for x in changed],
+                      [x[1] for x in removed], added)
+        tasks.undo_log.append(self.transaction)
+        del tasks.undo_log[:-UNDO_LIMIT]
+        tasks.redo_log = []
+        if self.save:
+            tasks.save()
+        return self.transaction
+
+
+def _tag_field(tag):
+    if len(tag) > 1 and " " not in tag:
+        if tag[0] == "+":
+            return "projects"
+        if tag[0] == "@":
+            return "contexts"
+    raise ValueError("not a +project or @context: {0!r}".format(tag))
+
+
+def apply_derived(tasks, changed, removed, added, moved=False):
+    """Brings the index, the sorted views and the journal of tasks up to
+    date with changed, removed and added Task objects, at once.
+
+        Args:
+            moved(=False): added tasks were inserted, not appended.
+    """
+    tasks._touch()
+    if tasks.index is not None:
+        for task in removed:
+            tasks.index.remove(task)
+        for task in changed:
+            tasks.index.update(task)
+        for task in added:
+            tasks.index.add(task)
+    if tasks._fulltext is not None:
+        for task in removed:
+            tasks._fulltext.remove(task)
+        for task in changed:
+            tasks._fulltext.update(task)
+        for task in added:
+            tasks._fulltext.add(task)
+
+    if tasks.journal is not None:
+        if removed or moved:
+            tasks._log({"op": "reset",
+                        "raw": [x.raw_todo for x in tasks.tasks]})
+        else:
+            ids = set(id(x) for x in changed)
+            records = [{"op": "set", "at": i, "raw": x.raw_todo}
+                       for i, x in enumerate(tasks.tasks) if id(x) in ids]
+            records.extend({"op": "add", "raw": x.raw_todo} for x in added)
+            if records:
+                tasks._log(*records)
+
+
+def _set_raw(task, raw):
+    task.raw_todo = raw
+    task.parse()
+
+
+def undo(tasks):
+    """Reverts the last transaction of tasks.undo_log.
+
+        Returns: the Transaction, None if the log is empty.
+    """
+    if not tasks.undo_log:
+        return None
+    transaction = tasks.undo_log.pop()
+    changed, removed, added = transaction
+
+    for task, raw, _ in changed:
+        _set_raw(task, raw)
+    if added:
+        ids = set(id(x) for x in added)
+        tasks.tasks = [x for x in tasks.tasks if id(x) not in ids]
+    for position, task in removed:
+        tasks.tasks.insert(min(position, len(tasks.tasks)), task)
+
+    # what the transaction added is removed now and the other way round
+    apply_derived(tasks, [x[0] for x in changed], added,
+                  [x[1] for x in removed], bool(removed))
+    tasks.redo_log.append(transaction)
+    return transaction
+
+
+def redo(tasks):
+    """Applies the last undone transaction again.
+
+        Returns: the Transaction, None if there is nothing to redo.
+    """
+    if not tasks.redo_log:
+        return None
+    transaction = tasks.redo_log.pop()
+    changed, removed, added = transaction
+
+    for task, _, raw in changed:
+        _set_raw(task, raw)
+    if removed:
+        ids = set(id(x[1]) for x in removed)
+        tasks.tasks = [x for x in tasks.tasks if id(x) not in ids]
+    tasks.tasks.extend(added)
+
+    apply_derived(tasks, [x[0] for x in changed], [x[1] for x in removed],
+                  added)
+    tasks.undo_log.append(transaction)
+    return transaction
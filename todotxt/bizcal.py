@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Business-day calendars.
+
+A BusinessCalendar holds its holidays as day ordinals. The number of
+business days up to a day is a closed-form weekday count minus a binary
+search over the sorted holidays, so adding or subtracting N business
+days and counting business days between two dates do not walk the days
+one by one:
+
+    jp = register_calendar("jp", ["2017-01-02", "2017-01-09"])
+    jp.add(datetime(2016, 12, 30), 3)       # 2017-01-05
+    jp.count(datetime(2017, 1, 1), datetime(2017, 1, 31))
+"""
+
+from bisect import bisect_right
+from datetime import date, datetime
+
+WEEKEND = (5, 6)    # sat, sun
+
+_calendars = {}     # type: Dict[str, BusinessCalendar]
+
+
+def to_ordinal(value):
+    """Returns the day ordinal of a date, datetime or "YYYY-MM-DD"
+    (or "YYYY/MM/DD") string."""
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.strptime(value.replace("/", "-"), "%Y-%m-%d") \
+        .toordinal()
+
+
+class BusinessCalendar(object):
+    """Business days: weekdays outside the weekend that are no holiday."""
+
+    def __init__(self, holidays=(), name=None, weekend=WEEKEND):
+        """
+            Args:
+                holidays: iterable of date, datetime or "YYYY-MM-DD" str.
+                name(=None): name of the calendar.
+                weekend(=(5, 6)): weekday numbers that are no business
+                    days (monday is 0).
+        """
+        self.name = name
+        self.weekend = frozenset(weekend)
+        # business weekdays of a week, ordinal 1 (0001-01-01) is a monday
+        self._week = [x for x in range(7) if x not in self.weekend]
+        if not self._week:
+            raise ValueError("a week needs at least one business day")
+        # _partial[r]: business weekdays among the first r days of a week
+        self._partial = [sum(1 for x in self._week if x < r)
+                         for r in range(8)]
+        self._holidays = set()
+        self._sorted = []       # holidays that fall on business weekdays
+        self.add_holidays(holidays)
+
+    def __repr__(self):
+        return "<BusinessCalendar {0!r} ({1} holidays)>".format(
+            self.name, len(self._holidays))
+
+    def __contains__(self, value):
+        return self.is_business_day(value)
+
+    @property
+    def holidays(self):
+        """The sorted holidays as date objects."""
+        return [date.fromordinal(x) for x in sorted(self._holidays)]
+
+    def add_holidays(self, holidays):
+        """Adds holidays (date, datetime or "YYYY-MM-DD" str)."""
+        self._holidays.update(to_ordinal(x) for x in holidays)
+        self._sorted = sorted(x for x in self._holidays
+                              if (x - 1) % 7 not in self.weekend)
+
+    def is_business_day(self, value):
+        ordinal = to_ordinal(value)
+        return (ordinal - 1) % 7 not in self.weekend \
+            and ordinal not in self._holidays
+
+    def _weekdays(self, ordinal):
+        """Business weekdays (holidays included) in [1, ordinal]."""
+        weeks, rest = divmod(ordinal, 7)
+        return weeks * len(self._week) + self._partial[rest]
+
+    def _business(self, ordinal):
+        """Business days in [1, ordinal]."""
+        return self._weekdays(ordinal) - bisect_right(self._sorted, ordinal)
+
+    def _weekday_at(self, count):
+        """The smallest ordinal with _weekdays(ordinal) >= count."""
+        weeks, rest = divmod(count - 1, len(self._week))
+        return weeks * 7 + self._week[rest] + 1
+
+    def _business_at(self, count):
+        """The smallest ordinal with _business(ordinal) >= count. Each
+        round skips the holidays found so far, it ends when no new
+        holiday falls in the skipped range."""
+        if count < 1:
+            raise OverflowError("business date out of range")
+        ordinal = self._weekday_at(count)
+        while True:
+            missing = count - self._business(ordinal)
+            if missing <= 0:
+                return ordinal
+            ordinal = self._weekday_at(self._weekdays(ordinal) + missing)
+
+    def count(self, start, end):
+        """Business days in (start, end], negative when end < start."""
+        return self._business(to_ordinal(end)) \
+            - self._business(to_ordinal(start))
+
+    def add(self, start, days):
+        """Adds (or subtracts) business days.
+
+            Args:
+                start: date or datetime, the time of day is kept.
+                days: int, business days to add (< 0 to subtract).
+
+            Returns: the days-th business day after (before) start, start
+                itself for 0.
+        """
+        if days == 0:
+            return start
+        ordinal = start.toordinal()
+        if days > 0:
+            target = self._business_at(self._business(ordinal) + days)
+        else:
+            target = self._business_at(self._business(ordinal - 1)
+                                       + days + 1)
+        return start + (date.fromordinal(target) - date.fromordinal(ordinal))
+
+
+def register_calendar(name, holidays=(), weekend=WEEKEND):
+    """Creates a named calendar (replacing one with the same name).
+
+        Returns: BusinessCalendar
+    """
+    calendar = _calendars[name] = BusinessCalendar(holidays, name, weekend)
+    return calendar
+
+
+def get_named_calendar(name):
+    """Returns the calendar registered as name (KeyError if unknown)."""
+    return _calendars[name]
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Columnar (NumPy) view of tasks for vectorized reports.
+
+    columns = tasks.to_columns()
+    overdue_by_project(columns)             # {"+work": 12, ...}
+    mean_completion_lag(columns)            # days from created to done
+    burndown(columns, "2016-01-01", "2016-12-31")
+
+TaskColumns holds one array per field:
+
+    priority        uint8, 0 for no priority, 1..26 for A..Z
+    finished        bool
+    created, done, due, threshold
+                    datetime64[D], NaT when the date is unset
+    projects / contexts
+                    dictionary-encoded CSR: the tags of task i are
+                    names[indices[indptr[i]:indptr[i + 1]]]
+
+Needs NumPy (ImportError otherwise).
+"""
+
+from datetime import date
+
+try:
+    import numpy
+except ImportError:     # optional, to_columns() raises then
+    numpy = None
+
+from todotxt import NO_PRIORITY_CHARACTER, date_value
+
+_EPOCH = date(1970, 1, 1).toordinal()     # day 0 of datetime64[D]
+
+
+def priority_code(priority):
+    """Returns the uint8 code of a priority ("A" is 1, none is 0)."""
+    if priority == NO_PRIORITY_CHARACTER:
+        return 0
+    return ord(priority) - ord("A") + 1
+
+
+def _day(value):
+    """datetime64[D] of a date, datetime or date_value() str."""
+    if not isinstance(value, date):
+        value = date_value(value)
+    return numpy.datetime64(value.toordinal() - _EPOCH, "D")
+
+
+class TagColumn(object):
+    """Dictionary-encoded tags of the tasks in CSR layout."""
+
+    def __init__(self, names, indptr, indices):
+        self.names = names          # list<str>, sorted
+        self.indptr = indptr        # int64[n + 1]
+        self.indices = indices      # int32, positions in names
+        self._codes = dict((x, i) for i, x in enumerate(names))
+
+    def __repr__(self):
+        return "<TagColumn {0} tags, {1} entries>".format(
+            len(self.names), len(self.indices))
+
+    def code(self, name):
+        """Returns the position of a tag in names, -1 if unknown."""
+        return self._codes.get(name, -1)
+
+    def rows(self):
+        """Returns the task position of every entry of indices."""
+        return numpy.repeat(numpy.arange(len(self.indptr) - 1),
+                            numpy.diff(self.indptr))
+
+    def mask(self, name):
+        """Returns a bool array, True for the tasks that carry the tag."""
+        retval = numpy.zeros(len(self.indptr) - 1, dtype=bool)
+        code = self.code(name)
+        if code >= 0:
+            retval[self.rows()[self.indices == code]] = True
+        return retval
+
+    def counts(self, mask=None):
+        """Returns {tag: number of tasks}, of the tasks in mask if given."""
+        indices = self.indices
+        if mask is not None:
+            indices = indices[numpy.asarray(mask, dtype=bool)[self.rows()]]
+        counts = numpy.bincount(indices, minlength=len(self.names))
+        return dict((x, int(y)) for x, y in zip(self.names, counts) if y)
+
+
+class TaskColumns(object):
+    """Column arrays of a list of tasks, see the module documentation."""
+
+    def __init__(self, tasks):
+        if numpy is None:
+            raise ImportError("to_columns() needs NumPy")
+        self.tasks = list(tasks)
+        count = len(self.tasks)
+
+        priorities = bytearray(count)
+        finished = bytearray(count)
+        dates = [numpy.empty(count, dtype="int64") for _ in range(4)]
+        fields = ("created_date", "finished_date", "due_date",
+                  "threshold_date")
+        tags = ({}, {})                 # tag -> code, in first-seen order
+        indptr = (numpy.empty(count + 1, dtype="int64"),
+                  numpy.empty(count + 1, dtype="int64"))
+        indices = ([], [])
+        nat = numpy.iinfo("int64").min  # NaT as int64
+
+        for i, task in enumerate(self.tasks):
+            priorities[i] = priority_code(task.priority)
+            finished[i] = 1 if task.finished else 0
+            for column, field in zip(dates, fields):
+                value = getattr(task, field)
+                column[i] = value.toordinal() - _EPOCH \
+                    if value is not None else nat
+            for j, values in enumerate((task.projects, task.contexts)):
+                indptr[j][i] = len(indices[j])
+                codes = tags[j]
+                for tag in values:
+                    code = codes.get(tag)
+                    if code is None:
+                        code = codes[tag] = len(codes)
+                    indices[j].append(code)
+        for j in range(2):
+            indptr[j][count] = len(indices[j])
+
+        self.priority = numpy.frombuffer(bytes(priorities), dtype="uint8")
+        self.finished = numpy.frombuffer(bytes(finished), dtype="uint8") \
+            .astype(bool)
+        self.created, self.done, self.due, self.threshold = \
+            [x.view("datetime64[D]") for x in dates]
+
+        columns = []
+        for j in range(2):
+            # renumber the codes in tag order
+            names = sorted(tags[j])
+            order = numpy.empty(len(names), dtype="int32")
+            for position, name in enumerate(names):
+                order[tags[j][name]] = position
+            columns.append(TagColumn(
+                names, indptr[j],
+                order[numpy.array(indices[j], dtype="int64")]
+                if indices[j] else numpy.empty(0, dtype="int32")))
+        self.projects, self.contexts = columns
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __repr__(self):
+        return "<TaskColumns {0} tasks>".format(len(self))
+
+    def select(self, mask):
+        """Returns the tasks of a bool mask (or index array)."""
+        return [self.tasks[x] for x in numpy.flatnonzero(mask)] \
+            if numpy.asarray(mask).dtype == bool \
+            else [self.tasks[x] for x in mask]
+
+
+def to_columns(tasks):
+    """Returns the TaskColumns of an iterable of Task."""
+    return TaskColumns(tasks)
+
+
+def overdue(columns, today=None):
+    """Returns a bool mask of the open tasks due before today.
+
+        Args:
+            columns: TaskColumns
+            today(=None): date, datetime or date_value() str, default today
+    """
+    today = _day("today" if today is None else today)
+    return ~columns.finished & (columns.due < today)
+
+
+def overdue_by_project(columns, today=None):
+    """Returns {project: number of overdue tasks}."""
+    return columns.projects.counts(overdue(columns, today))
+
+
+def completion_lag(columns):
+    """Returns the days from created to finished date (float array) of the
+    finished tasks that have both dates, and their positions.
+
+        Returns: (lags, positions)
+    """
+    mask = columns.finished & ~numpy.isnat(columns.created) \
+        & ~numpy.isnat(columns.done)
+    positions = numpy.flatnonzero(mask)
+    lags = (columns.done[positions] - columns.created[positions]) \
+        .astype("int64").astype(float)
+    return lags, positions
+
+
+def mean_completion_lag(columns, by=None):
+    """Returns the mean completion lag in days (nan without data), or
+    {tag: mean lag} when by is "projects" or "contexts"."""
+    lags, positions = completion_lag(columns)
+    if by is None:
+        return float(lags.mean()) if len(lags) else float("nan")
+
+    tags = getattr(columns, by)
+    # lag of each task (nan if none) spread over the task's tag entries
+    per_task = numpy.full(len(columns), numpy.nan)
+    per_task[positions] = lags
+    values = per_task[tags.rows()]
+    valid = ~numpy.isnan(values)
+    sums = numpy.bincount(tags.indices[valid], values[valid],
+                          minlength=len(tags.names))
+    counts = numpy.bincount(tags.indices[valid], minlength=len(tags.names))
+    return dict((x, float(y) / z) for x, y, z in
+                zip(tags.names, sums, counts) if z)
+
+
+def burndown(columns, since, until, mask=None):
+    """Counts the open tasks at the end of each day in [since, until]. A
+    task is open from its created date (since if unset) until its finished
+    date (forever if not finished or without finished date), a task with
+    both dates in the same day is never open.
+
+        Args:
+            columns: TaskColumns
+            since, until: date, datetime or date_value() str
+            mask(=None): bool array, only count these tasks
+
+        Returns: (days as datetime64[D] array, open counts as int64 array)
+    """
+    first = _day(since)
+    last = _day(until)
+    days = numpy.arange(first, last + 1)
+    span = len(days)
+
+    select = numpy.ones(len(columns), dtype=bool) if mask is None \
+        else numpy.asarray(mask, dtype=bool)
+    start = numpy.where(numpy.isnat(columns.created), first,
+                        columns.created)
+    closes = select & columns.finished & ~numpy.isnat(columns.done)
+    # a task finished before its created date closes when it opens
+    end = numpy.maximum(columns.done[closes], start[closes])
+    start = start[select]
+
+    def histogram(values):
+        # values before since count on day 0, after until not at all
+        offsets = (values - first).astype("int64")
+        offsets = offsets[offsets < span]
+        return numpy.bincount(numpy.maximum(offsets, 0), minlength=span)
+
+    opened = numpy.cumsum(histogram(start))
+    closed = numpy.cumsum(histogram(end))
+    return days, opened - closed
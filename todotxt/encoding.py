@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Encoding and newline detection of todo.txt files.
+
+A file is read as bytes in one call (through mmap from MMAP_THRESHOLD
+bytes on) and its format is detected once:
+
+    BOM                     UTF-8 with BOM, UTF-16 LE / BE
+    no BOM                  UTF-16 when every other byte of the head is
+                            NUL, else UTF-8 when the content decodes,
+                            else cp932 (Shift-JIS files of Windows
+                            Simpletask), else UTF-8 with surrogateescape
+                            (undecodable bytes survive a save unchanged)
+    newline                 the first "\\r\\n", "\\n" or "\\r" of the text
+
+Tasks.load() keeps the TextFormat of its file and save() writes the file
+back in it, so an unchanged collection is saved byte for byte as it was
+read. New files are UTF-8 without BOM and with "\\n" newlines.
+"""
+
+import codecs
+import mmap
+import os
+from collections import namedtuple
+
+MMAP_THRESHOLD = 16 << 20   # files from this size on are read through mmap
+DETECT_BYTES = 1 << 16      # head of a file used to detect its format
+
+BOMS = ((codecs.BOM_UTF8, "utf-8"),
+        (codecs.BOM_UTF16_LE, "utf-16-le"),
+        (codecs.BOM_UTF16_BE, "utf-16-be"))
+
+# encoding: codec of the text after the BOM; bom: bytes (b"" for none);
+# newline: "\n", "\r\n" or "\r"; errors: codec error handler
+TextFormat = namedtuple("TextFormat", ["encoding", "bom", "newline",
+                                       "errors"])
+
+DEFAULT_FORMAT = TextFormat("utf-8", b"", "\n", "strict")
+
+
+def read_file(path):
+    """Reads a file in one call, or maps it from MMAP_THRESHOLD bytes on.
+
+        Returns: (data, os.stat_result), data is bytes or a read-only
+            mmap (pass it to release() when done).
+    """
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size < MMAP_THRESHOLD:
+            return f.read(), stat
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), stat
+
+
+def release(data):
+    """Closes the mmap of read_file()."""
+    if isinstance(data, mmap.mmap):
+        data.close()
+
+
+def _text(data, start, encoding, errors="strict"):
+    """Decodes data[start:] without copying it first (bytes or mmap)."""
+    with memoryview(data) as view:
+        with view[start:] as body:
+            return str(body, encoding, errors)
+
+
+def _utf16(head):
+    """UTF-16 codec of BOM-less content, None if it does not look like
+    UTF-16 (ASCII-range text has a NUL in every other byte)."""
+    head = head[:DETECT_BYTES & ~1]
+    if len(head) < 2:
+        return None
+    if head[1::2].count(0) * 2 > len(head) // 2 and not head[0::2].count(0):
+        return "utf-16-le"
+    if head[0::2].count(0) * 2 > len(head) // 2 and not head[1::2].count(0):
+        return "utf-16-be"
+    return None
+
+
+def _newline(text):
+    position = text.find("\n", 0, DETECT_BYTES)
+    if position > 0 and text[position - 1] == "\r":
+        return "\r\n"
+    if position < 0 and "\r" in text[:DETECT_BYTES]:
+        return "\r"
+    return "\n"
+
+
+def decode(data):
+    """Detects the format of file content and decodes it.
+
+        Args:
+            data: bytes or mmap
+
+        Returns: (text, TextFormat)
+    """
+    head = data[:DETECT_BYTES]
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            text = _text(data, len(bom), encoding)
+            return text, TextFormat(encoding, bom, _newline(text), "strict")
+
+    encoding = _utf16(head)
+    candidates = [encoding] if encoding is not None else ["utf-8", "cp932"]
+    for encoding in candidates:
+        try:
+            text = _text(data, 0, encoding)
+        except UnicodeDecodeError:
+            continue
+        return text, TextFormat(encoding, b"", _newline(text), "strict")
+
+    text = _text(data, 0, "utf-8", "surrogateescape")
+    return text, TextFormat("utf-8", b"", _newline(text), "surrogateescape")
+
+
+def split_lines(text):
+    """Returns the stripped, non-empty lines of text."""
+    return [x for x in map(str.strip, text.splitlines()) if x]
+
+
+def encode(lines, text_format=None):
+    """Returns the file content (bytes) of lines in a TextFormat
+    (default: DEFAULT_FORMAT), the BOM included."""
+    fmt = text_format or DEFAULT_FORMAT
+    if not lines:
+        return fmt.bom
+    return fmt.bom + (fmt.newline.join(lines) + fmt.newline).encode(
+        fmt.encoding, fmt.errors)
+
+
+def detect_file(path):
+    """Returns the TextFormat of a file from its head, DEFAULT_FORMAT when
+    it is missing or empty."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(DETECT_BYTES)
+    except (IOError, OSError):
+        return DEFAULT_FORMAT
+    if not head:
+        return DEFAULT_FORMAT
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            text = head[len(bom):].decode(encoding, "ignore")
+            return TextFormat(encoding, bom, _newline(text), "strict")
+    encoding = _utf16(head)
+    candidates = [encoding] if encoding is not None else ["utf-8", "cp932"]
+    for encoding in candidates:
+        try:
+            # the head may end in the middle of a character
+            text = codecs.getincrementaldecoder(encoding)().decode(head)
+        except UnicodeDecodeError:
+            continue
+        return TextFormat(encoding, b"", _newline(text), "strict")
+    return TextFormat("utf-8", b"", _newline(
+        head.decode("utf-8", "surrogateescape")), "surrogateescape")
+
+
+def append_data(path, lines):
+    """Returns the bytes that append lines to a file in the file's own
+    format (without its BOM, which is at the start of the file)."""
+    return encode(lines, detect_file(path)._replace(bom=b""))
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""Full-text index of the task texts (Task.todo), live and archived.
+
+    tasks = Tasks("todo.txt", "done.txt", fulltext=True)
+    tasks.load()
+    tasks.search('invoice "client x" 会議')       # done.txt included
+    tasks.search("invoice", limit=10, archived=False)
+
+Text is normalized (NFKC, case folded) and split into terms: a run of
+letters and digits is a word, a run of CJK characters (kana, kanji,
+hangul), which has no word boundaries, gives its character bigrams
+("会議資料" -> 会議, 議資, 資料; a single character is a term of
+its own).
+
+A query is a list of words and "quoted phrases" that must all match. A
+word or phrase of several terms ("e-mail", "call bob", a CJK word of three
+characters or more) matches when its terms are consecutive in the text, a
+single CJK character matches every term that contains it.
+
+Every indexed task is a document, numbered in the order tasks are added,
+and every term has a posting list: the ascending numbers of the documents
+that contain it, in an array of 4-byte integers. A query intersects the
+posting lists from the shortest one on (binary search into much longer
+lists) and ranks the candidates by BM25 with a term frequency of 1 (task
+texts are short), that is shorter texts first, then newer ones; phrases
+are checked on the candidates in that order until limit tasks match.
+A removed task only forgets its document number, the posting lists are
+compacted when more than half of the documents are gone. An archived task
+stays in the index, flagged.
+"""
+
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+# iteration marks, kana, CJK ideographs (with extension A and the
+# compatibility block) and hangul syllables
+CJK_CHARACTERS = u"\u3005-\u3007\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff" \
+    u"\uac00-\ud7af\uf900-\ufaff"
+TERM_REGEX = u"([{0}]+)|[^\\W_{0}]+".format(CJK_CHARACTERS)
+QUERY_REGEX = u"\"([^\"]*)\"|(\\S+)"
+
+TERM_PATTERN = re.compile(TERM_REGEX)
+ASCII_TERM_PATTERN = re.compile("[a-z0-9]+")
+QUERY_PATTERN = re.compile(QUERY_REGEX)
+CJK_PATTERN = re.compile(u"^[{0}]$".format(CJK_CHARACTERS))
+
+COMPACT_MIN = 1024  # removed documents before the posting lists compact
+GALLOP_RATIO = 16   # binary search into lists this many times longer
+
+_EMPTY = array("I")
+
+
+def normalize(text):
+    """Returns text in the form it is indexed in (NFKC, case folded)."""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def terms(text):
+    """Returns the terms of a text, in order."""
+    if text.isascii():
+        return ASCII_TERM_PATTERN.findall(text.lower())
+    retval = []
+    for match in TERM_PATTERN.finditer(normalize(text)):
+        run = match.group(0)
+        if match.group(1) is None or len(run) == 1:
+            retval.append(run)
+        else:
+            retval.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return retval
+
+
+def _intersect(lists):
+    """Returns the numbers in all of the ascending lists, ascending."""
+    lists = sorted(lists, key=len)
+    retval = lists[0]
+    for other in lists[1:]:
+        if not retval:
+            break
+        if len(retval) * GALLOP_RATIO < len(other):
+            found = []
+            pos, end = 0, len(other)
+            for doc in retval:
+                pos = bisect_left(other, doc, pos)
+                if pos == end:
+                    break
+                if other[pos] == doc:
+                    found.append(doc)
+            retval = found
+        else:
+            members = set(other)
+            retval = [x for x in retval if x in members]
+    return retval
+
+
+def _consecutive(sequence, part):
+    """Determines whether part occurs in sequence as a slice."""
+    first, size = part[0], len(part)
+    for pos in range(len(sequence) - size + 1):
+        if sequence[pos] == first and sequence[pos:pos + size] == part:
+            return True
+    return False
+
+
+def _has_phrases(text, phrases):
+    found = terms(text)
+    return all(_consecutive(found, x) for x in phrases)
+
+
+class FullTextIndex(object):
+    """Full-text index of task texts, see the module documentation. Tasks
+    are identified by id(task), like in TaskIndex."""
+
+    def __init__(self, tasks=()):
+        self.postings = {}          # type: Dict[str, array]  ## term -> docs
+        self._docs = {}             # type: Dict[int, int]  ## id -> doc
+        self._tasks = []            # doc -> Task, None once removed
+        self._texts = []            # doc -> the indexed Task.todo
+        self._lengths = array("H")  # doc -> number of terms
+        self._archived = bytearray()    # doc -> 1 if archived
+        self._removed = 0           # removed documents not compacted yet
+        self._archived_count = 0
+        self.build(tasks)
+
+    def __repr__(self):
+        return "<FullTextIndex {0} tasks, {1} terms>".format(
+            len(self), len(self.postings))
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, task):
+        return id(task) in self._docs
+
+    def _reset(self):
+        self.postings = {}
+        self._docs = {}
+        self._tasks = []
+        self._texts = []
+        self._lengths = array("H")
+        self._archived = bytearray()
+        self._removed = 0
+        self._archived_count = 0
+
+    def build(self, tasks):
+        """Replaces the live (not archived) tasks of the index."""
+        if not self._archived_count:
+            self._reset()
+        else:
+            for task in self._tasks:
+                if task is not None and \
+                        not self._archived[self._docs[id(task)]]:
+                    self._forget(self._docs.pop(id(task)))
+        for task in tasks:
+            self.add(task)
+        self._compact_if_sparse()
+
+    def replace_archived(self, tasks):
+        """Replaces the archived tasks of the index."""
+        for task in self._tasks:
+            if task is not None and self._archived[self._docs[id(task)]]:
+                self._forget(self._docs.pop(id(task)))
+        for task in tasks:
+            self.add(task, True)
+        self._compact_if_sparse()
+
+    def add(self, task, archived=False):
+        """Indexes a task (again, if it is in the index)."""
+        doc = self._docs.pop(id(task), None)
+        if doc is not None:
+            self._forget(doc)
+        text = task.todo
+        found = terms(text)
+        length = min(len(found), 0xffff)
+        doc = len(self._tasks)
+        self._docs[id(task)] = doc
+        self._tasks.append(task)
+        self._texts.append(text)
+        self._lengths.append(length)
+        self._archived.append(1 if archived else 0)
+        self._archived_count += 1 if archived else 0
+
+        postings = self.postings
+        for term in set(found):
+            entry = postings.get(term)
+            if entry is None:
+                postings[term] = array("I", (doc,))
+            else:
+                entry.append(doc)
+
+    def update(self, task, archived=False):
+        """Indexes a task after its text changed (nothing to do when it did
+        not) and sets its archived flag."""
+        doc = self._docs.get(id(task))
+        if doc is None or self._texts[doc] != task.todo:
+            self.add(task, archived)
+        elif self._archived[doc] != archived:
+            self._archived[doc] = 1 if archived else 0
+            self._archived_count += 1 if archived else -1
+
+    def archive(self, task):
+        """Flags a task as archived (indexes it if it is not)."""
+        self.update(task, True)
+
+    def remove(self, task):
+        """Removes a task from the index."""
+        doc = self._docs.pop(id(task), None)
+        if doc is not None:
+            self._forget(doc)
+            self._compact_if_sparse()
+
+    def _forget(self, doc):
+        self._tasks[doc] = None
+        self._texts[doc] = None
+        self._archived_count -= self._archived[doc]
+        self._removed += 1
+
+    def _compact_if_sparse(self):
+        if self._removed > COMPACT_MIN and self._removed > len(self._docs):
+            self.compact()
+
+    def compact(self):
+        """Renumbers the documents without the removed ones and drops them
+        from the posting lists."""
+        if not self._removed:
+            return
+        remap = array("i", [-1]) * len(self._tasks)
+        kept = [x for x, y in enumerate(self._tasks) if y is not None]
+        for new, old in enumerate(kept):
+            remap[old] = new
+
+        postings = {}
+        for term, entry in self.postings.items():
+            entry = array("I", [remap[x] for x in entry if remap[x] >= 0])
+            if entry:
+                postings[term] = entry
+        self.postings = postings
+        self._tasks = [self._tasks[x] for x in kept]
+        self._texts = [self._texts[x] for x in kept]
+        self._lengths = array("H", [self._lengths[x] for x in kept])
+        self._archived = bytearray(self._archived[x] for x in kept)
+        self._docs = dict((id(x), y) for y, x in enumerate(self._tasks))
+        self._removed = 0
+
+    def _postings(self, term):
+        """The posting list of a query term. A single CJK character is in
+        the bigrams that contain it: their lists are merged."""
+        if len(term) > 1 or CJK_PATTERN.match(term) is None:
+            return self.postings.get(term, _EMPTY)
+        docs = set()
+        for key, entry in self.postings.items():
+            if term in key and CJK_PATTERN.match(key[0]) is not None:
+                docs.update(entry)
+        return sorted(docs)
+
+    def search(self, text, limit=None, archived=True):
+        """Returns the tasks that match a query, best first.
+
+            Args:
+                text: words and "quoted phrases", all must match.
+                limit(=None): the number of tasks to return, default all
+                    (none when it is 0 or less).
+                archived(=True): archived tasks match too.
+
+            Returns: list of Task
+        """
+        if limit is not None and limit <= 0:
+            return []
+        lists = []
+        phrases = []
+        for match in QUERY_PATTERN.finditer(text):
+            part = terms(match.group(2) if match.group(1) is None
+                         else match.group(1))
+            lists.extend(self._postings(x) for x in part)
+            if len(part) > 1:
+                phrases.append(part)
+        if not lists or not self._docs:
+            return []
+
+        # BM25 with a term frequency of 1 gives every match the same idf
+        # sum, scaled down by the length of the text: matches are ranked
+        # by length, newest first, and the phrases are only checked until
+        # limit tasks are found
+        tasks = self._tasks
+        texts = self._texts
+        flags = self._archived
+        found = []
+        for doc in sorted(reversed(_intersect(lists)),
+                          key=self._lengths.__getitem__):
+            task = tasks[doc]
+            if task is None or (flags[doc] and not archived):
+                continue
+            if phrases and not _has_phrases(texts[doc], phrases):
+                continue
+            found.append(task)
+            if limit is not None and len(found) >= limit:
+                break
+        return found
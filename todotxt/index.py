@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Incrementally maintained index of a task collection.
+
+TaskIndex maps projects, contexts, priorities and the finished state to
+the tasks that carry them, and keeps the date fields in sorted lists, so
+tag listing is O(distinct tags) and tag / date-range lookups are
+O(log n + k). Tasks keeps it up to date when created with indexed=True:
+
+    tasks = Tasks("todo.txt", indexed=True)
+    tasks.load()
+    tasks.index.by_project("+work")
+    tasks.index.date_range("due_date", until=date_value("today"))
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+DATE_FIELDS = ("due_date", "threshold_date", "created_date", "finished_date")
+
+
+def date_key(value):
+    """Returns the sort key of a date field value, None if unset."""
+    if isinstance(value, date):     # datetime or date
+        return value.toordinal()
+    return None
+
+
+class TaskIndex(object):
+    """Index of a task collection. Tasks are identified by id(task) since
+    tids are not guaranteed to be unique."""
+
+    def __init__(self, tasks=()):
+        self.tasks = {}         # type: Dict[int, Task]
+        self.projects = {}      # type: Dict[str, Set[int]]
+        self.contexts = {}      # type: Dict[str, Set[int]]
+        self.priorities = {}    # type: Dict[str, Set[int]]
+        self.finished = {True: set(), False: set()}
+        # date field -> sorted list of (date ordinal, id(task))
+        self.dates = dict((x, []) for x in DATE_FIELDS)
+        # id(task) -> the values the task was indexed with
+        self._entries = {}
+        # id(task) -> position in the collection, for the collection state
+        # self._state (see positions())
+        self._positions = {}
+        self._state = None
+        self.build(tasks)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __contains__(self, task):
+        return id(task) in self.tasks
+
+    def build(self, tasks):
+        """Rebuilds the index from a task collection."""
+        self.tasks.clear()
+        self.projects.clear()
+        self.contexts.clear()
+        self.priorities.clear()
+        self.finished = {True: set(), False: set()}
+        self._entries.clear()
+        self._state = None
+
+        dates = dict((x, []) for x in DATE_FIELDS)
+        for task in tasks:
+            entry = self._add_tags(task)
+            for field, value in zip(DATE_FIELDS, entry[4]):
+                if value is not None:
+                    dates[field].append((value, id(task)))
+        for keys in dates.values():
+            keys.sort()
+        self.dates = dates
+
+    def _add_tags(self, task):
+        key = id(task)
+        entry = (tuple(task.projects), tuple(task.contexts), task.priority,
+                 bool(task.finished),
+                 tuple(date_key(getattr(task, x)) for x in DATE_FIELDS))
+        self.tasks[key] = task
+        self._entries[key] = entry
+
+        for tag in entry[0]:
+            self.projects.setdefault(tag, set()).add(key)
+        for tag in entry[1]:
+            self.contexts.setdefault(tag, set()).add(key)
+        self.priorities.setdefault(entry[2], set()).add(key)
+        self.finished[entry[3]].add(key)
+        return entry
+
+    def add(self, task):
+        """Indexes a task."""
+        if id(task) in self.tasks:
+            self.remove(task)
+        entry = self._add_tags(task)
+        for field, value in zip(DATE_FIELDS, entry[4]):
+            if value is not None:
+                insort(self.dates[field], (value, id(task)))
+
+    def remove(self, task):
+        """Removes a task from the index, with the values it was indexed
+        with."""
+        key = id(task)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        del self.tasks[key]
+
+        for tags, tag_map in ((entry[0], self.projects),
+                              (entry[1], self.contexts),
+                              ((entry[2],), self.priorities)):
+            for tag in tags:
+                ids = tag_map.get(tag)
+                if ids is not None:
+                    ids.discard(key)
+                    if not ids:
+                        del tag_map[tag]
+        self.finished[entry[3]].discard(key)
+
+        for field, value in zip(DATE_FIELDS, entry[4]):
+            if value is not None:
+                keys = self.dates[field]
+                pos = bisect_left(keys, (value, key))
+                if pos < len(keys) and keys[pos] == (value, key):
+                    del keys[pos]
+
+    def update(self, task):
+        """Re-indexes a task after its fields changed."""
+        self.remove(task)
+        self.add(task)
+
+    def get_projects(self):
+        """Returns the sorted list of projects in use."""
+        return sorted(self.projects)
+
+    def get_contexts(self):
+        """Returns the sorted list of contexts in use."""
+        return sorted(self.contexts)
+
+    def _tasks(self, ids):
+        tasks = self.tasks
+        return [tasks[x] for x in ids]
+
+    def by_project(self, project):
+        """Returns the tasks of a project ("+name")."""
+        return self._tasks(self.projects.get(project, ()))
+
+    def by_context(self, context):
+        """Returns the tasks of a context ("@name")."""
+        return self._tasks(self.contexts.get(context, ()))
+
+    def by_priority(self, priority):
+        """Returns the tasks of a priority ("A".."Z", "^" for none)."""
+        return self._tasks(self.priorities.get(priority, ()))
+
+    def by_finished(self, finished=True):
+        """Returns the finished (or unfinished) tasks."""
+        return self._tasks(self.finished[bool(finished)])
+
+    def date_ids(self, field, since=None, until=None):
+        """Returns the ids of tasks whose date field is in [since, until]
+        (either bound may be None), in date order."""
+        keys = self.dates[field]
+        lo = 0 if since is None else \
+            bisect_left(keys, (date_key(since), -1))
+        hi = len(keys) if until is None else \
+            bisect_right(keys, (date_key(until), float("inf")))
+        return [x[1] for x in keys[lo:hi]]
+
+    def positions(self, ids, tasks, state=None):
+        """Returns the positions of tasks in a collection, ascending.
+
+            Args:
+                ids: ids of indexed tasks.
+                tasks: list of Task, the indexed collection.
+                state(=None): identifies the collection version (see
+                    Tasks._touch), the id -> position map is built again
+                    when it changes.
+
+            Returns: list of int, the collection order of the tasks.
+        """
+        ids = list(ids)
+        for fresh in (False, True):
+            if fresh or state is None or state != self._state:
+                self._positions = dict(zip(map(id, tasks), range(len(tasks))))
+                self._state = state
+            found = list(map(self._positions.get, ids))
+            # the collection changed without a new state: build it again
+            if None not in found and max(found, default=-1) < len(tasks) \
+                    and list(map(id, map(tasks.__getitem__, found))) == ids:
+                return sorted(found)
+        return sorted(x for x in found if x is not None)
+
+    def date_range(self, field, since=None, until=None):
+        """Returns the tasks whose date field is in [since, until] (either
+        bound may be None), in date order."""
+        return self._tasks(self.date_ids(field, since, until))
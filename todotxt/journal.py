@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""Append-only journal of Tasks mutations.
+
+A journaled Tasks object does not rewrite todo.txt on every save. Each
+mutation is appended to "<todo.txt>.journal" as one JSON line and only
+the journal is fsync'ed. Tasks.compact() later writes todo.txt through a
+temporary file and an atomic rename, appends the archived tasks to
+done.txt in the same step and removes the journal.
+
+The first line of a journal holds the fingerprint (size, sha1) of the
+todo.txt content it applies to. A journal whose fingerprint does not
+match todo.txt is dropped when it is left over from a finished compaction
+(todo.txt holds the "result" of its last "compact" record). Otherwise
+todo.txt was changed by someone else after the journal was started: the
+journal is moved to "<todo.txt>.journal.conflict" and replay() raises
+JournalConflict, the records in it are not applied.
+
+A Journal holds a shared flock() on its file while it is open for
+appending. A Tasks object that is not journaled compacts a journal it
+finds only when it gets the exclusive lock, that is when no journaled
+Tasks object is writing to it.
+
+Records:
+
+    {"op": "add", "raw": str}               append a task
+    {"op": "set", "at": int, "raw": str}    replace the task at a position
+    {"op": "del", "at": int}                delete the task at a position
+    {"op": "archive", "at": [int, ...]}     move tasks to the archive
+    {"op": "reset", "raw": [str, ...]}      replace the whole list
+    {"op": "compact", "done_size": int,     a compaction started, done.txt
+     "result": [int, str]}                  had done_size bytes (None: not
+                                            appended to) and todo.txt will
+                                            have the fingerprint result
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:     # Windows: no locking
+    fcntl = None
+
+from todotxt.encoding import encode, append_data
+
+JOURNAL_SUFFIX = ".journal"
+CONFLICT_SUFFIX = ".conflict"   # appended to a journal moved aside
+JOURNAL_THRESHOLD = 1 << 20     # journal bytes that trigger a compaction
+
+
+class JournalConflict(Exception):
+    """todo.txt does not have the content a journal was started on. The
+    journal was moved to self.path, its records are not applied."""
+
+    def __init__(self, path):
+        Exception.__init__(
+            self, "todo.txt changed under its journal, moved to " + path)
+        self.path = path
+
+
+def fingerprint(data):
+    """Returns the [size, sha1] fingerprint of file content (bytes)."""
+    return [len(data), hashlib.sha1(data).hexdigest()]
+
+
+def read_bytes(path):
+    """Returns the content of path, b"" when it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except (IOError, OSError):
+        if os.path.exists(path):
+            raise
+        return b""
+
+
+def apply_record(record, lines, archives):
+    """Applies a journal record to lists of raw todo lines.
+
+        Args:
+            record: dict, a journal record.
+            lines: list<str>, the todo.txt lines (modified in place).
+            archives: list<str>, lines pending for done.txt (modified
+                in place).
+    """
+    op = record["op"]
+    if op == "add":
+        lines.append(record["raw"])
+    elif op == "set":
+        lines[record["at"]] = record["raw"]
+    elif op == "del":
+        del lines[record["at"]]
+    elif op == "archive":
+        at = set(record["at"])
+        archives.extend(lines[i] for i in record["at"])
+        lines[:] = [x for i, x in enumerate(lines) if i not in at]
+    elif op == "reset":
+        lines[:] = record["raw"]
+
+
+def fsync_dir(path):
+    """fsyncs the directory of path so a rename in it is durable."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:     # not supported (Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    """Writes bytes to path through a temporary file and an atomic
+    rename, so readers see either the old or the new content."""
+    temp = "{0}.tmp{1}".format(path, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    fsync_dir(path)
+
+
+def append_durable(path, data):
+    """Appends bytes to path and fsyncs it.
+
+        Returns: the size of path before the append.
+    """
+    with open(path, "ab") as f:
+        size = f.tell()
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return size
+
+
+def truncate(path, size):
+    """Cuts path back to size bytes if it is longer."""
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class Journal(object):
+    """The journal file of one todo.txt."""
+
+    def __init__(self, path, threshold=JOURNAL_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.background = False     # compact in a background thread
+        self.base = None        # fingerprint of the todo.txt content
+        # held while a record is written or a compaction runs
+        self.lock = threading.Lock()
+        self.buffer = None      # records held back by hold(), or None
+        self._file = None
+
+    def __repr__(self):
+        return "<Journal '{0}'>".format(self.path)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def size(self):
+        """Returns the size of the journal file in bytes."""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def records(self):
+        """Reads the journal.
+
+            Returns: (base fingerprint, list of records), (None, []) if
+                there is no journal. A torn last line (crash while it was
+                written) is ignored.
+        """
+        if not self.exists():
+            return None, []
+        with open(self.path, "rb") as f:
+            lines = f.read().split(b"\n")
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line.decode("utf-8")))
+            except ValueError:
+                break
+        if not records or "base" not in records[0]:
+            return None, []
+        return records[0]["base"], records[1:]
+
+    def lock_file(self):
+        """Opens the journal for appending with an exclusive flock(), for
+        a compaction by a Tasks object that does not own the journal.
+
+            Returns: False when a journaled Tasks object has it open (the
+                journal is left alone), True if the lock is held until
+                close().
+        """
+        self.close()
+        self._file = open(self.path, "ab")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                self.close()
+                return False
+        return True
+
+    def _open(self):
+        """Opens the journal for appending with a shared flock(), writes
+        the header into a new journal."""
+        while True:
+            self._file = open(self.path, "ab")
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_SH)
+            if not self._replaced():
+                break
+            self.close()    # compacted while we waited for the lock
+        if self._file.tell() == 0:
+            header = json.dumps({"base": self.base}) + "\n"
+            self._file.write(header.encode("utf-8"))
+
+    def _replaced(self):
+        """True when the open journal file was removed or replaced."""
+        try:
+            return os.stat(self.path).st_ino != \
+                os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return True
+
+    def replay(self, data, lines, archive_path=None, read_only=False):
+        """Replays the journal over the content of todo.txt.
+
+            Args:
+                data: bytes, the todo.txt content.
+                lines: list<str>, the todo.txt lines (modified in place).
+                archive_path: done.txt, cut back if a compaction was
+                    interrupted after appending to it.
+                read_only(=False): the journal is in use by a journaled
+                    Tasks object: leave the files alone and ignore the
+                    journal when it does not match todo.txt.
+
+            Returns: list<str> of lines pending for done.txt.
+
+            Raises: JournalConflict when todo.txt changed since the
+                journal was started (it is moved aside).
+        """
+        archives = []
+        self.base = fingerprint(data)
+        base, records = self.records()
+        if base != self.base:
+            if read_only:
+                return archives
+            results = [x.get("result") for x in records
+                       if x["op"] == "compact"]
+            if base is None or results and results[-1] == self.base:
+                self.remove()   # empty, or todo.txt was compacted
+                return archives
+            self.close()
+            conflict = self.path + CONFLICT_SUFFIX
+            os.replace(self.path, conflict)
+            raise JournalConflict(conflict)
+
+        for record in records:
+            if record["op"] == "compact":
+                if archive_path is not None and not read_only and \
+                        record["done_size"] is not None:
+                    truncate(archive_path, record["done_size"])
+            else:
+                apply_record(record, lines, archives)
+        return archives
+
+    def append(self, record, locked=False):
+        """Appends a record and fsyncs the journal.
+
+            Args:
+                record: dict, the journal record.
+                locked(=False): the caller already holds self.lock.
+        """
+        self.extend([record], locked)
+
+    def hold(self):
+        """Holds back the records appended from now on until flush(), so a
+        batch of mutations costs one write and one fsync."""
+        if self.buffer is None:
+            self.buffer = []
+
+    def flush(self):
+        """Writes the records held back since hold() and stops holding."""
+        records, self.buffer = self.buffer, None
+        if records:
+            self.extend(records)
+
+    def extend(self, records, locked=False):
+        """Appends records with a single fsync of the journal (held in
+        self.buffer after hold()).
+
+            Args:
+                records: list of journal records.
+                locked(=False): the caller already holds self.lock.
+        """
+        if self.buffer is not None and not locked:
+            self.buffer.extend(records)
+            return
+        data = "".join(json.dumps(x, ensure_ascii=False) + "\n"
+                       for x in records).encode("utf-8")
+        if not locked:
+            self.lock.acquire()
+        try:
+            if self._file is not None and self._replaced():
+                # compacted by another Tasks object: a new journal on the
+                # old base, which replay() reports as a conflict
+                self.close()
+            if self._file is None:
+                self._open()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        finally:
+            if not locked:
+                self.lock.release()
+
+    def compact(self, todo_path, lines, archive_lines=(), archive_path=None,
+                text_format=None):
+        """Writes lines to todo_path (temporary file and atomic rename),
+        appends archive_lines to archive_path and removes the journal.
+        The caller must hold self.lock.
+
+            Args:
+                todo_path: the todo.txt file.
+                lines: list<str>, the todo.txt lines.
+                archive_lines: list<str>, lines appended to archive_path
+                    (in the encoding and newline of that file).
+                archive_path: the done.txt file.
+                text_format: todotxt.encoding.TextFormat of todo_path,
+                    default UTF-8 with "\n".
+        """
+        if self.buffer is not None:
+            self.buffer = []    # held records are part of lines
+        data = encode(lines, text_format)
+        done_size = None
+        if archive_lines and archive_path is not None:
+            done_size = os.path.getsize(archive_path) \
+                if os.path.exists(archive_path) else 0
+        self.append({"op": "compact", "done_size": done_size,
+                     "result": fingerprint(data)}, True)
+        if done_size is not None:
+            append_durable(archive_path,
+                           append_data(archive_path, archive_lines))
+
+        try:
+            atomic_write(todo_path, data)
+        except Exception:
+            if done_size is not None:
+                truncate(archive_path, done_size)
+            raise
+
+        self.remove()
+        self.base = fingerprint(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Closes and deletes the journal file."""
+        self.close()
+        if self.exists():
+            os.remove(self.path)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Multi-key ordering of tasks.
+
+A criteria is a field name, "-" in front sorts it descending:
+
+    tasks.order_by("due_date", "-priority", "tid")
+    tasks.top(20, "due_date", "priority")
+
+Unset fields (None, or no priority) sort last in both directions. The
+key of a task is a tuple of numbers, computed once per task and sort, so
+comparisons never see None or mixed types, and descending fields are
+negated instead of sorted in a separate pass.
+"""
+
+from todotxt import NO_PRIORITY_CHARACTER
+
+ORDER_CRITERIAS = ["tid", "priority", "finished", "created_date",
+                   "finished_date", "due_date", "threshold_date"]
+
+_NONE = (1, 0)      # sorts after every (0, value)
+
+
+def _number(field):
+    """Returns the function giving the number of a field value."""
+    if field == "priority":
+        return ord
+    if field in ("tid", "finished"):
+        return int
+    return lambda value: value.toordinal()      # dates
+
+
+def parse_criteria(criteria):
+    """Splits criteria into (field, descending) pairs.
+
+        Args: criteria / iterable of str, e.g. ("due_date", "-priority")
+
+        Returns: tuple of (field, descending), None if a field is unknown.
+    """
+    retval = []
+    for criterion in criteria:
+        descending = criterion[:1] == "-"
+        field = criterion[1:] if descending else criterion
+        if field not in ORDER_CRITERIAS:
+            return None
+        retval.append((field, descending))
+    return tuple(retval)
+
+
+def sort_key(criteria):
+    """Returns a key function for parsed criteria (parse_criteria())."""
+    parts = [(field, _number(field), -1 if descending else 1,
+              NO_PRIORITY_CHARACTER if field == "priority" else None)
+             for field, descending in criteria]
+
+    if len(parts) == 1:
+        field, number, sign, unset = parts[0]
+
+        def key(task):
+            value = getattr(task, field)
+            return _NONE if value is None or value == unset \
+                else (0, sign * number(value))
+        return key
+
+    def key(task):
+        retval = []
+        for field, number, sign, unset in parts:
+            value = getattr(task, field)
+            retval.append(_NONE if value is None or value == unset
+                          else (0, sign * number(value)))
+        return tuple(retval)
+    return key
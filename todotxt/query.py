@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""Structured queries over a task collection.
+
+A query is a whitespace-separated list of terms that must all match:
+
+    pri:A  pri:A..C  pri:^      priority, a range, or no priority
+    +project  @context          the task has the project / context
+    due<=today  t>mon           date comparisons (<, <=, =, >=, >, ":"
+    created>=2016-01-01         means "="); fields: due, t (threshold),
+    done<2016-12-01             created, done (finished date); values
+                                are anything date_value() accepts
+    finished                    the task is finished
+    rec                         the task has a rec: rule
+    word  "free text"           substring of raw_todo (Task.matches)
+    -term                       negates a term
+
+    tasks.query('pri:A..C +work due<=today -finished "call"')
+
+Queries compile to a predicate tree. When the collection has an index,
+the most selective indexed term provides the candidates and the other
+terms are checked on them only; otherwise all terms are checked in one
+pass over the tasks.
+"""
+
+import re
+import shlex
+from bisect import bisect_left
+
+from todotxt import date_value
+from todotxt.index import date_key
+
+DATE_TERM_REGEX = "^(due|t|created|done)(<=|>=|<|>|=|:)(.+)$"
+PRIORITY_TERM_REGEX = "^pri:([A-Z^])(?:\\.\\.([A-Z^]))?$"
+
+DATE_TERM_PATTERN = re.compile(DATE_TERM_REGEX)
+PRIORITY_TERM_PATTERN = re.compile(PRIORITY_TERM_REGEX)
+
+_DATE_FIELDS = {"due": "due_date", "t": "threshold_date",
+                "created": "created_date", "done": "finished_date"}
+
+
+class Term(object):
+    """A predicate of a query."""
+
+    def match(self, task):
+        """Returns True when the task satisfies the term."""
+        raise NotImplementedError
+
+    def expression(self, bind):
+        """Returns the term as a Python expression over the task "t".
+        bind(value) returns the name a constant is bound to."""
+        raise NotImplementedError
+
+    def lookup(self, index):
+        """Returns the ids (id(task)) of the tasks of index that satisfy
+        the term, or None when the index cannot answer it."""
+        return None
+
+    def estimate(self, index):
+        """Returns the number of candidates lookup() would return, or None
+        when the index cannot answer the term."""
+        return None
+
+
+class Text(Term):
+    """A substring of raw_todo."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return "text {0!r}".format(self.text)
+
+    def match(self, task):
+        return task.matches(self.text)
+
+    def expression(self, bind):
+        return "{0} in t.raw_todo".format(bind(self.text))
+
+
+class Tag(Term):
+    """A project or context of the task."""
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.field = "projects" if tag[0] == "+" else "contexts"
+
+    def __str__(self):
+        return "{0} {1}".format(self.field[:-1], self.tag)
+
+    def match(self, task):
+        return self.tag in getattr(task, self.field)
+
+    def expression(self, bind):
+        return "{0} in t.{1}".format(bind(self.tag), self.field)
+
+    def lookup(self, index):
+        return getattr(index, self.field).get(self.tag, ())
+
+    def estimate(self, index):
+        return len(self.lookup(index))
+
+
+class Priority(Term):
+    """A priority range, NO_PRIORITY_CHARACTER for no priority."""
+
+    def __init__(self, low, high=None):
+        self.low = low
+        self.high = low if high is None else high
+
+    def __str__(self):
+        if self.low == self.high:
+            return "priority {0}".format(self.low)
+        return "priority {0}..{1}".format(self.low, self.high)
+
+    def match(self, task):
+        return self.low <= task.priority <= self.high
+
+    def expression(self, bind):
+        if self.low == self.high:
+            return "t.priority == {0}".format(bind(self.low))
+        return "{0} <= t.priority <= {1}".format(bind(self.low),
+                                                bind(self.high))
+
+    def _sets(self, index):
+        return [y for x, y in index.priorities.items()
+                if self.low <= x <= self.high]
+
+    def lookup(self, index):
+        sets = self._sets(index)
+        return sets[0] if len(sets) == 1 else set().union(*sets)
+
+    def estimate(self, index):
+        return sum(len(x) for x in self._sets(index))
+
+
+class DateCompare(Term):
+    """A comparison of a date field, unset dates never match."""
+
+    _OPERATORS = {"<": (None, -1), "<=": (None, 0), "=": (0, 0),
+                  ">=": (0, None), ">": (1, None)}
+
+    def __init__(self, field, operator, value):
+        self.field = field
+        self.operator = "=" if operator == ":" else operator
+        self.value = value
+        self.key = date_key(value)
+        since, until = self._OPERATORS[self.operator]
+        self.since = None if since is None else self.key + since
+        self.until = None if until is None else self.key + until
+
+    def __str__(self):
+        return "{0} {1} {2}".format(self.field, self.operator,
+                                    self.value.strftime("%Y-%m-%d"))
+
+    def match(self, task):
+        key = date_key(getattr(task, self.field))
+        return key is not None \
+            and (self.since is None or key >= self.since) \
+            and (self.until is None or key <= self.until)
+
+    def expression(self, bind):
+        key = "{0}(t.{1})".format(bind(date_key), self.field)
+        if self.since is None:
+            return "{0} is not None and {0} <= {1}".format(
+                key, bind(self.until))
+        if self.until is None:
+            return "{0} is not None and {0} >= {1}".format(
+                key, bind(self.since))
+        return "{0} is not None and {1} <= {0} <= {2}".format(
+            key, bind(self.since), bind(self.until))
+
+    def _range(self, index):
+        keys = index.dates[self.field]
+        lo = 0 if self.since is None else bisect_left(keys, (self.since,))
+        hi = len(keys) if self.until is None else \
+            bisect_left(keys, (self.until + 1,))
+        return keys, lo, hi
+
+    def lookup(self, index):
+        keys, lo, hi = self._range(index)
+        return [x[1] for x in keys[lo:hi]]
+
+    def estimate(self, index):
+        keys, lo, hi = self._range(index)
+        return hi - lo
+
+
+class Flag(Term):
+    """finished / rec."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def match(self, task):
+        if self.name == "finished":
+            return bool(task.finished)
+        return task.recursive is not None
+
+    def expression(self, bind):
+        if self.name == "finished":
+            return "t.finished"
+        return "t.recursive is not None"
+
+    def lookup(self, index):
+        if self.name == "finished":
+            return index.finished[True]
+        return None
+
+    def estimate(self, index):
+        if self.name == "finished":
+            return len(index.finished[True])
+        return None
+
+
+class Not(Term):
+    """The negation of a term."""
+
+    def __init__(self, term):
+        self.term = term
+
+    def __str__(self):
+        return "not {0}".format(self.term)
+
+    def match(self, task):
+        return not self.term.match(task)
+
+    def expression(self, bind):
+        return "not ({0})".format(self.term.expression(bind))
+
+    def lookup(self, index):
+        if isinstance(self.term, Flag) and self.term.name == "finished":
+            return index.finished[False]
+        return None
+
+    def estimate(self, index):
+        if isinstance(self.term, Flag) and self.term.name == "finished":
+            return len(index.finished[False])
+        return None
+
+
+def parse_term(text):
+    """Compiles one query term into a Term object."""
+    if text[:1] == "-" and len(text) > 1:
+        return Not(parse_term(text[1:]))
+    if text in ("finished", "rec"):
+        return Flag(text)
+    if len(text) > 1 and text[0] in "+@":
+        return Tag(text)
+
+    match = PRIORITY_TERM_PATTERN.match(text)
+    if match is not None:
+        return Priority(match.group(1), match.group(2))
+
+    match = DATE_TERM_PATTERN.match(text)
+    if match is not None:
+        value = date_value(match.group(3))
+        if value is None:
+            raise ValueError("invalid date in query term: " + text)
+        return DateCompare(_DATE_FIELDS[match.group(1)], match.group(2),
+                           value)
+
+    return Text(text)
+
+
+def split_query(text):
+    """Splits a query into terms; "double quotes" group words, an
+    apostrophe is part of a word ("don't"). Falls back to whitespace
+    splitting when a quote is not closed."""
+    lexer = shlex.shlex(text, posix=True)
+    lexer.whitespace_split = True
+    lexer.quotes = "\""
+    lexer.commenters = ""
+    try:
+        return list(lexer)
+    except ValueError:
+        return text.split()
+
+
+class Query(object):
+    """A compiled query, see the module documentation for the syntax."""
+
+    def __init__(self, text):
+        self.text = text
+        self.terms = [parse_term(x) for x in split_query(text)]
+
+    def __repr__(self):
+        return "<Query {0!r}>".format(self.text)
+
+    def match(self, task):
+        """Returns True when the task satisfies every term."""
+        for term in self.terms:
+            if not term.match(task):
+                return False
+        return True
+
+    @staticmethod
+    def fuse(terms):
+        """Compiles terms into a single predicate function, so a scan
+        makes one call per task whatever the number of terms."""
+        namespace = {}
+
+        def bind(value):
+            name = "_c{0}".format(len(namespace))
+            namespace[name] = value
+            return name
+
+        body = " and ".join("({0})".format(x.expression(bind))
+                            for x in terms) or "True"
+        return eval("lambda t: " + body, namespace)
+
+    def plan(self, tasks):
+        """Chooses how to evaluate the query over a task list.
+
+            Args: tasks / Tasks
+
+            Returns: (driving term or None for a full scan,
+                estimated candidates, terms whose index sets are
+                intersected with the candidates, terms checked on the
+                candidates)
+        """
+        index = getattr(tasks, "index", None)
+        best, best_count = None, None
+        if index is not None:
+            for term in self.terms:
+                count = term.estimate(index)
+                if count is not None and (best_count is None
+                                          or count < best_count):
+                    best, best_count = term, count
+
+        if best is None:
+            return None, len(tasks), [], list(self.terms)
+        others = [x for x in self.terms if x is not best]
+        intersect = [x for x in others
+                     if isinstance(x.lookup(index), (set, frozenset))]
+        return best, best_count, intersect, \
+            [x for x in others if x not in intersect]
+
+    def run(self, tasks):
+        """Evaluates the query.
+
+            Args: tasks / Tasks
+
+            Returns: list of matching Task, in collection order.
+        """
+        driver, _, intersect, terms = self.plan(tasks)
+        if driver is None:
+            candidates = tasks
+        else:
+            index = tasks.index
+            ids = driver.lookup(index)
+            if intersect:
+                ids = set(ids).intersection(
+                    *[x.lookup(index) for x in intersect])
+            items = tasks.tasks
+            state = (tasks._version, id(items), len(items))
+            candidates = [items[x] for x in index.positions(ids, items,
+                                                            state)]
+
+        if terms:
+            candidates = filter(self.fuse(terms), candidates)
+        return list(candidates)
+
+    def explain(self, tasks):
+        """Describes how the query would be evaluated over tasks."""
+        driver, count, intersect, terms = self.plan(tasks)
+        lines = ["query: {0}".format(self.text)]
+        if driver is None:
+            lines.append("plan: full scan of {0} tasks".format(len(tasks)))
+        else:
+            lines.append("plan: index lookup {0} ({1} of {2} tasks)"
+                         .format(driver, count, len(tasks)))
+        if intersect:
+            lines.append("intersect: " + ", ".join(str(x) for x in intersect))
+        if terms:
+            lines.append("filter: " + ", ".join(str(x) for x in terms))
+        return "\n".join(lines)
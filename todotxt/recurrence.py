@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Recurrence rules ("rec:" tags) and batch projection of occurrences.
+
+    rec:[+]<span><unit>     unit: d(ay) w(eek) m(onth) y(ear)
+                            b(usiness day, see todotxt.bizcal)
+
+A "+" rule recurs from the due date, otherwise from the finish date.
+Each distinct rule text is compiled once into a RecurrenceRule.
+
+Tasks.project_recurrences() computes every occurrence of the open
+recurring tasks up to a date in one batch (day and week rules with NumPy
+datetime64 arithmetic when NumPy is installed) and returns a read-only
+RecurrenceProjection:
+
+    for task, day in tasks.project_recurrences(until="2017-03-31"):
+        print(day, task.todo)
+"""
+
+import re
+from array import array
+from collections import namedtuple
+from datetime import date, timedelta
+
+try:
+    import numpy
+except ImportError:     # optional, day/week rules use plain Python then
+    numpy = None
+
+REC_SYNTAX_PATTERN = re.compile("(\\+*)([0-9]+)([dwmyb])")
+
+_rules = {}     # type: Dict[str, RecurrenceRule]
+
+Occurrence = namedtuple("Occurrence", ["task", "date"])
+
+
+class RecurrenceRule(object):
+    """A compiled "rec:" rule."""
+
+    __slots__ = ("text", "strict", "span", "unit")
+
+    def __init__(self, text, strict, span, unit):
+        self.text = text
+        self.strict = strict    # recur from the due date ("+")
+        self.span = span
+        self.unit = unit
+
+    def __repr__(self):
+        return "<RecurrenceRule {0!r}>".format(self.text)
+
+    @property
+    def step_days(self):
+        """Fixed length of one step in days, None for m/y/b rules."""
+        if self.unit == "d":
+            return self.span
+        if self.unit == "w":
+            return self.span * 7
+        return None
+
+    def next(self, base, calendar=None):
+        """Returns the occurrence after base (date or datetime).
+
+            Month and year steps keep the day of month; a day past the end
+            of the target month overflows into the next month (01-31 + 1m
+            is 03-03, 02-29 + 1y is 03-01).
+
+            Args:
+                base: date or datetime.
+                calendar: BusinessCalendar, required for "b" rules.
+        """
+        unit = self.unit
+        if unit == "d":
+            return base + timedelta(days=self.span)
+        if unit == "w":
+            return base + timedelta(days=self.span * 7)
+        if unit == "b":
+            return calendar.add(base, self.span)
+
+        if unit == "m":
+            years, month = divmod(base.month - 1 + self.span, 12)
+            first = base.replace(year=base.year + years, month=month + 1,
+                                 day=1)
+        else:   # "y"
+            first = base.replace(year=base.year + self.span, day=1)
+        return first + timedelta(days=base.day - 1)
+
+    def occurrences(self, start, until, calendar=None):
+        """Returns the occurrences after start up to until (inclusive)."""
+        retval = []
+        current = self.next(start, calendar)
+        while current <= until and current > start:
+            retval.append(current)
+            start, current = current, self.next(current, calendar)
+        return retval
+
+
+def compile_rule(text):
+    """Compiles the value of a "rec:" tag.
+
+        Args: text / str, e.g. "+1w"
+
+        Returns: RecurrenceRule, None if text is no valid rule.
+    """
+    try:
+        return _rules[text]
+    except KeyError:
+        pass
+
+    match = REC_SYNTAX_PATTERN.search(text)
+    rule = None
+    if match is not None:
+        rule = RecurrenceRule(text, match.group(1) == "+",
+                              int(match.group(2)), match.group(3))
+    _rules[text] = rule
+    return rule
+
+
+class RecurrenceProjection(object):
+    """Read-only, date-ordered view of projected occurrences. Items are
+    Occurrence(task, date) tuples built on access; the view itself only
+    holds the task list, task positions and day ordinals."""
+
+    def __init__(self, tasks, positions, ordinals):
+        order = sorted(range(len(ordinals)),
+                       key=lambda x: (ordinals[x], positions[x]))
+        self._tasks = tasks
+        self._positions = array("l", [positions[x] for x in order])
+        self._ordinals = array("l", [ordinals[x] for x in order])
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[x] for x in range(*key.indices(len(self)))]
+        return Occurrence(self._tasks[self._positions[key]],
+                          date.fromordinal(self._ordinals[key]))
+
+    def __iter__(self):
+        tasks = self._tasks
+        fromordinal = date.fromordinal
+        for position, ordinal in zip(self._positions, self._ordinals):
+            yield Occurrence(tasks[position], fromordinal(ordinal))
+
+    def __repr__(self):
+        return "<RecurrenceProjection {0} occurrences>".format(len(self))
+
+    def dates(self):
+        """Returns the sorted occurrence dates."""
+        return [date.fromordinal(x) for x in self._ordinals]
+
+    def count_by_date(self):
+        """Returns a dict date -> number of occurrences."""
+        counts = {}
+        for ordinal in self._ordinals:
+            counts[ordinal] = counts.get(ordinal, 0) + 1
+        return dict((date.fromordinal(x), y) for x, y in counts.items())
+
+    def for_task(self, task):
+        """Returns the occurrence dates of one task."""
+        return [date.fromordinal(y) for x, y in
+                zip(self._positions, self._ordinals)
+                if self._tasks[x] is task]
+
+
+_EPOCH = date(1970, 1, 1).toordinal()     # day 0 of datetime64[D]
+
+
+def _project_fixed(starts, step, since, until, positions, ordinals):
+    """Appends the occurrences of same-step rules in [since, until] (day
+    ordinals); starts is a list of (position, first day ordinal)."""
+    if numpy is not None:
+        first = (numpy.array([x[1] for x in starts], dtype="int64")
+                 - _EPOCH).astype("datetime64[D]")
+        pos = numpy.array([x[0] for x in starts], dtype="int64")
+        lo = numpy.datetime64(since - _EPOCH, "D")
+        hi = numpy.datetime64(until - _EPOCH, "D")
+        # steps to skip to reach since, then steps that fit until
+        skip = numpy.maximum(0, -((first - lo).astype("int64") // step))
+        count = numpy.maximum(
+            0, (hi - first).astype("int64") // step + 1 - skip)
+        if not count.any():
+            return
+        rows = numpy.repeat(numpy.arange(len(starts)), count)
+        offsets = numpy.arange(count.sum()) \
+            - numpy.repeat(numpy.cumsum(count) - count, count)
+        days = first[rows] + (skip[rows] + offsets) * step
+        positions.extend(pos[rows].tolist())
+        ordinals.extend((days.astype("int64") + _EPOCH).tolist())
+        return
+
+    for position, current in starts:
+        if current < since:
+            current += -((current - since) // step) * step
+        while current <= until:
+            positions.append(position)
+            ordinals.append(current)
+            current += step
+
+
+def project(tasks, until, since, calendar):
+    """Projects the occurrences of the open recurring tasks.
+
+        Args:
+            tasks: list of Task.
+            until: date, last day of the projection.
+            since: date, first day of the projection.
+            calendar: BusinessCalendar for "b" rules.
+
+        Returns: RecurrenceProjection
+    """
+    since_ord = since.toordinal()
+    until_ord = until.toordinal()
+    positions = []
+    ordinals = []
+    fixed = {}      # step -> [(position, first ordinal)]
+
+    for position, task in enumerate(tasks):
+        if task.finished or task.recursive is None or task.due_date is None:
+            continue
+        rule = compile_rule(task.recursive)
+        if rule is None:
+            continue
+
+        due = task.due_date
+        step = rule.step_days
+        if step:
+            fixed.setdefault(step, []).append((position, due.toordinal()))
+            continue
+
+        current = due
+        while current.toordinal() <= until_ord:
+            if current.toordinal() >= since_ord:
+                positions.append(position)
+                ordinals.append(current.toordinal())
+            following = rule.next(current, calendar)
+            if following <= current:
+                break
+            current = following
+
+    for step, starts in fixed.items():
+        _project_fixed(starts, step, since_ord, until_ord, positions,
+                       ordinals)
+
+    return RecurrenceProjection(tasks, positions, ordinals)
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""Task server: one process keeps a todo.txt parsed in memory and serves
+it over a Unix domain socket.
+
+    python -m todotxt serve todo.txt [done.txt] --socket /tmp/todo.sock
+
+    tasks = todotxt.TaskClient("/tmp/todo.sock")    # instead of Tasks(...)
+    tasks.load()
+    tasks.add("(A) call Bob +work due:tomorrow")
+    tasks.save()
+
+The protocol is one JSON object per line in each direction:
+
+    {"id": 1, "op": "add", "args": {"text": "call Bob"}}
+    {"id": 1, "ok": true, "result": [12, "call Bob"]}
+    {"id": 2, "ok": false, "error": "KeyError", "message": "..."}
+
+Tasks travel as [tid, raw_todo] pairs. Operations: info, tasks, query,
+filter_by, search, pending_recurrences, get_projects, get_contexts, stats
+(read), add, complete, archive, create_recursive_tasks (write) and save.
+
+The server holds a journaled Tasks object (todotxt.journal). Writes that
+arrive within BATCH_DELAY seconds of each other are committed together:
+their journal records are held back and written with one fsync, then every
+writer of the batch gets its reply. todo.txt itself is rewritten (the
+journal compacted) COMPACT_DELAY seconds after the last commit, on "save"
+and on shutdown.
+
+External edits of todo.txt are picked up on the next request (one stat()
+per request): the file is loaded again and the writes not yet compacted
+into it are applied over it once more. The journal of those writes is kept
+as "<todo.txt>.journal.conflict" (see todotxt.journal).
+"""
+
+from __future__ import print_function
+
+import asyncio
+import json
+import os
+import signal
+import socket
+
+from todotxt import Task, Tasks, JournalConflict, date_value
+
+BATCH_DELAY = 0.01      # seconds a write waits for more writes to commit
+COMPACT_DELAY = 1.0     # seconds after the last commit todo.txt is written
+
+READ_OPS = frozenset(["info", "tasks", "query", "filter_by", "search",
+                      "pending_recurrences", "get_projects",
+                      "get_contexts", "stats"])
+WRITE_OPS = frozenset(["add", "complete", "archive",
+                       "create_recursive_tasks"])
+
+
+def pairs(tasks):
+    """Returns the [tid, raw_todo] pairs of tasks."""
+    return [[x.tid, x.raw_todo] for x in tasks]
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class TaskServer(object):
+    """Serves one todo.txt (and its done.txt), see the module
+    documentation."""
+
+    def __init__(self, path, archive_path=None, socket_path=None,
+                 batch_delay=BATCH_DELAY, compact_delay=COMPACT_DELAY):
+        self.path = path
+        self.archive_path = archive_path
+        self.socket_path = socket_path
+        self.batch_delay = batch_delay
+        self.compact_delay = compact_delay
+        self.tasks = None       # type: Tasks
+        self._written = None    # (size, mtime_ns, inode) of our todo.txt
+        # writes since the last compaction, applied again over external
+        # edits: ("add", raw), ("complete", raw, date) or ("archive",)
+        self._replay = []
+        self._batch = None      # future of the open batch
+        self._compact_timer = None
+        self._server = None
+
+    def __repr__(self):
+        return "<TaskServer '{0}' on '{1}'>".format(self.path,
+                                                    self.socket_path)
+
+    def open(self):
+        """Loads todo.txt (replaying a journal left by a previous run)."""
+        if self.tasks is not None and self.tasks.journal is not None:
+            self.tasks.journal.close()
+        self.tasks = Tasks(self.path, self.archive_path, journal=True)
+        if os.path.exists(self.path):
+            self.tasks.load()
+        self.tasks.journal.hold()
+        self._written = _file_key(self.path)
+
+    async def handle(self, request):
+        """Runs one request (dict).
+
+            Returns: the response (dict).
+        """
+        response = {"id": request.get("id")}
+        op = request.get("op")
+        try:
+            if op not in READ_OPS and op not in WRITE_OPS and op != "save":
+                raise ValueError("unknown op: {0!r}".format(op))
+            if _file_key(self.path) != self._written:
+                self._pick_up()
+            result = getattr(self, "op_" + op)(**request.get("args", {}))
+            if op in WRITE_OPS:
+                await self._commit_soon()
+            elif op == "save":
+                await self._commit_soon()
+                self.compact()
+        except Exception as error:
+            response.update(ok=False, error=type(error).__name__,
+                            message=str(error))
+            return response
+        response.update(ok=True, result=result)
+        return response
+
+    def op_info(self):
+        return {"path": self.path, "archive_path": self.archive_path,
+                "pid": os.getpid()}
+
+    def op_tasks(self):
+        return pairs(self.tasks)
+
+    def op_query(self, text):
+        return pairs(self.tasks.query(text))
+
+    def op_filter_by(self, text):
+        return pairs(self.tasks.filter_by(text))
+
+    def op_search(self, text, limit=None, archived=True):
+        return pairs(self.tasks.search(text, limit, archived))
+
+    def op_pending_recurrences(self):
+        return pairs(self.tasks.pending_recurrences())
+
+    def op_get_projects(self):
+        return self.tasks.get_projects()
+
+    def op_get_contexts(self):
+        return self.tasks.get_contexts()
+
+    def op_stats(self):
+        return {"tasks": len(self.tasks),
+                "archives": len(self.tasks.archives),
+                "uncompacted": len(self._replay),
+                "journal_bytes": self.tasks.journal.size()}
+
+    def op_add(self, text):
+        self.tasks.add(text)
+        task = self.tasks.tasks[-1]
+        self._replay.append(("add", task.raw_todo))
+        return [task.tid, task.raw_todo]
+
+    def op_complete(self, key, raw=None, finished_date=None):
+        """Completes the task at position key. With raw (the text the
+        client saw), the task is looked up by its text if the position
+        moved, KeyError if it is gone."""
+        if raw is not None and (
+                not -len(self.tasks) <= key < len(self.tasks)
+                or self.tasks[key].raw_todo != raw):
+            key = self._position(raw)
+        finished = date_value(finished_date) \
+            if finished_date is not None else None
+        raw = self.tasks[key].raw_todo
+        task = self.tasks.complete(key, finished)
+        self._replay.append(("complete", raw, task.finished_date))
+        return [task.tid, task.raw_todo]
+
+    def op_archive(self):
+        archived = self.tasks.archive()
+        if archived:
+            self._replay.append(("archive",))
+        return pairs(archived)
+
+    def op_create_recursive_tasks(self, calendar=None, only_pending=False):
+        created = self.tasks.create_recursive_tasks(calendar, only_pending)
+        self._replay.extend(("add", x.raw_todo) for x in created)
+        return pairs(created)
+
+    def op_save(self):
+        return True
+
+    def _position(self, raw):
+        for position, task in enumerate(self.tasks):
+            if task.raw_todo == raw:
+                return position
+        raise KeyError("no task {0!r}".format(raw))
+
+    async def _commit_soon(self):
+        """Waits until the open batch (one is opened if needed) is
+        committed."""
+        loop = asyncio.get_running_loop()
+        if self._batch is None:
+            self._batch = loop.create_future()
+            loop.call_later(self.batch_delay, self._run_batch)
+        await asyncio.shield(self._batch)
+
+    def _run_batch(self):
+        batch, self._batch = self._batch, None
+        try:
+            self.commit()
+        except Exception as error:
+            batch.set_exception(error)
+        else:
+            batch.set_result(None)
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+            self._compact_timer = asyncio.get_running_loop().call_later(
+                self.compact_delay, self.compact)
+
+    def commit(self):
+        """Writes the held journal records with one fsync (all writes go
+        through the Tasks methods, which journal them, so there is no
+        need for the full comparison of Tasks.save())."""
+        journal = self.tasks.journal
+        journal.flush()
+        journal.hold()
+        if journal.size() >= journal.threshold:
+            self.compact()
+
+    def compact(self):
+        """Writes todo.txt (and done.txt) and removes the journal."""
+        if self._compact_timer is not None:
+            self._compact_timer.cancel()
+            self._compact_timer = None
+        if not self._replay and not self.tasks.journal.exists():
+            return
+        self.tasks.compact()
+        self.tasks.journal.hold()
+        self._written = _file_key(self.path)
+        self._replay = []
+
+    def _pick_up(self):
+        """Loads todo.txt changed by another program and applies the
+        writes that are not compacted into it yet."""
+        replay = self._replay
+        self.tasks.journal.flush()
+        try:
+            self.open()
+        except JournalConflict:
+            # the journal is kept aside, its writes are applied again
+            self.open()
+        if self.tasks.journal.exists():
+            return      # same content, the journal still applies
+        self._replay = []
+        for entry in replay:
+            if entry[0] == "add":
+                self.op_add(entry[1])
+            elif entry[0] == "complete":
+                try:
+                    position = self._position(entry[1])
+                except KeyError:
+                    continue    # edited or removed meanwhile
+                task = self.tasks.complete(position, entry[2])
+                self._replay.append(("complete", entry[1],
+                                     task.finished_date))
+            else:
+                self.op_archive()
+        if self._replay:
+            self.commit()
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode("utf-8"))
+                except ValueError as error:
+                    response = {"id": None, "ok": False,
+                                "error": "ValueError", "message": str(error)}
+                else:
+                    response = await self.handle(request)
+                writer.write(json.dumps(response, ensure_ascii=False)
+                             .encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        """Loads the tasks and starts listening on the socket."""
+        self.open()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)     # left by a killed server
+        self._server = await asyncio.start_unix_server(
+            self._client, path=self.socket_path, limit=1 << 24)
+
+    async def close(self):
+        """Stops listening, commits and compacts."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batch is not None:
+            self._run_batch()
+        self.compact()
+        self.tasks.journal.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def serve_forever(self):
+        """Serves until SIGINT / SIGTERM."""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.cancel)
+        try:
+            await stop
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.close()
+
+
+def serve(path, archive_path=None, socket_path=None, **kwargs):
+    """Runs a TaskServer until SIGINT / SIGTERM (see TaskServer)."""
+    asyncio.run(TaskServer(path, archive_path, socket_path, **kwargs)
+                .serve_forever())
+
+
+def _task(pair):
+    return Task(pair[1], pair[0])
+
+
+class ServerError(Exception):
+    """An error raised by the server while running a request."""
+
+    def __init__(self, error, message):
+        Exception.__init__(self, "{0}: {1}".format(error, message))
+        self.error = error
+
+
+class TaskClient(object):
+    """A Tasks-like client of a TaskServer. Reads are answered from the
+    tasks fetched by the last load(), writes go to the server and update
+    them."""
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._file = self._socket.makefile("rwb")
+        self._id = 0
+        self.tasks = []
+        self.archives = []
+        info = self.request("info")
+        self.path = info["path"]
+        self.archive_path = info["archive_path"]
+
+    def __repr__(self):
+        return "<TaskClient '{0}' via '{1}'>".format(self.path,
+                                                     self.socket_path)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __getitem__(self, key):
+        return self.tasks[key]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def request(self, op, **args):
+        """Sends a request and returns its result (ServerError if it
+        failed)."""
+        self._id += 1
+        self._file.write(json.dumps({"id": self._id, "op": op, "args": args},
+                                    ensure_ascii=False).encode("utf-8")
+                         + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("the task server closed the connection")
+        response = json.loads(line.decode("utf-8"))
+        if not response.get("ok"):
+            raise ServerError(response.get("error"), response.get("message"))
+        return response["result"]
+
+    def _tasks(self, op, **args):
+        return [_task(x) for x in self.request(op, **args)]
+
+    def _local(self, tasks):
+        return Tasks(self.path, self.archive_path, tasks)
+
+    def load(self):
+        """Fetches the tasks from the server."""
+        self.tasks = self._tasks("tasks")
+        return True
+
+    def reload(self):
+        return self.load()
+
+    def save(self):
+        """Commits and writes todo.txt / done.txt on the server."""
+        self.archives = []
+        return self.request("save")
+
+    def add(self, text):
+        self.tasks.append(_task(self.request("add", text=text)))
+        return self
+
+    def complete(self, key, finished_date=None):
+        """Completes the task at position key of the loaded tasks.
+
+            Returns: the finished Task.
+        """
+        task = self.tasks[key]
+        if finished_date is not None:
+            finished_date = finished_date.strftime("%Y-%m-%d")
+        self.tasks[key] = _task(self.request(
+            "complete", key=key % len(self.tasks), raw=task.raw_todo,
+            finished_date=finished_date))
+        return self.tasks[key]
+
+    def archive(self):
+        archived = self._tasks("archive")
+        self.archives = self.archives + archived
+        self.tasks = [x for x in self.tasks if not x.finished]
+        return archived
+
+    def create_recursive_tasks(self, calendar=None, only_pending=False):
+        """Creates the recursive tasks on the server (calendar: the name
+        of a registered calendar, in the server)."""
+        created = self._tasks("create_recursive_tasks", calendar=calendar,
+                              only_pending=only_pending)
+        self.tasks.extend(created)
+        return created
+
+    def pending_recurrences(self):
+        return self._tasks("pending_recurrences")
+
+    def query(self, text):
+        return self._local(self._tasks("query", text=text))
+
+    def filter_by(self, text):
+        return self._local(self._tasks("filter_by", text=text))
+
+    def search(self, text, limit=None, archived=True):
+        return self._local(self._tasks("search", text=text, limit=limit,
+                                       archived=archived))
+
+    def order_by(self, *criteria):
+        return self._local(list(self.tasks)).order_by(*criteria)
+
+    def get_projects(self):
+        return self.request("get_projects")
+
+    def get_contexts(self):
+        return self.request("get_contexts")
+
+    def stats(self):
+        return self.request("stats")
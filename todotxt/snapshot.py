@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Parsed-snapshot cache of a todo.txt file.
+
+A Tasks object created with snapshot=True writes "<todo.txt>.snapshot"
+after a load or save: the parsed fields of every task, column by column
+(marshal, dates as day ordinals). The next load() of the same content
+maps the snapshot in and builds the Task objects from the columns instead
+of parsing the lines.
+
+The snapshot header holds the key of the todo.txt content it was made
+from: size, mtime and sha1, plus today's date when a due:/t: tag is not
+an ISO date (relative keywords expand to another date tomorrow), and the
+crc32 of the columns. A stale, corrupt or foreign snapshot is ignored and
+the lines are parsed.
+"""
+
+import gc
+import marshal
+import mmap
+import os
+import re
+import struct
+import zlib
+from array import array
+from datetime import datetime
+
+from todotxt import Task
+
+SNAPSHOT_SUFFIX = ".snapshot"
+MAGIC = b"TODOSNAP"
+VERSION = 2
+
+# magic, version, size, mtime_ns, sha1, today ordinal (0: any day), count,
+# crc32 of the body
+HEADER = struct.Struct("<8sIqq20sqII")
+
+# a due:/t: value that is no ISO date depends on the day it is parsed
+RELATIVE_DATE_PATTERN = re.compile(
+    "(?:^|\\s)(?:due|t):(?!\\d{4}-\\d{2}-\\d{2}(?:\\s|$))\\S")
+
+DATE_FIELDS = ("created_date", "finished_date", "threshold_date", "due_date")
+
+
+def has_relative_dates(text):
+    """True if a due:/t: tag of the text (str) is not an ISO date."""
+    return RELATIVE_DATE_PATTERN.search(text) is not None
+
+
+def snapshot_key(stat, digest, today=0):
+    """Returns the key of todo.txt content.
+
+        Args:
+            stat: os.stat_result of the file.
+            digest: sha1 digest (bytes) of the content.
+            today(=0): today's day ordinal if the content has relative
+                dates, else 0.
+    """
+    return (stat.st_size, stat.st_mtime_ns, digest, today)
+
+
+def pack_tasks(tasks):
+    """Returns the parsed fields of tasks (Task objects) as marshal'ed
+    columns (bytes), see unpack_tasks()."""
+    columns = [[x.raw_todo for x in tasks],
+               "".join(x.priority for x in tasks),
+               [x.todo for x in tasks],
+               [tuple(x.projects) for x in tasks],
+               [tuple(x.contexts) for x in tasks],
+               bytes(bytearray(1 if x.finished else 0 for x in tasks)),
+               [x.recursive for x in tasks]]
+    for field in DATE_FIELDS:
+        columns.append(array("l", [
+            getattr(x, field).toordinal()
+            if getattr(x, field) is not None else 0
+            for x in tasks]).tobytes())
+    return marshal.dumps(tuple(columns))
+
+
+def unpack_tasks(data, count):
+    """Builds count Task objects (tids 0..) from pack_tasks() columns.
+
+        Args:
+            data: bytes-like, the packed columns.
+            count: the number of packed tasks.
+
+        Returns: list of Task (ValueError, EOFError or TypeError if the
+            data is corrupt).
+    """
+    # the objects built here live on, collections would only rescan them
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return build_tasks(marshal.loads(data), count)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def write_snapshot(path, key, tasks):
+    """Writes the snapshot of tasks (Task objects) to path (temporary file
+    and rename, no fsync: it is a cache)."""
+    data = pack_tasks(tasks)
+    size, mtime_ns, digest, today = key
+    temp = "{0}.tmp{1}".format(path, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, mtime_ns, digest, today,
+                            len(tasks), zlib.crc32(data)))
+        f.write(data)
+    os.replace(temp, path)
+
+
+def read_header(path):
+    """Returns the header fields of a snapshot, None if unreadable."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(HEADER.size)
+        if len(data) != HEADER.size:
+            return None
+        return HEADER.unpack(data)
+    except (IOError, OSError):
+        return None
+
+
+def read_snapshot(path, key, today):
+    """Reads the tasks of a snapshot made for key.
+
+        Args:
+            path: the snapshot file.
+            key: snapshot_key() of the current todo.txt content (today 0).
+            today: today's day ordinal.
+
+        Returns: list of Task with tids 0.., None if the snapshot is
+            missing, stale or corrupt.
+    """
+    header = read_header(path)
+    if header is None:
+        return None
+    magic, version, size, mtime_ns, digest, day, count, crc = header
+    if magic != MAGIC or version != VERSION \
+            or (size, mtime_ns, digest) != key[:3] \
+            or day not in (0, today):
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                with memoryview(data) as view:
+                    with view[HEADER.size:] as body:
+                        if zlib.crc32(body) != crc:
+                            return None
+                        return unpack_tasks(body, count)
+    except (IOError, OSError, ValueError, EOFError, TypeError, IndexError):
+        return None
+
+
+def build_tasks(columns, count):
+    """Builds Task objects from snapshot columns (ValueError if they do
+    not hold count tasks)."""
+    (raws, priorities, todos, projects, contexts, finished,
+     recursives) = columns[:7]
+    dates = []
+    for data in columns[7:]:
+        ordinals = array("l")
+        ordinals.frombytes(data)
+        dates.append(ordinals)
+    if len(dates) != len(DATE_FIELDS) or any(
+            len(x) != count for x in [raws, priorities, todos, projects,
+                                      contexts, finished, recursives]
+            + dates):
+        raise ValueError("snapshot columns do not match")
+
+    # one shared datetime per day
+    day = dict((x, datetime.fromordinal(x))
+               for x in set().union(*dates) if x)
+    day[0] = None
+
+    new = object.__new__
+    tasks = []
+    append = tasks.append
+    rows = zip(raws, priorities, todos, projects, contexts, finished,
+               recursives, *dates)
+    for tid, (raw, priority, todo, project, context, done, recursive,
+              created, finished_on, threshold, due) in enumerate(rows):
+        task = new(Task)
+        # raw_todo and LINE_FIELDS, as Task.rebuild_raw_todo() compares
+        # them (as _snapshot() does, with copies of the task's lists)
+        state = (raw, done == 1, day[finished_on], priority, day[created],
+                 day[threshold], day[due], recursive, list(context),
+                 list(project), todo)
+        task.__dict__ = {
+            "tid": tid, "raw_todo": raw, "finished": state[1],
+            "finished_date": state[2], "priority": priority,
+            "created_date": state[4], "recursive": recursive,
+            "contexts": list(context), "projects": list(project),
+            "todo": todo, "threshold_date": state[5],
+            "due_date": state[6], "_state": state}
+        append(task)
+    return tasks
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Opt-in instrumentation of Tasks.load(), refresh() and save().
+
+    tasks = Tasks("todo.txt", instrument=True)      # or a .prom file path
+    tasks.load()
+    tasks.stats()
+    # {"timings": {"read": {"count": 1, "seconds": 0.002, "max": 0.002},
+    #              "parse": {...}, ...},
+    #  "counters": {"bytes_read": 61234, "lines": 1000, "tasks": 1000, ...}}
+
+Phases (seconds per call, summed over the calls):
+
+    read, decode        reading and decoding the file
+    journal, snapshot   journal replay, snapshot read / write
+    match               matching old and new lines (refresh)
+    parse               parsing lines into Task objects
+    dates               due:/t: resolution of the parsed tasks, not
+                        included in parse
+    index               rebuilding the index
+    serialize, write    rebuilding the lines and writing them (save)
+    archive             appending archived tasks to the done file / store
+
+Counters: bytes_read, bytes_written, lines, tasks, tasks_written,
+archived, snapshot_hits, date_cache_hits, date_cache_misses and
+parse_failures (due:/t: values that resolve to no date).
+
+Every load, refresh or save collects into a Stats object of its own. It
+is the payload of "saved" (handlers added with payload=True) and
+delta.stats of the "loaded" Delta, and is then merged into
+Tasks.instrumentation. Without instrument, each phase costs a None check
+and parsing a task with due:/t: one thread-local lookup.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class _Active(threading.local):
+    stats = None        # the Stats collecting the parse of this thread
+
+
+active = _Active()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"") \
+        .replace("\n", "\\n")
+
+
+class Stats(object):
+    """Phase timings and counters, see the module documentation."""
+
+    def __init__(self):
+        self.timings = {}   # type: Dict[str, List]  ## [count, seconds, max]
+        self.counters = {}  # type: Dict[str, int]
+        self._nested = 0.0  # seconds of nested phases in the current lap
+
+    def __repr__(self):
+        return "<Stats {0} phases, {1} counters>".format(
+            len(self.timings), len(self.counters))
+
+    @staticmethod
+    def start():
+        """Returns the clock value a first lap() is measured from."""
+        return perf_counter()
+
+    def lap(self, phase, since):
+        """Records the time since a clock value as a call of phase, minus
+        the nested phases recorded meanwhile.
+
+            Returns: the clock value now, for the next lap.
+        """
+        now = perf_counter()
+        self.add_time(phase, now - since - self._nested)
+        self._nested = 0.0
+        return now
+
+    def add_time(self, phase, seconds, nested=False):
+        """Records a call of phase. A nested call is taken out of the
+        enclosing lap()."""
+        entry = self.timings.get(phase)
+        if entry is None:
+            self.timings[phase] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+        if nested:
+            self._nested += seconds
+
+    def count(self, name, value=1):
+        """Adds value to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def collecting(self):
+        """Makes Task.parse() record due:/t: resolution in this object
+        (in this thread) for the duration of the block."""
+        previous = active.stats
+        active.stats = self
+        try:
+            yield self
+        finally:
+            active.stats = previous
+
+    def merge(self, other):
+        """Adds the timings and counters of another Stats object."""
+        for phase, (count, seconds, longest) in other.timings.items():
+            entry = self.timings.get(phase)
+            if entry is None:
+                self.timings[phase] = [count, seconds, longest]
+            else:
+                entry[0] += count
+                entry[1] += seconds
+                entry[2] = max(entry[2], longest)
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    def reset(self):
+        self.timings = {}
+        self.counters = {}
+        self._nested = 0.0
+
+    def as_dict(self):
+        """Returns {"timings": {phase: {"count", "seconds", "max"}},
+        "counters": {name: value}}."""
+        return {"timings": dict(
+                    (x, {"count": y[0], "seconds": y[1], "max": y[2]})
+                    for x, y in self.timings.items()),
+                "counters": dict(self.counters)}
+
+    def to_prometheus(self, prefix="todotxt", labels=None):
+        """Returns the stats in the Prometheus text exposition format.
+
+            Args:
+                prefix(="todotxt"): metric name prefix.
+                labels(=None): dict of labels added to every sample.
+        """
+        extra = "".join(",{0}=\"{1}\"".format(x, _escape(y))
+                        for x, y in sorted((labels or {}).items()))
+
+        def sample(name, value, phase=None):
+            if phase is None:
+                label = "{" + extra[1:] + "}" if extra else ""
+            else:
+                label = "{{phase=\"{0}\"{1}}}".format(_escape(phase), extra)
+            return "{0}_{1}{2} {3!r}".format(prefix, name, label, value)
+
+        out = []
+        phases = sorted(self.timings.items())
+        for name, kind, column, text in (
+                ("phase_seconds_total", "counter", 1,
+                 "Time spent in each phase."),
+                ("phase_calls_total", "counter", 0, "Calls of each phase."),
+                ("phase_max_seconds", "gauge", 2,
+                 "Longest call of each phase.")):
+            out.append("# HELP {0}_{1} {2}".format(prefix, name, text))
+            out.append("# TYPE {0}_{1} {2}".format(prefix, name, kind))
+            out.extend(sample(name, x[1][column], x[0]) for x in phases)
+        for name, value in sorted(self.counters.items()):
+            out.append("# TYPE {0}_{1}_total counter".format(prefix, name))
+            out.append(sample(name + "_total", value))
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path, prefix="todotxt", labels=None):
+        """Writes to_prometheus() to path through a temporary file and a
+        rename, so a scraper never reads a partial file."""
+        temp = "{0}.tmp{1}".format(path, os.getpid())
+        with open(temp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix, labels))
+        os.replace(temp, path)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Streaming access to todo.txt / done.txt files.
+
+iter_tasks() reads a file in large chunks and yields tasks as it goes,
+so memory stays flat whatever the file size:
+
+    overdue = iter_tasks("todo.txt", where=lambda x: not x.finished)
+    for task in overdue.filter_by("+work").order_by("due_date", limit=20):
+        print(task)
+
+The encoding is detected from the head of the file as Tasks.load() does
+(todotxt.encoding.detect_file), a BOM is skipped.
+"""
+
+import codecs
+import heapq
+
+from todotxt import Task, CompactTask, DUEDATE_SIG, THRESHOLDDATE_SIG
+from todotxt.encoding import detect_file
+from todotxt.ordering import parse_criteria, sort_key
+
+CHUNK_SIZE = 1 << 20    # bytes read per chunk
+
+
+def _codec(text_format):
+    """The codec a file of text_format is decoded with, the BOM skipped."""
+    if not text_format.bom:
+        return text_format.encoding
+    return "utf-8-sig" if text_format.encoding == "utf-8" else "utf-16"
+
+
+def iter_lines(path, encoding=None, chunk_size=CHUNK_SIZE):
+    """Yields the stripped, non-empty lines of a file, reading it in
+    chunk_size blocks.
+
+        Args:
+            path: file to read.
+            encoding(=None): text encoding of the file, None: detected.
+            chunk_size(=CHUNK_SIZE): bytes read per chunk.
+    """
+    errors = "strict"
+    if encoding is None:
+        text_format = detect_file(path)
+        encoding, errors = _codec(text_format), text_format.errors
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    tail = u""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            lines = (tail + decoder.decode(chunk, not chunk)) \
+                .splitlines(True)
+            tail = u""
+            if chunk and lines and lines[-1].splitlines() == [lines[-1]]:
+                tail = lines.pop()      # unterminated, continue next chunk
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield line
+            if not chunk:
+                break
+
+
+def _line_filter(text):
+    """Returns a predicate on a raw line equivalent to Task.matches(text),
+    or None when the line needs parsing first (parse may rewrite raw_todo
+    when "t:" or "due:" tags are present)."""
+    def matches(line):
+        if THRESHOLDDATE_SIG in line or DUEDATE_SIG in line:
+            return None
+        return text in line
+    return matches
+
+
+def iter_tasks(path, where=None, encoding=None, lazy=False,
+               chunk_size=CHUNK_SIZE):
+    """Streams the tasks of a todo.txt / done.txt file.
+
+        Args:
+            path: file to read.
+            where(=None): predicate(s) a task must satisfy, a text as
+                in Tasks.filter_by, a function taking a Task, or a
+                list of them (all must match). Text predicates are
+                checked on the raw line before the Task is built.
+            encoding(=None): text encoding of the file, None: detected.
+            lazy(=False): yield CompactTask objects.
+            chunk_size(=CHUNK_SIZE): bytes read per chunk.
+
+        Returns: TaskStream (tids are numbered as in Tasks.load)
+    """
+    if where is None:
+        where = []
+    elif not isinstance(where, (list, tuple)):
+        where = [where]
+
+    line_filters = [_line_filter(x) for x in where if isinstance(x, str)]
+    task_filters = [(lambda y: lambda x: x.matches(y))(x)
+                    if isinstance(x, str) else x for x in where]
+    cls = CompactTask if lazy else Task
+
+    def generate():
+        tid = 0
+        for line in iter_lines(path, encoding, chunk_size):
+            tid += 1
+            checked = True
+            for line_filter in line_filters:
+                result = line_filter(line)
+                if result is None:
+                    checked = False
+                elif not result:
+                    break
+            else:
+                task = cls(line, tid - 1)
+                if checked and len(line_filters) == len(task_filters):
+                    yield task
+                elif all(x(task) for x in task_filters):
+                    yield task
+
+    return TaskStream(generate())
+
+
+class TaskStream(object):
+    """A one-shot stream of tasks with the filter_by / order_by
+    semantics of Tasks."""
+
+    def __init__(self, iterable):
+        self._iterable = iterable
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def filter_by(self, text):
+        """Keeps the tasks that match the text (see Task.matches).
+
+        Args:
+            text -- the text to filter the stream by
+
+        Returns:
+            A new :class:`TaskStream` object.
+        """
+        return TaskStream(x for x in self._iterable if x.matches(text))
+
+    def where(self, predicate):
+        """Keeps the tasks for which predicate(task) is true."""
+        return TaskStream(x for x in self._iterable if predicate(x))
+
+    def order_by(self, *criteria, **kwargs):
+        """Sorts the stream by criteria of Tasks.order_by ("-" prefix
+        for descending). With limit=N, only the first N tasks are kept
+        by heap selection instead of sorting everything.
+
+        Returns:
+            A new :class:`TaskStream` object.
+        """
+        limit = kwargs.pop("limit", None)
+        parsed = parse_criteria(criteria)
+        if not parsed:
+            return self
+
+        key = sort_key(parsed)
+        if limit is None:
+            return TaskStream(sorted(self._iterable, key=key))
+        return TaskStream(heapq.nsmallest(limit, self._iterable, key=key))
+
+    def count(self):
+        """Consumes the stream and returns the number of tasks."""
+        return sum(1 for _ in self._iterable)
+
+    def to_tasks(self, path=None, archive_path=None):
+        """Consumes the stream into a :class:`Tasks` object."""
+        from todotxt import Tasks
+        return Tasks(path, archive_path, list(self._iterable))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Live watch of a todo.txt file.
+
+    async for delta in tasks.watch():
+        print(delta.added, delta.removed, delta.changed)
+
+A change of the file is detected through inotify (Linux, via ctypes) or,
+where it is not available, by polling os.stat(). A burst of writes is
+folded into one refresh: the file is refreshed once it has not changed
+for `debounce` seconds. Each refresh is incremental (Tasks.refresh), the
+"load"/"loaded" handlers run as usual and coroutine handlers are awaited
+before the Delta is yielded. While the file is missing (deleted, or
+replaced by a rename), the watch waits for it to come back.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# the directory is watched, editors and sync clients replace the file
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO \
+    | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct("iIII")    # wd, mask, cookie, len
+
+DEBOUNCE = 0.2      # seconds without a change before a refresh
+POLL_INTERVAL = 1.0
+
+
+class PollWatcher(object):
+    """Detects changes of a file by comparing os.stat() results."""
+
+    def __init__(self, path, interval=POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._state = self._stat()
+
+    def __repr__(self):
+        return "<PollWatcher '{0}'>".format(self.path)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def changed(self):
+        """True if the file changed since the last call."""
+        state = self._stat()
+        if state == self._state:
+            return False
+        self._state = state
+        return True
+
+    async def wait(self):
+        """Returns once the file changed."""
+        while not self.changed():
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Detects changes of a file through inotify events of its directory.
+    Must be created in a running event loop."""
+
+    def __init__(self, path):
+        libc = _libc()
+        if libc is None:
+            raise OSError("inotify is not available")
+        self.path = path
+        self._name = os.fsencode(os.path.basename(path))
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path))
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory),
+                                  WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, "inotify_add_watch failed", directory)
+
+        self._flag = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._fd, self._read)
+
+    def __repr__(self):
+        return "<InotifyWatcher '{0}'>".format(self.path)
+
+    def _read(self):
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, size = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + size].rstrip(b"\0")
+            offset += size
+            if name == self._name:
+                self._flag.set()
+
+    def changed(self):
+        """True if the file changed since the last call."""
+        if not self._flag.is_set():
+            return False
+        self._flag.clear()
+        return True
+
+    async def wait(self):
+        """Returns once the file changed."""
+        await self._flag.wait()
+        self._flag.clear()
+
+    def close(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+
+_inotify = []   # [libc or None] once looked up
+
+
+def _libc():
+    """Returns libc with the inotify functions, None if not available."""
+    if not _inotify:
+        libc = None
+        name = ctypes.util.find_library("c")
+        if name is not None:
+            try:
+                libc = ctypes.CDLL(name, use_errno=True)
+            except OSError:
+                pass
+            if libc is not None and not (
+                    hasattr(libc, "inotify_init1")
+                    and hasattr(libc, "inotify_add_watch")):
+                libc = None
+        _inotify.append(libc)
+    return _inotify[0]
+
+
+def open_watcher(path, interval=POLL_INTERVAL, inotify=None):
+    """Returns a watcher of path, an InotifyWatcher when possible.
+
+        Args:
+            path: the watched file.
+            interval(=1.0): seconds between two polls (PollWatcher).
+            inotify(=None): True: require inotify, False: poll, None: try
+                inotify first.
+    """
+    if inotify is not False:
+        try:
+            return InotifyWatcher(path)
+        except OSError:
+            if inotify:
+                raise
+    return PollWatcher(path, interval)
+
+
+async def settle(watcher, debounce=DEBOUNCE):
+    """Waits for a change, then until the file did not change for
+    debounce seconds."""
+    await watcher.wait()
+    while True:
+        await asyncio.sleep(debounce)
+        if not watcher.changed():
+            return
+
+
+async def watch(tasks, debounce=DEBOUNCE, interval=POLL_INTERVAL,
+                inotify=None, lazy=False):
+    """Refreshes tasks whenever tasks.path changes (see Tasks.watch).
+
+        Yields: the Delta of each refresh that changed the tasks.
+    """
+    watcher = open_watcher(tasks.path, interval, inotify)
+    try:
+        while True:
+            await settle(watcher, debounce)
+            try:
+                delta = tasks.refresh(lazy)
+            except FileNotFoundError:
+                # deleted, or between the two steps of a replace: the
+                # next change (the file coming back) is refreshed
+                continue
+            await tasks.flush_events()
+            if delta is not None and (delta.added or delta.removed
+                                      or delta.changed):
+                yield delta
+    finally:
+        watcher.close()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Many todo.txt / done.txt files loaded as one collection.
+
+    workspace = Workspace.discover("teams")     # teams/*/todo.txt
+    workspace.load(workers=4, archives=True)
+    workspace.query("+release due<=today -finished")
+    workspace.locate(task)                      # (file id, tid)
+    workspace.save()
+
+Each todo file is a Tasks object of its own (workspace.files[file id]),
+so it is saved back on its own. load() parses the files in a process
+pool; a worker sends back the parsed fields of a file packed into one
+bytes object (todotxt.snapshot.pack_tasks) instead of pickled Task
+objects. A task is identified across the workspace by (file id, tid),
+where tid is its line among the non-empty lines of the file.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from todotxt import Tasks, parse_many
+from todotxt.encoding import read_file, release, decode, split_lines, \
+    detect_file
+from todotxt.journal import JOURNAL_SUFFIX
+from todotxt.query import Query
+from todotxt.snapshot import pack_tasks, unpack_tasks
+
+
+def parse_file(path):
+    """Returns the Task objects of a todo.txt file, [] if it is missing."""
+    if path is None or not os.path.exists(path):
+        return []
+    data = read_file(path)[0]
+    try:
+        return parse_many(split_lines(decode(data)[0]), stripped=True)
+    finally:
+        release(data)
+
+
+def parse_shard(path, archive_path=None):
+    """Process pool worker: parses a todo file and its done file.
+
+        Returns: ((count, packed tasks), (count, packed archive tasks))
+    """
+    tasks = parse_file(path)
+    archives = parse_file(archive_path)
+    return (len(tasks), pack_tasks(tasks)), \
+        (len(archives), pack_tasks(archives))
+
+
+class Workspace(object):
+    """A set of todo files (with their done files) loaded together."""
+
+    def __init__(self, files=(), indexed=False):
+        """
+            Args:
+                files: todo.txt paths, or (todo.txt, done.txt) pairs.
+                indexed(=False): keep an index of the merged collection.
+        """
+        self.files = []         # type: List[Tasks]  ## by file id
+        self.done = []          # type: List[Tasks]  ## done files, same ids
+        self.tasks = Tasks(indexed=indexed)     # all open files merged
+        self.archives = Tasks()                 # all done files merged
+        self._ids = {}          # (file id, tid) -> Task
+        self._owners = {}       # id(task) -> file id
+        for entry in files:
+            if isinstance(entry, (tuple, list)):
+                self.add(*entry)
+            else:
+                self.add(entry)
+
+    def __repr__(self):
+        return "<Workspace {0} files, {1} tasks>".format(
+            len(self.files), len(self.tasks))
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    @classmethod
+    def discover(cls, root, todo_name="todo.txt", done_name="done.txt",
+                 indexed=False):
+        """Returns a Workspace of every todo_name below root, with the
+        done_name next to it."""
+        files = []
+        for directory, _, names in sorted(os.walk(root)):
+            if todo_name in names:
+                files.append((os.path.join(directory, todo_name),
+                              os.path.join(directory, done_name)))
+        return cls(files, indexed)
+
+    def add(self, path, archive_path=None):
+        """Adds a todo file (and its done file).
+
+            Returns: the file id.
+        """
+        self.files.append(Tasks(path, archive_path))
+        self.done.append(Tasks(archive_path))
+        return len(self.files) - 1
+
+    def load(self, workers=None, archives=False):
+        """Loads every file, in a pool of worker processes.
+
+            Args:
+                workers(=None): number of processes, default: one per CPU;
+                    1 parses in this process.
+                archives(=False): load the done files too.
+        """
+        jobs = []
+        for file_id, tasks in enumerate(self.files):
+            if os.path.exists(tasks.path + JOURNAL_SUFFIX):
+                # the journal is replayed by Tasks.load
+                tasks.tasks = []
+                tasks.load()
+                if archives:
+                    self.done[file_id].tasks = parse_file(
+                        self.done[file_id].path)
+            else:
+                jobs.append(file_id)
+
+        paths = [self.files[x].path for x in jobs]
+        archive_paths = [self.done[x].path if archives else None
+                         for x in jobs]
+        if workers == 1 or len(jobs) < 2:
+            for file_id, path, archive_path in zip(jobs, paths,
+                                                   archive_paths):
+                self.files[file_id].tasks = parse_file(path)
+                self.done[file_id].tasks = parse_file(archive_path)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                for file_id, (shard, done) in zip(
+                        jobs, pool.map(parse_shard, paths, archive_paths)):
+                    self.files[file_id].tasks = unpack_tasks(shard[1],
+                                                             shard[0])
+                    self.done[file_id].tasks = unpack_tasks(done[1], done[0])
+        for file_id in jobs:
+            # save() writes each file back in its own encoding and newline
+            self.files[file_id].text_format = detect_file(
+                self.files[file_id].path)
+
+        self.merge()
+        return True
+
+    def merge(self):
+        """Rebuilds the merged collections and the ids from the files (call
+        it after changing the tasks of a file directly)."""
+        self._ids = {}
+        self._owners = {}
+        merged = []
+        for file_id, tasks in enumerate(self.files):
+            for task in tasks.tasks:
+                self._ids[(file_id, task.tid)] = task
+                self._owners[id(task)] = file_id
+            merged.extend(tasks.tasks)
+        self.tasks.tasks = merged
+        if self.tasks.index is not None:
+            self.tasks.index.build(merged)
+        if self.tasks._fulltext is not None:
+            self.tasks._fulltext.build(merged)
+        self.archives.tasks = [x for y in self.done for x in y.tasks]
+
+    def get(self, gid):
+        """Returns the task of a (file id, tid) id (KeyError if unknown)."""
+        return self._ids[tuple(gid)]
+
+    def locate(self, task):
+        """Returns the (file id, tid) id of a task of the workspace."""
+        return self._owners[id(task)], task.tid
+
+    def file_of(self, task):
+        """Returns the Tasks object (file) a task belongs to."""
+        return self.files[self._owners[id(task)]]
+
+    def query(self, text, archives=False):
+        """Runs a query (todotxt.query syntax) over all open files, or over
+        all done files.
+
+            Returns: list of Task
+        """
+        return Query(text).run(self.archives if archives else self.tasks)
+
+    def save(self, file_ids=None):
+        """Saves the todo files (all, or the given file ids), each on its
+        own; archived tasks go to the file's done file."""
+        for file_id in range(len(self.files)) if file_ids is None \
+                else file_ids:
+            self.files[file_id].save()